@@ -17,6 +17,21 @@ SECRET_KEY = config('SECRET_KEY')
 
 # Секретный ключ для Stripe
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='sk_test_default_key')
+# Сессия оплаты переиспользуется, если до ее истечения больше этого числа секунд
+STRIPE_SESSION_REUSE_MARGIN = config('STRIPE_SESSION_REUSE_MARGIN', default=600, cast=int)
+# Сессия оплаты создается задачей Celery (ответ 202 без ссылки); по умолчанию — прямо в запросе
+STRIPE_CHECKOUT_ASYNC = config('STRIPE_CHECKOUT_ASYNC', default=False, cast=bool)
+# Таймаут одного запроса к Stripe и предельное время создания сессии в фоне (секунды)
+STRIPE_REQUEST_TIMEOUT = config('STRIPE_REQUEST_TIMEOUT', default=10, cast=int)
+STRIPE_CHECKOUT_TIMEOUT = config('STRIPE_CHECKOUT_TIMEOUT', default=300, cast=int)
+STRIPE_SUCCESS_URL = config('STRIPE_SUCCESS_URL', default='https://example.com/success')
+STRIPE_CANCEL_URL = config('STRIPE_CANCEL_URL', default='https://example.com/cancel')
+# Вебхуки Stripe: секрет подписи, допустимое расхождение времени подписи (секунды),
+# размер пачки обработки и срок хранения обработанных событий для дедупликации
+STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='whsec_test_default_secret')
+STRIPE_WEBHOOK_TOLERANCE = config('STRIPE_WEBHOOK_TOLERANCE', default=300, cast=int)
+STRIPE_EVENT_BATCH_SIZE = config('STRIPE_EVENT_BATCH_SIZE', default=500, cast=int)
+STRIPE_EVENT_RETENTION_DAYS = config('STRIPE_EVENT_RETENTION_DAYS', default=30, cast=int)
 
 DEBUG = config('DEBUG', default=False, cast=bool)
 
@@ -33,6 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Полнотекстовый и триграммный поиск
 
 
     'rest_framework',
@@ -136,6 +152,20 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CELERY_BROKER_URL = f'redis://{config("REDIS_HOST", default="redis")}:{config("REDIS_PORT", default="6379")}/0'
 CELERY_RESULT_BACKEND = f'redis://{config("REDIS_HOST", default="redis")}:{config("REDIS_PORT", default="6379")}/0'
 
+# Кеш на Redis (роли пользователей и другие часто читаемые данные)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://{config("REDIS_HOST", default="redis")}:{config("REDIS_PORT", default="6379")}/1',
+    }
+}
+
+# Время жизни закешированных ролей пользователя (в секундах)
+ROLES_CACHE_TIMEOUT = config('ROLES_CACHE_TIMEOUT', default=300, cast=int)
+
+# Время жизни закешированных страниц каталога утвержденных курсов (в секундах)
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=600, cast=int)
+
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
@@ -147,6 +177,30 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': timedelta(days=1),
         'options': {'timezone': 'Europe/Paris'},
     },
+    'flush-course-updates': {
+        'task': 'lms.tasks.flush_course_updates',
+        'schedule': timedelta(minutes=5),
+    },
+    'autograde-text-answers': {
+        'task': 'lms.tasks.autograde_text_answers_task',
+        'schedule': timedelta(minutes=10),
+    },
+    'fail-stale-checkouts': {
+        'task': 'lms.tasks.fail_stale_checkouts_task',
+        'schedule': timedelta(minutes=5),
+    },
+    'process-stripe-events': {
+        'task': 'lms.tasks.process_stripe_events_task',
+        'schedule': timedelta(seconds=30),
+    },
+    'rebuild-revenue-rollups-every-night': {
+        'task': 'lms.tasks.rebuild_revenue_rollups_task',
+        'schedule': timedelta(days=1),
+    },
+    'reconcile-course-counters-every-night': {
+        'task': 'lms.tasks.reconcile_course_counters',
+        'schedule': timedelta(days=1),
+    },
 }
 
 # Настройки для отправки email через SMTP
@@ -158,6 +212,25 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@yourdomain.com')
 
+# Сколько писем об обновлении курса отправляет одна подзадача через одно SMTP-соединение
+COURSE_NOTIFY_CHUNK_SIZE = config('COURSE_NOTIFY_CHUNK_SIZE', default=500, cast=int)
+# Окно группировки уведомлений (секунды): обновления курса за окно уходят одним дайджестом
+COURSE_NOTIFY_DIGEST_WINDOW = config('COURSE_NOTIFY_DIGEST_WINDOW', default=3600, cast=int)
+
+# Автопроверка текстовых ответов (lms.autograde): шаги нормализации и пороги сходства
+AUTOGRADE_NORMALIZATION = ('unicode', 'case', 'punctuation', 'homoglyphs', 'whitespace')
+AUTOGRADE_ACCEPT_THRESHOLD = config('AUTOGRADE_ACCEPT_THRESHOLD', default=0.9, cast=float)
+AUTOGRADE_REJECT_THRESHOLD = config('AUTOGRADE_REJECT_THRESHOLD', default=0.5, cast=float)
+AUTOGRADE_BATCH_SIZE = config('AUTOGRADE_BATCH_SIZE', default=1000, cast=int)
+# Размер пула процессов для команды autograde_text_answers; задача Celery проверяет в процессе воркера
+AUTOGRADE_PROCESSES = config('AUTOGRADE_PROCESSES', default=4, cast=int)
+
+# Redis для рейтингов студентов; пустое значение — рейтинги в памяти процесса (тесты, разработка)
+LEADERBOARD_REDIS_URL = config(
+    'LEADERBOARD_REDIS_URL',
+    default=f'redis://{config("REDIS_HOST", default="redis")}:{config("REDIS_PORT", default="6379")}/2',
+)
+
 # `access`-токен будет действовать 30 минут, а `refresh`-токен — 7 дней
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
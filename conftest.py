@@ -0,0 +1,29 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    """
+    Тесты используют локальный кеш в памяти, чтобы не зависеть от Redis
+    и не получать значения, оставшиеся от предыдущих запусков.
+    """
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def memory_leaderboards(settings):
+    """
+    Рейтинги хранятся в памяти процесса вместо Redis и очищаются между тестами.
+    """
+    from lms.leaderboards import get_leaderboard_backend
+
+    settings.LEADERBOARD_REDIS_URL = ''
+    get_leaderboard_backend().clear()
+    yield
+    get_leaderboard_backend().clear()
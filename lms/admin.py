@@ -2,6 +2,8 @@ from django_celery_beat.models import PeriodicTask, IntervalSchedule
 from django.contrib import admin
 import nested_admin
 from .models import Course, Lesson, Subscription, QuizModel, Question, Answer, TestResult, StudentAnswer
+from .grading import recalculate_scores as rescore_results
+from .tasks import recalculate_test_scores
 
 # Вложенные классы для отображения вопросов и ответов в админке
 
@@ -22,8 +24,8 @@ class TestInline(nested_admin.NestedStackedInline):
 class StudentAnswerInline(admin.TabularInline):
     model = StudentAnswer
     extra = 0
-    fields = ('question', 'selected_answer', 'text_response', 'is_approved')
-    readonly_fields = ('question', 'selected_answer', 'text_response')
+    fields = ('question', 'selected_answer', 'text_response', 'is_approved', 'grading_status', 'similarity')
+    readonly_fields = ('question', 'selected_answer', 'text_response', 'grading_status', 'similarity')
     can_delete = False
     show_change_link = False
 
@@ -40,10 +42,21 @@ class TestResultAdmin(admin.ModelAdmin):
     actions = ['recalculate_scores']
     list_filter = ('student', 'test')
 
+    def save_formset(self, request, form, formset, change):
+        # Решение, принятое вручную, автопроверка больше не трогает
+        for answer in formset.save(commit=False):
+            answer.grading_status = 'reviewed'
+            answer.save()
+        formset.save_m2m()
+        # Решение меняет балл результата и статистику заданий
+        if formset.model is StudentAnswer:
+            rescore_results(TestResult.objects.filter(pk=form.instance.pk))
+
     def recalculate_scores(self, request, queryset):
-        for test_result in queryset:
-            test_result.calculate_score()
-        self.message_user(request, "Scores recalculated successfully.")
+        # Пересчет выполняется в Celery, чтобы большой тест не упирался в таймаут запроса
+        result_ids = list(queryset.values_list('pk', flat=True))
+        task = recalculate_test_scores.delay(result_ids)
+        self.message_user(request, f"Пересчет баллов запущен для {len(result_ids)} результатов (задача {task.id}).")
     recalculate_scores.short_description = "Пересчитать баллы для выбранных тестов"
 
 # Админ-класс для курса, включающий тесты, вопросы и ответы
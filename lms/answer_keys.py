@@ -0,0 +1,88 @@
+import json
+import time
+from functools import lru_cache
+
+from django.core.cache import cache
+
+from .grading import normalize_answer_text
+from .models import Question
+
+ANSWER_KEY_VERSION_KEY = 'lms:answer_key:{quiz_id}:version'
+ANSWER_KEY_KEY = 'lms:answer_key:{quiz_id}:v{version}'
+# Ключ ответов меняется только вместе с версией, поэтому хранится долго
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+# Сколько ключей держит каждый процесс
+ANSWER_KEY_LOCAL_SIZE = 256
+
+
+def get_answer_key_version(quiz_id):
+    """
+    Версия ключа ответов теста. Начальное значение — время, чтобы после
+    потери ключа в Redis версия не совпала со старой (как у каталога).
+    """
+    version_key = ANSWER_KEY_VERSION_KEY.format(quiz_id=quiz_id)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, int(time.time() * 1000), None)
+        version = cache.get(version_key)
+    return version
+
+
+def bump_answer_key_version(quiz_id):
+    version_key = ANSWER_KEY_VERSION_KEY.format(quiz_id=quiz_id)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        get_answer_key_version(quiz_id)
+        cache.incr(version_key)
+
+
+def build_answer_key(quiz_id):
+    """
+    Собирает ключ ответов теста одним запросом в JSON-совместимом виде:
+    {question_id: {'type', 'answers': [id, ...], 'correct': [id, ...], 'correct_text'}}.
+    """
+    key = {}
+    rows = Question.objects.filter(test_id=quiz_id).order_by('id', 'answers__id').values_list(
+        'id', 'question_type', 'correct_answer', 'answers__id', 'answers__is_correct'
+    )
+    for question_id, question_type, correct_answer, answer_id, is_correct in rows:
+        entry = key.setdefault(question_id, {
+            'type': question_type, 'answers': [], 'correct': [],
+            'correct_text': normalize_answer_text(correct_answer),
+        })
+        if answer_id is not None:
+            entry['answers'].append(answer_id)
+            if is_correct:
+                entry['correct'].append(answer_id)
+    return key
+
+
+@lru_cache(maxsize=ANSWER_KEY_LOCAL_SIZE)
+def _load_answer_key(quiz_id, version):
+    # Первый уровень — память процесса: версия входит в аргументы,
+    # так что устаревшие ключи просто вытесняются
+    cache_key = ANSWER_KEY_KEY.format(quiz_id=quiz_id, version=version)
+    data = cache.get(cache_key)
+    if data is None:
+        data = json.dumps(build_answer_key(quiz_id))
+        cache.set(cache_key, data, ANSWER_KEY_TIMEOUT)
+    return {
+        int(question_id): {
+            'type': entry['type'],
+            'answers': frozenset(entry['answers']),
+            'correct': frozenset(entry['correct']),
+            'correct_text': entry['correct_text'],
+        }
+        for question_id, entry in json.loads(data).items()
+    }
+
+
+def get_answer_key(quiz_id):
+    """
+    Ключ ответов теста: {question_id: {'type', 'answers', 'correct', 'correct_text'}},
+    где answers/correct — frozenset id вариантов. Кешируется в памяти процесса
+    и в Redis; версия повышается при любом изменении вопросов и ответов теста.
+    Возвращаемый словарь общий для всех вызовов — изменять его нельзя.
+    """
+    return _load_answer_key(quiz_id, get_answer_key_version(quiz_id))
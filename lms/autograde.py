@@ -0,0 +1,130 @@
+import math
+import string
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from functools import partial
+
+from django.conf import settings
+
+from .grading import recalculate_scores
+from .models import StudentAnswer, TestResult
+
+# Кириллические буквы, совпадающие по начертанию с латинскими, сводятся к латинице
+HOMOGLYPHS = str.maketrans({
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o',
+    'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'і': 'i', 'ј': 'j', 'ѕ': 's',
+})
+PUNCTUATION = str.maketrans('', '', string.punctuation + '«»—–…№')
+
+# Шаги нормализации в порядке применения
+NORMALIZATION_STEPS = ('unicode', 'case', 'punctuation', 'homoglyphs', 'whitespace')
+
+APPROVED, REJECTED, NEEDS_REVIEW = 'auto_approved', 'auto_rejected', 'needs_review'
+
+
+def normalize(text, steps=NORMALIZATION_STEPS):
+    """
+    Приводит ответ к виду для сравнения. Шаги: unicode (NFKC), case,
+    punctuation, homoglyphs (кириллица/латиница), whitespace.
+    """
+    text = text or ''
+    if 'unicode' in steps:
+        text = unicodedata.normalize('NFKC', text)
+    if 'case' in steps:
+        text = text.casefold()
+    if 'punctuation' in steps:
+        text = text.translate(PUNCTUATION)
+    if 'homoglyphs' in steps:
+        text = text.translate(HOMOGLYPHS)
+    if 'whitespace' in steps:
+        text = ' '.join(text.split())
+    return text
+
+
+def grade_text(response, correct_answer, steps, accept, reject):
+    """
+    Сравнивает ответ с правильным. Возвращает (статус, сходство):
+    сходство не ниже `accept` — засчитан, не выше `reject` — не засчитан,
+    между порогами или без правильного ответа — на проверку человеку.
+    """
+    expected = normalize(correct_answer, steps)
+    if not expected:
+        return NEEDS_REVIEW, None
+    similarity = SequenceMatcher(None, normalize(response, steps), expected).ratio()
+    if similarity >= accept:
+        return APPROVED, similarity
+    if similarity <= reject:
+        return REJECTED, similarity
+    return NEEDS_REVIEW, similarity
+
+
+def _grade_chunk(chunk, steps, accept, reject):
+    # Выполняется в отдельном процессе: на вход и выход только простые значения
+    return [(pk, *grade_text(response, correct, steps, accept, reject)) for pk, response, correct in chunk]
+
+
+def _pending_text_answers(batch_size):
+    rows = (
+        StudentAnswer.objects.filter(grading_status='pending', question__question_type='text')
+        .order_by('id')
+        .values_list('id', 'test_result_id', 'text_response', 'question__correct_answer')
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def autograde_text_answers(batch_size=None, processes=None, progress=None):
+    """
+    Автопроверка ожидающих текстовых ответов пачками. Пачка делится между
+    процессами пула, результаты записываются одним bulk_update, баллы
+    затронутых результатов пересчитываются. Неоднозначные ответы получают
+    статус needs_review и остаются преподавателю.
+
+    Пул процессов (`processes` > 1) нельзя создать из процесса-демона, например
+    из воркера Celery в режиме prefork: там нужен processes=0.
+
+    `progress(done)` вызывается после каждой пачки. Возвращает счетчики по статусам.
+    """
+    batch_size = batch_size or settings.AUTOGRADE_BATCH_SIZE
+    processes = settings.AUTOGRADE_PROCESSES if processes is None else processes
+    grade_chunk = partial(_grade_chunk, steps=settings.AUTOGRADE_NORMALIZATION,
+                          accept=settings.AUTOGRADE_ACCEPT_THRESHOLD, reject=settings.AUTOGRADE_REJECT_THRESHOLD)
+    totals = {APPROVED: 0, REJECTED: 0, NEEDS_REVIEW: 0}
+    executor = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    try:
+        done = 0
+        for batch in _pending_text_answers(batch_size):
+            chunk = [(pk, response, correct) for pk, _, response, correct in batch]
+            if executor is None:
+                graded = grade_chunk(chunk)
+            else:
+                size = math.ceil(len(chunk) / processes)
+                parts = [chunk[start:start + size] for start in range(0, len(chunk), size)]
+                graded = [row for part in executor.map(grade_chunk, parts) for row in part]
+
+            StudentAnswer.objects.bulk_update([
+                StudentAnswer(pk=pk, grading_status=status, similarity=similarity, is_approved=status == APPROVED)
+                for pk, status, similarity in graded
+            ], ['grading_status', 'similarity', 'is_approved'])
+            for _, status, _ in graded:
+                totals[status] += 1
+
+            # Засчитанные ответы меняют баллы результатов
+            approved_results = {result_id for (pk, result_id, _, _), (_, status, _) in zip(batch, graded)
+                                if status == APPROVED}
+            if approved_results:
+                recalculate_scores(TestResult.objects.filter(pk__in=approved_results))
+            done += len(batch)
+            if progress is not None:
+                progress(done)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return totals
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Subscription
+
+CATALOG_VERSION_KEY = 'lms:catalog:version'
+CATALOG_PAGE_KEY = 'lms:catalog:v{version}:{digest}'
+
+# Сколько секунд один процесс может собирать страницу, пока остальные ждут
+CATALOG_LOCK_TIMEOUT = 10
+CATALOG_LOCK_POLL_INTERVAL = 0.05
+
+
+def get_catalog_version():
+    """
+    Текущая версия каталога утвержденных курсов.
+
+    Начальное значение берется из времени, чтобы после потери ключа в Redis
+    версия не совпала с одной из старых и не вернула устаревшие страницы.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Инвалидирует все закешированные страницы каталога за O(1):
+    старые ключи просто перестают читаться и истекают сами.
+    """
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+        cache.incr(CATALOG_VERSION_KEY)
+
+
+def get_catalog_page(request, build_page):
+    """
+    Возвращает страницу каталога из кеша или собирает ее через `build_page()`.
+
+    Ключ зависит от версии каталога и строки запроса (страница, размер, курсор).
+    Защита от «стаи» запросов при смене версии: страницу собирает только тот,
+    кто взял блокировку, остальные ждут появления значения в кеше.
+    """
+    digest = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    key = CATALOG_PAGE_KEY.format(version=get_catalog_version(), digest=digest)
+
+    data = cache.get(key)
+    if data is not None:
+        return json.loads(data)
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, CATALOG_LOCK_TIMEOUT):
+        deadline = time.monotonic() + CATALOG_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(CATALOG_LOCK_POLL_INTERVAL)
+            data = cache.get(key)
+            if data is not None:
+                return json.loads(data)
+
+    try:
+        data = json.dumps(build_page(), cls=DjangoJSONEncoder)
+        cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return json.loads(data)
+
+
+def overlay_subscriptions(data, user):
+    """
+    Проставляет персональное поле `is_subscribed` поверх общей страницы каталога
+    одним запросом на всю страницу.
+    """
+    results = data['results']
+    if not results or 'is_subscribed' not in results[0]:
+        return data
+    course_ids = [course['id'] for course in results]
+    subscribed = set(
+        Subscription.objects.filter(user_id=user.pk, course_id__in=course_ids).values_list('course_id', flat=True)
+    )
+    for course in results:
+        course['is_subscribed'] = course['id'] in subscribed
+    return data
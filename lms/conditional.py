@@ -0,0 +1,51 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+class ConditionalRetrieveMixin:
+    """
+    ETag / Last-Modified для детального просмотра.
+
+    Вьюха описывает состояние дерева объекта в `get_tree_state()` как список
+    пар (самый новый updated_at, количество строк) по уровням дерева. Если клиент
+    прислал совпадающие If-None-Match / If-Modified-Since, отвечаем 304 без
+    сериализации. Количество строк входит в ETag, чтобы удаление дочернего
+    объекта тоже меняло его.
+    """
+
+    def get_tree_state(self, instance):
+        return [(instance.updated_at, 1)]
+
+    def get_etag_extra(self, instance):
+        # Персональные поля ответа (например, подписка) тоже должны влиять на ETag
+        return ''
+
+    def get_validators(self, instance):
+        state = self.get_tree_state(instance)
+        last_modified = max(timestamp for timestamp, _ in state if timestamp is not None)
+        raw = '|'.join(
+            # Строка запроса входит в ETag: ?fields= / ?expand= меняют представление
+            [f'{instance._meta.label}:{instance.pk}', self.request.META.get('QUERY_STRING', ''),
+             str(self.get_etag_extra(instance))]
+            + [f'{timestamp.isoformat() if timestamp else ""}:{count}' for timestamp, count in state]
+        )
+        etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        return etag, last_modified
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_validators(instance)
+        timestamp = int(last_modified.timestamp())
+
+        not_modified = get_conditional_response(request._request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(timestamp)
+        return response
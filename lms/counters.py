@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .catalog import bump_catalog_version
+from .models import Course, Lesson, Subscription
+
+
+def adjust_course_counters(course_id, subscribers=0, lessons=0):
+    """
+    Атомарно изменяет счетчики курса F-выражением, без чтения строки.
+    update() не вызывает сигналы, поэтому кеш каталога со счетчиками
+    инвалидируется здесь же после коммита.
+    """
+    changes = {}
+    if subscribers:
+        changes['subscribers_count'] = F('subscribers_count') + subscribers
+    if lessons:
+        changes['lessons_count'] = F('lessons_count') + lessons
+    if changes and Course.objects.filter(pk=course_id).update(**changes):
+        transaction.on_commit(bump_catalog_version)
+
+
+def _count_subquery(model):
+    counts = model.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(n=Count('pk'))
+    return Coalesce(Subquery(counts.values('n')), 0)
+
+
+def refresh_course_counters(queryset=None):
+    """
+    Пересчитывает счетчики подсчетом по таблицам подписок и уроков.
+    Обновляются только расходящиеся строки; возвращает их количество.
+    """
+    if queryset is None:
+        queryset = Course.objects.all()
+    subscribers, lessons = _count_subquery(Subscription), _count_subquery(Lesson)
+    fixed = queryset.exclude(subscribers_count=subscribers, lessons_count=lessons).update(
+        subscribers_count=subscribers, lessons_count=lessons
+    )
+    if fixed:
+        # Как и в adjust_course_counters: каталог отдает счетчики из кеша
+        transaction.on_commit(bump_catalog_version)
+    return fixed
@@ -1,4 +1,8 @@
 import django_filters
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from rest_framework.filters import BaseFilterBackend
 from users.models import Payment
 
 
@@ -10,3 +14,33 @@ class PaymentFilter(django_filters.FilterSet):
     class Meta:
         model = Payment
         fields = ['paid_course', 'paid_lesson', 'payment_method']
+
+
+class CatalogSearchFilter(BaseFilterBackend):
+    """
+    Поиск по курсам и урокам: ?search=<строка>.
+
+    Полнотекстовое совпадение по search_vector (русская и английская конфигурации)
+    или триграммное сходство с названием, чтобы находить по началу слова и с
+    опечатками. Оба условия обслуживаются GIN-индексами. Фильтр применяется
+    к queryset вьюхи, поэтому ограничения по ролям сохраняются.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+
+        query = (
+            SearchQuery(term, config='russian', search_type='websearch')
+            | SearchQuery(term, config='english', search_type='websearch')
+        )
+        return (
+            queryset
+            .filter(Q(search_vector=query) | Q(title__trigram_word_similar=term))
+            # double precision: значение без потерь проходит через курсор пагинации (real — нет)
+            .annotate(search_rank=Cast(SearchRank(F('search_vector'), query) + TrigramWordSimilarity(term, 'title'),
+                                       FloatField()))
+            .order_by('-search_rank', 'id')
+        )
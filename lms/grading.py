@@ -0,0 +1,124 @@
+from functools import partial
+
+from django.db import transaction
+
+from .item_analysis import record_attempt, sync_item_stats
+from .leaderboards import rebuild_leaderboards, record_result
+from .models import StudentAnswer, TestResult, score_from_counts
+
+# Сколько результатов пересчитывается одним SELECT + bulk_update
+RESCORE_BATCH_SIZE = 1000
+
+MULTIPLE_CHOICE = 'multiple_choice'
+TEXT = 'text'
+
+
+def normalize_answer_text(value):
+    """
+    Текст ответа для сравнения: без регистра и лишних пробелов.
+    """
+    return ' '.join((value or '').casefold().split())
+
+
+def grade_answer(entry, answer):
+    """
+    Проверяет ответ по ключу ответов (см. lms.answer_keys.get_answer_key).
+    Текстовые ответы проверяются позже пакетно (lms.autograde) или преподавателем.
+    """
+    if entry['type'] == MULTIPLE_CHOICE:
+        return answer.get('selected_answer') in entry['correct']
+    return False
+
+
+def submit_attempt(quiz, student, answers, key):
+    """
+    Сохраняет попытку целиком в одной транзакции: результат с уже
+    посчитанным баллом, все ответы одним bulk_create и вклад в статистику заданий.
+    `answers` должны быть проверены по тому же ключу `key`.
+    """
+    rows, correct_count = [], 0
+    correctness = dict.fromkeys(key, False)
+    for answer in answers:
+        entry = key[answer['question']]
+        is_correct = grade_answer(entry, answer)
+        correct_count += is_correct
+        correctness[answer['question']] = is_correct
+        if entry['type'] == MULTIPLE_CHOICE:
+            grading_status = 'auto_approved' if is_correct else 'auto_rejected'
+        else:
+            grading_status = 'pending'  # текстовые ответы проверяет lms.autograde
+        rows.append(StudentAnswer(
+            question_id=answer['question'],
+            selected_answer_id=answer.get('selected_answer') if entry['type'] == MULTIPLE_CHOICE else None,
+            text_response=answer.get('text_response') if entry['type'] == TEXT else None,
+            grading_status=grading_status,
+        ))
+
+    with transaction.atomic():
+        score = score_from_counts(correct_count, len(key))
+        result = TestResult.objects.create(
+            student=student, test=quiz, score=score,
+            stats_score=score, stats_correct=[pk for pk, is_correct in correctness.items() if is_correct],
+        )
+        for row in rows:
+            row.test_result = result
+        StudentAnswer.objects.bulk_create(rows)
+        # Статистика заданий наращивается вместе с попыткой
+        record_attempt(result.score, correctness, [row.selected_answer_id for row in rows if row.selected_answer_id])
+    result.correct_count = correct_count
+    return result
+
+
+def recalculate_scores(queryset, batch_size=RESCORE_BATCH_SIZE, progress=None):
+    """
+    Массово пересчитывает баллы результатов: на пачку — один запрос с
+    аннотированными счетчиками и один bulk_update. Меняются только
+    результаты, чей балл действительно изменился.
+
+    bulk_update не вызывает сигналы, поэтому здесь же обновляются статистика
+    заданий и (после коммита) рейтинги.
+
+    `progress(done, total)` вызывается после каждой пачки. Возвращает
+    количество обновленных результатов.
+    """
+    result_ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    total, updated = len(result_ids), 0
+    for start in range(0, total, batch_size):
+        batch_ids = result_ids[start:start + batch_size]
+        batch = (
+            TestResult.objects.filter(pk__in=batch_ids)
+            .with_score_parts()
+            .values_list('pk', 'score', 'correct_count', 'questions_count',
+                         'student_id', 'test_id', 'test__course_id')
+        )
+        changed, raised, lowered_courses = [], [], set()
+        for pk, score, correct_count, questions_count, student_id, quiz_id, course_id in batch:
+            new_score = score_from_counts(correct_count, questions_count)
+            if new_score != score:
+                changed.append(TestResult(pk=pk, score=new_score))
+                if new_score > score:
+                    raised.append((student_id, quiz_id, course_id, new_score))
+                else:
+                    lowered_courses.add(course_id)
+        with transaction.atomic():
+            if changed:
+                TestResult.objects.bulk_update(changed, ['score'])
+                updated += len(changed)
+                transaction.on_commit(partial(_update_leaderboards, raised, lowered_courses))
+            # Проверка ответов могла измениться и без изменения балла
+            sync_item_stats(batch_ids)
+        if progress is not None:
+            progress(min(start + batch_size, total), total)
+    return updated
+
+
+def _update_leaderboards(raised, lowered_courses):
+    """
+    Рейтинг хранит лучший балл, поэтому выросший балл учитывается сразу,
+    а после снижения рейтинги курса пересобираются из TestResult.
+    """
+    for student_id, quiz_id, course_id, score in raised:
+        if course_id not in lowered_courses:
+            record_result(student_id, quiz_id, course_id, score)
+    if lowered_courses:
+        rebuild_leaderboards(course_ids=lowered_courses)
@@ -0,0 +1,246 @@
+from collections import defaultdict
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Prefetch
+
+from .models import (
+    CORRECT_STUDENT_ANSWER, Answer, AnswerStats, Question, QuestionStats, QuizModel, StudentAnswer, TestResult,
+)
+
+_RECORD_QUESTIONS_SQL = """
+    INSERT INTO {table} AS s
+        (question_id, attempts, correct_count, score_sum, score_sq_sum, correct_score_sum, updated_at)
+    SELECT t.question_id, 1, t.correct, %(score)s, %(score)s * %(score)s, t.correct * %(score)s, now()
+    FROM unnest(%(question_ids)s::bigint[], %(correct)s::int[]) AS t(question_id, correct)
+    ON CONFLICT (question_id) DO UPDATE SET
+        attempts = s.attempts + 1,
+        correct_count = s.correct_count + EXCLUDED.correct_count,
+        score_sum = s.score_sum + EXCLUDED.score_sum,
+        score_sq_sum = s.score_sq_sum + EXCLUDED.score_sq_sum,
+        correct_score_sum = s.correct_score_sum + EXCLUDED.correct_score_sum,
+        updated_at = now()
+"""
+
+_RECORD_ANSWERS_SQL = """
+    INSERT INTO {table} AS s (answer_id, selections)
+    SELECT answer_id, 1 FROM unnest(%s::bigint[]) AS t(answer_id)
+    ON CONFLICT (answer_id) DO UPDATE SET selections = s.selections + 1
+"""
+
+
+# Приращения могут быть отрицательными, а CHECK положительных полей проверяется
+# до ON CONFLICT: существующие строки обновляются через UPDATE, вставляются только новые
+_APPLY_DELTAS_SQL = """
+    WITH deltas AS (
+        SELECT * FROM unnest(%s::bigint[], %s::int[], %s::int[], %s::float8[], %s::float8[], %s::float8[])
+        AS t(question_id, attempts, correct_count, score_sum, score_sq_sum, correct_score_sum)
+    ), updated AS (
+        UPDATE {table} AS s SET
+            attempts = s.attempts + d.attempts,
+            correct_count = s.correct_count + d.correct_count,
+            score_sum = s.score_sum + d.score_sum,
+            score_sq_sum = s.score_sq_sum + d.score_sq_sum,
+            correct_score_sum = s.correct_score_sum + d.correct_score_sum,
+            updated_at = now()
+        FROM deltas AS d WHERE s.question_id = d.question_id
+        RETURNING s.question_id
+    )
+    INSERT INTO {table} AS s
+        (question_id, attempts, correct_count, score_sum, score_sq_sum, correct_score_sum, updated_at)
+    SELECT d.*, now() FROM deltas AS d
+    WHERE d.question_id NOT IN (SELECT question_id FROM updated)
+    ON CONFLICT (question_id) DO UPDATE SET
+        attempts = s.attempts + EXCLUDED.attempts,
+        correct_count = s.correct_count + EXCLUDED.correct_count,
+        score_sum = s.score_sum + EXCLUDED.score_sum,
+        score_sq_sum = s.score_sq_sum + EXCLUDED.score_sq_sum,
+        correct_score_sum = s.correct_score_sum + EXCLUDED.correct_score_sum,
+        updated_at = now()
+"""
+
+
+def record_attempt(score, correctness, selected_answer_ids):
+    """
+    Добавляет попытку в статистику заданий двумя запросами независимо от длины теста.
+
+    `correctness` — {question_id: bool} по всем вопросам теста (без ответа — неверно),
+    `score` — итоговый балл попытки.
+    """
+    if not correctness:
+        return
+    score = float(score)
+    with connection.cursor() as cursor:
+        cursor.execute(_RECORD_QUESTIONS_SQL.format(table=QuestionStats._meta.db_table), {
+            'score': score,
+            'question_ids': list(correctness),
+            'correct': [int(value) for value in correctness.values()],
+        })
+        if selected_answer_ids:
+            cursor.execute(_RECORD_ANSWERS_SQL.format(table=AnswerStats._meta.db_table), [list(selected_answer_ids)])
+
+
+def sync_item_stats(result_ids):
+    """
+    Приводит статистику заданий в соответствие с текущими баллами и проверкой
+    ответов результатов после перепроверки (автопроверка, ручная проверка,
+    пересчет баллов). Для каждого результата из учтенного состояния
+    (stats_score, stats_correct) и текущего вычисляется разница, и все разницы
+    применяются одним запросом. Результат, еще не учтенный в статистике,
+    добавляется как новая попытка. Возвращает число измененных результатов.
+    """
+    with transaction.atomic():
+        # Строки результатов заблокированы до записи нового учтенного состояния:
+        # одновременные перепроверки одного результата не применяют разницу дважды
+        results = list(
+            TestResult.objects.filter(pk__in=result_ids).order_by('pk').select_for_update()
+            .values_list('pk', 'test_id', 'score', 'stats_score', 'stats_correct')
+        )
+        if not results:
+            return 0
+        questions = defaultdict(list)
+        for quiz_id, question_id in Question.objects.filter(
+                test_id__in={quiz_id for _, quiz_id, _, _, _ in results}).values_list('test_id', 'id'):
+            questions[quiz_id].append(question_id)
+        correct = defaultdict(set)
+        for result_id, question_id in StudentAnswer.objects.filter(
+                test_result_id__in=[pk for pk, *_ in results]).filter(CORRECT_STUDENT_ANSWER).values_list(
+                'test_result_id', 'question_id'):
+            correct[result_id].add(question_id)
+
+        deltas = defaultdict(lambda: [0, 0, 0.0, 0.0, 0.0])
+        changed = []
+        for pk, quiz_id, score, stats_score, stats_correct in results:
+            counted = stats_score is not None
+            old_correct, new_correct = set(stats_correct or ()), correct[pk]
+            if counted and stats_score == score and old_correct == new_correct:
+                continue
+            old, new = float(stats_score or 0), float(score)
+            for question_id in questions[quiz_id]:
+                was_correct = counted and question_id in old_correct
+                is_correct = question_id in new_correct
+                delta = deltas[question_id]
+                delta[0] += not counted
+                delta[1] += is_correct - was_correct
+                delta[2] += new - old
+                delta[3] += new * new - old * old
+                delta[4] += is_correct * new - was_correct * old
+            changed.append(TestResult(pk=pk, stats_score=score, stats_correct=sorted(new_correct)))
+
+        if deltas:
+            # Строки статистики — в порядке id, чтобы параллельные вызовы не взаимоблокировались
+            question_ids = sorted(deltas)
+            with connection.cursor() as cursor:
+                cursor.execute(_APPLY_DELTAS_SQL.format(table=QuestionStats._meta.db_table),
+                               [question_ids, *map(list, zip(*(deltas[pk] for pk in question_ids)))])
+        if changed:
+            TestResult.objects.bulk_update(changed, ['stats_score', 'stats_correct'])
+        return len(changed)
+
+
+def rebuild_item_stats(quiz_ids=None):
+    """
+    Полностью пересчитывает статистику заданий по StudentAnswer — для заполнения
+    истории и исправления расхождений после перепроверок. Тесты обрабатываются
+    по одному, вычисления векторизованы. Возвращает число обработанных тестов.
+    """
+    quizzes = QuizModel.objects.order_by('id').values_list('id', flat=True)
+    if quiz_ids is not None:
+        quizzes = quizzes.filter(id__in=quiz_ids)
+    processed = 0
+    for quiz_id in quizzes.iterator():
+        _rebuild_quiz(quiz_id)
+        processed += 1
+    return processed
+
+
+def _rebuild_quiz(quiz_id):
+    question_ids = np.array(
+        Question.objects.filter(test_id=quiz_id).order_by('id').values_list('id', flat=True), dtype=np.int64
+    )
+    results = list(TestResult.objects.filter(test_id=quiz_id).order_by('id').values_list('id', 'score'))
+    result_ids = np.array([pk for pk, _ in results], dtype=np.int64)
+    scores = np.array([float(score) for _, score in results], dtype=np.float64)
+
+    # Матрица «попытка × вопрос»: верно ли ответил студент (нет ответа — неверно)
+    correct = np.zeros((len(result_ids), len(question_ids)), dtype=bool)
+    rows = list(
+        StudentAnswer.objects.filter(test_result__test_id=quiz_id, question__test_id=quiz_id).values_list(
+            'test_result_id', 'question_id', 'selected_answer_id', 'selected_answer__is_correct',
+            'is_approved', 'question__question_type',
+        )
+    )
+    selected = np.empty(0, dtype=np.int64)
+    if rows:
+        result_col, question_col, answer_col, answer_correct, approved, types = zip(*rows)
+        is_text = np.array(types) == 'text'
+        flags = np.where(is_text, np.array(approved, dtype=bool),
+                         np.array([bool(value) for value in answer_correct], dtype=bool))
+        r_idx = np.searchsorted(result_ids, np.array(result_col, dtype=np.int64))
+        q_idx = np.searchsorted(question_ids, np.array(question_col, dtype=np.int64))
+        np.logical_or.at(correct, (r_idx, q_idx), flags)
+        selected = np.array([pk for pk in answer_col if pk is not None], dtype=np.int64)
+
+    correct_counts = correct.sum(axis=0)
+    correct_score_sums = scores @ correct if len(scores) else np.zeros(len(question_ids))
+    answer_ids, selections = np.unique(selected, return_counts=True)
+
+    with transaction.atomic():
+        # Учтенное состояние результатов — то, по которому собрана статистика
+        TestResult.objects.bulk_update([
+            TestResult(pk=int(result_id), stats_score=score, stats_correct=question_ids[row].tolist())
+            for (result_id, score), row in zip(results, correct)
+        ], ['stats_score', 'stats_correct'], batch_size=1000)
+        QuestionStats.objects.filter(question__test_id=quiz_id).delete()
+        AnswerStats.objects.filter(answer__question__test_id=quiz_id).delete()
+        if len(results):
+            QuestionStats.objects.bulk_create([
+                QuestionStats(
+                    question_id=int(question_id), attempts=len(results), correct_count=int(correct_count),
+                    score_sum=float(scores.sum()), score_sq_sum=float((scores * scores).sum()),
+                    correct_score_sum=float(correct_score_sum),
+                )
+                for question_id, correct_count, correct_score_sum in zip(question_ids, correct_counts,
+                                                                        correct_score_sums)
+            ])
+        existing = set(Answer.objects.filter(pk__in=answer_ids.tolist()).values_list('pk', flat=True))
+        AnswerStats.objects.bulk_create([
+            AnswerStats(answer_id=int(answer_id), selections=int(count))
+            for answer_id, count in zip(answer_ids, selections) if int(answer_id) in existing
+        ])
+
+
+def item_analysis_report(quiz_id):
+    """
+    Отчет по заданиям теста для преподавателя: по вопросу — попытки, доля
+    верных ответов и дискриминация, по варианту — частота выбора.
+    """
+    questions = Question.objects.filter(test_id=quiz_id).order_by('id').select_related('stats').prefetch_related(
+        Prefetch('answers', queryset=Answer.objects.order_by('id').select_related('stats'))
+    )
+    report = []
+    for question in questions:
+        stats = getattr(question, 'stats', None) or QuestionStats(question=question)
+        discrimination = stats.discrimination
+        report.append({
+            'id': question.pk,
+            'text': question.text,
+            'question_type': question.question_type,
+            'attempts': stats.attempts,
+            'correct_rate': stats.correct_rate,
+            'discrimination': round(discrimination, 4) if discrimination is not None else None,
+            'answers': [_answer_report(answer, stats.attempts) for answer in question.answers.all()],
+        })
+    return report
+
+
+def _answer_report(answer, attempts):
+    stats = getattr(answer, 'stats', None)
+    selections = stats.selections if stats else 0
+    return {
+        'id': answer.pk,
+        'text': answer.text,
+        'is_correct': answer.is_correct,
+        'selections': selections,
+        'selection_rate': selections / attempts if attempts else None,
+    }
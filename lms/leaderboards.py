@@ -0,0 +1,210 @@
+import logging
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+import redis
+from django.conf import settings
+from django.db.models import Max
+
+from .models import QuizModel, TestResult
+
+logger = logging.getLogger(__name__)
+
+# v2: баллы хранятся со знаком минус, id студентов дополнены нулями (см. RedisLeaderboardBackend)
+QUIZ_LEADERBOARD_KEY = 'lms:leaderboard:v2:quiz:{quiz_id}'
+COURSE_LEADERBOARD_KEY = 'lms:leaderboard:v2:course:{course_id}'
+
+# Лучший балл студента за тест; если он вырос, разница добавляется к сумме по курсу.
+# Баллы в sorted set отрицательные. Выполняется в Redis атомарно.
+_RECORD_BEST_SCRIPT = """
+local old = redis.call('ZSCORE', KEYS[1], ARGV[1])
+local new = tonumber(ARGV[2])
+if old and -tonumber(old) >= new then
+    return 0
+end
+redis.call('ZADD', KEYS[1], -new, ARGV[1])
+redis.call('ZINCRBY', KEYS[2], -(new + (tonumber(old) or 0)), ARGV[1])
+return 1
+"""
+
+
+class RedisLeaderboardBackend:
+    """
+    Рейтинги в sorted set Redis: место студента — ZRANK за O(log n).
+
+    При равных баллах выше студент с меньшим id, как в MemoryLeaderboardBackend.
+    Redis упорядочивает равные баллы по строке участника, поэтому баллы хранятся
+    со знаком минус (ZRANGE по возрастанию), а id дополняются нулями до одной длины.
+    """
+
+    def __init__(self, url):
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self._record_best = self.client.register_script(_RECORD_BEST_SCRIPT)
+
+    @staticmethod
+    def _member(student_id):
+        return f'{student_id:012d}'
+
+    def record_best(self, quiz_key, course_key, member, score):
+        return bool(self._record_best(keys=[quiz_key, course_key], args=[self._member(member), score]))
+
+    def rank(self, key, member):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrank(key, self._member(member))
+        pipe.zscore(key, self._member(member))
+        rank, score = pipe.execute()
+        return rank, -score if score is not None else None
+
+    def top(self, key, offset, limit):
+        rows = self.client.zrange(key, offset, offset + limit - 1, withscores=True)
+        return [(int(member), -score) for member, score in rows]
+
+    def count(self, key):
+        return self.client.zcard(key)
+
+    def replace(self, key, scores):
+        # Новый рейтинг собирается во временном ключе и подменяет старый атомарно
+        tmp_key = f'{key}:rebuild'
+        pipe = self.client.pipeline()
+        pipe.delete(tmp_key)
+        if scores:
+            pipe.zadd(tmp_key, {self._member(member): -score for member, score in scores.items()})
+            pipe.rename(tmp_key, key)
+        else:
+            pipe.delete(key)
+        pipe.execute()
+
+
+class MemoryLeaderboardBackend:
+    """
+    Рейтинги в памяти процесса — для тестов и разработки без Redis.
+    Каждый рейтинг — словарь баллов и отсортированный список (-балл, студент):
+    при равных баллах выше студент с меньшим id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._scores = defaultdict(dict)
+        self._orders = defaultdict(list)
+
+    def _set(self, key, member, score):
+        scores, order = self._scores[key], self._orders[key]
+        old = scores.get(member)
+        if old is not None:
+            del order[bisect_left(order, (-old, member))]
+        scores[member] = score
+        insort(order, (-score, member))
+
+    def record_best(self, quiz_key, course_key, member, score):
+        with self._lock:
+            old = self._scores[quiz_key].get(member)
+            if old is not None and old >= score:
+                return False
+            self._set(quiz_key, member, score)
+            self._set(course_key, member, self._scores[course_key].get(member, 0) + score - (old or 0))
+            return True
+
+    def rank(self, key, member):
+        score = self._scores[key].get(member)
+        if score is None:
+            return None, None
+        return bisect_left(self._orders[key], (-score, member)), score
+
+    def top(self, key, offset, limit):
+        return [(member, -score) for score, member in self._orders[key][offset:offset + limit]]
+
+    def count(self, key):
+        return len(self._scores[key])
+
+    def replace(self, key, scores):
+        with self._lock:
+            self._scores.pop(key, None)
+            self._orders.pop(key, None)
+            for member, score in scores.items():
+                self._set(key, member, score)
+
+
+_memory_backend = MemoryLeaderboardBackend()
+_redis_backends = {}
+
+
+def get_leaderboard_backend():
+    """
+    Redis по LEADERBOARD_REDIS_URL; если адрес не задан — рейтинги в памяти процесса.
+    """
+    url = settings.LEADERBOARD_REDIS_URL
+    if not url:
+        return _memory_backend
+    if url not in _redis_backends:
+        _redis_backends[url] = RedisLeaderboardBackend(url)
+    return _redis_backends[url]
+
+
+def record_result(student_id, quiz_id, course_id, score):
+    """
+    Учитывает результат в рейтингах теста и курса. Рейтинг — производные данные:
+    при недоступном Redis ошибка только логируется, восстановит rebuild_leaderboards.
+    """
+    try:
+        get_leaderboard_backend().record_best(
+            QUIZ_LEADERBOARD_KEY.format(quiz_id=quiz_id), COURSE_LEADERBOARD_KEY.format(course_id=course_id),
+            student_id, float(score),
+        )
+    except redis.RedisError:
+        logger.exception("Не удалось обновить рейтинг теста %s", quiz_id)
+
+
+def get_leaderboard_page(key, student_id, offset, limit):
+    """
+    Страница рейтинга (места с 1) и место запрашивающего студента.
+    При недоступном Redis возвращается пустая страница.
+    """
+    backend = get_leaderboard_backend()
+    try:
+        rows = backend.top(key, offset, limit)
+        rank, score = backend.rank(key, student_id)
+        count = backend.count(key)
+    except redis.RedisError:
+        logger.exception("Не удалось прочитать рейтинг %s", key)
+        rows, rank, count = [], None, 0
+    return {
+        'count': count,
+        'results': [
+            {'rank': offset + position + 1, 'student': member, 'score': score}
+            for position, (member, score) in enumerate(rows)
+        ],
+        'me': {'rank': rank + 1, 'score': score} if rank is not None else None,
+    }
+
+
+def rebuild_leaderboards(course_ids=None):
+    """
+    Пересобирает рейтинги из TestResult: лучший балл за тест и их сумма по курсу.
+    Возвращает количество пересобранных курсов.
+    """
+    quizzes = QuizModel.objects.order_by('course_id', 'id')
+    if course_ids is not None:
+        quizzes = quizzes.filter(course_id__in=course_ids)
+    quiz_courses = dict(quizzes.values_list('id', 'course_id'))
+
+    quiz_scores = defaultdict(dict)
+    # У курсов без результатов рейтинг тоже пересобирается — то есть очищается
+    course_scores = {course_id: defaultdict(float) for course_id in set(quiz_courses.values())}
+    best = (
+        TestResult.objects.filter(test_id__in=list(quiz_courses)).order_by()
+        .values_list('test_id', 'student_id').annotate(best=Max('score'))
+    )
+    for quiz_id, student_id, score in best.iterator():
+        quiz_scores[quiz_id][student_id] = float(score)
+        course_scores[quiz_courses[quiz_id]][student_id] += float(score)
+
+    backend = get_leaderboard_backend()
+    for quiz_id in quiz_courses:
+        backend.replace(QUIZ_LEADERBOARD_KEY.format(quiz_id=quiz_id), quiz_scores[quiz_id])
+    for course_id, scores in course_scores.items():
+        backend.replace(COURSE_LEADERBOARD_KEY.format(course_id=course_id), dict(scores))
+    return len(course_scores)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from lms.autograde import autograde_text_answers
+
+
+class Command(BaseCommand):
+    help = "Автопроверка ожидающих текстовых ответов с пулом процессов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.AUTOGRADE_PROCESSES,
+                            help="Размер пула процессов; 0 или 1 — проверка в текущем процессе")
+        parser.add_argument('--batch-size', type=int, default=settings.AUTOGRADE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        totals = autograde_text_answers(
+            batch_size=options['batch_size'], processes=options['processes'],
+            progress=lambda done: self.stdout.write(f"Проверено: {done}"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Засчитано: {totals['auto_approved']}, не засчитано: {totals['auto_rejected']}, "
+            f"на проверку: {totals['needs_review']}"
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from lms.models import Course
+from lms.visibility import refresh_visibility
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает флаг is_public у курсов и уроков по членству владельцев в группе Администратор"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Количество владельцев в одной пачке")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        owner_ids = Course.objects.order_by('owner_id').values_list('owner_id', flat=True).distinct()
+
+        # Пачками по владельцам, чтобы не держать долгие блокировки на всей таблице
+        batch, processed = [], 0
+        for owner_id in owner_ids.iterator():
+            batch.append(owner_id)
+            if len(batch) >= batch_size:
+                refresh_visibility(batch)
+                processed += len(batch)
+                batch = []
+        if batch:
+            refresh_visibility(batch)
+            processed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Видимость пересчитана для владельцев: {processed}"))
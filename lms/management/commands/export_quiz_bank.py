@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from lms.models import Course, QuizModel
+from lms.quiz_exchange import iter_ndjson
+
+
+class Command(BaseCommand):
+    help = "Выгружает все тесты курса с вопросами и вариантами ответов в NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, required=True, help="id курса")
+        parser.add_argument('--output', help="путь к файлу; по умолчанию — стандартный вывод")
+
+    def handle(self, *args, **options):
+        if not Course.objects.filter(pk=options['course']).exists():
+            raise CommandError(f"Курс {options['course']} не найден.")
+        quizzes = QuizModel.objects.filter(course_id=options['course']).order_by('id')
+
+        if options['output'] is None:
+            for line in iter_ndjson(quizzes):
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.writelines(iter_ndjson(quizzes))
+        self.stderr.write(self.style.SUCCESS(f"Тесты курса выгружены в {options['output']}"))
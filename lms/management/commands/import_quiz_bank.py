@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from lms.models import Course
+from lms.quiz_exchange import QuizFormatError, import_quizzes, read_ndjson
+
+
+class Command(BaseCommand):
+    help = "Загружает тесты из NDJSON-файла в курс одной транзакцией"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON-файл, выгруженный export_quiz_bank")
+        parser.add_argument('--course', type=int, required=True, help="id курса, в который загружаются тесты")
+        parser.add_argument('--owner', help="email владельца тестов; по умолчанию — владелец курса")
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(pk=options['course']).select_related('owner').first()
+        if course is None:
+            raise CommandError(f"Курс {options['course']} не найден.")
+        owner = course.owner
+        if options['owner']:
+            owner = get_user_model().objects.filter(email=options['owner']).first()
+            if owner is None:
+                raise CommandError(f"Пользователь {options['owner']} не найден.")
+
+        try:
+            with open(options['path'], 'rb') as upload, transaction.atomic():
+                imported = import_quizzes(read_ndjson(upload), course, owner)
+        except (QuizFormatError, UnicodeDecodeError) as exc:
+            raise CommandError(str(exc))
+
+        for quiz, questions, answers in imported:
+            self.stdout.write(f"{quiz.pk}: {quiz.title} — вопросов {questions}, вариантов ответов {answers}")
+        self.stdout.write(self.style.SUCCESS(f"Загружено тестов: {len(imported)}"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from lms.item_analysis import rebuild_item_stats
+
+
+class Command(BaseCommand):
+    help = "Полностью пересчитывает статистику вопросов и вариантов ответов по ответам студентов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, action='append', dest='quiz_ids',
+                            help="id теста (можно указать несколько раз); по умолчанию — все тесты")
+
+    def handle(self, *args, **options):
+        processed = rebuild_item_stats(options['quiz_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Статистика пересчитана для тестов: {processed}"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from lms.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = "Пересобирает рейтинги студентов по тестам и курсам из результатов в базе данных"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append', dest='course_ids',
+                            help="id курса (можно указать несколько раз); по умолчанию — все курсы")
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_leaderboards(options['course_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Рейтинги пересобраны для курсов: {rebuilt}"))
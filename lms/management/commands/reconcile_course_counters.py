@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from lms.counters import refresh_course_counters
+from lms.models import Course
+
+
+class Command(BaseCommand):
+    help = "Сверяет счетчики подписчиков и уроков курсов с реальными данными и исправляет расхождения"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Количество курсов в одной пачке")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        course_ids = Course.objects.order_by('id').values_list('id', flat=True)
+
+        # Пачками по диапазонам id, чтобы не блокировать всю таблицу курсов
+        batch, fixed = [], 0
+        for course_id in course_ids.iterator():
+            batch.append(course_id)
+            if len(batch) >= batch_size:
+                fixed += refresh_course_counters(Course.objects.filter(id__range=(batch[0], batch[-1])))
+                batch = []
+        if batch:
+            fixed += refresh_course_counters(Course.objects.filter(id__range=(batch[0], batch[-1])))
+
+        self.stdout.write(self.style.SUCCESS(f"Исправлено счетчиков курсов: {fixed}"))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+
+
+def backfill_visibility(apps, schema_editor):
+    Course = apps.get_model('lms', 'Course')
+    Lesson = apps.get_model('lms', 'Lesson')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Course.objects.update(is_public=Exists(
+        User.groups.through.objects.filter(user_id=OuterRef('owner_id'), group__name='Администратор')
+    ))
+    Lesson.objects.update(is_public=Subquery(
+        Course.objects.filter(pk=OuterRef('course_id')).values('is_public')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0008_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='is_public',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Публичный'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='is_public',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Публичный'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['id'], name='lesson_public_idx'),
+        ),
+        migrations.RunPython(backfill_visibility, migrations.RunPython.noop),
+    ]
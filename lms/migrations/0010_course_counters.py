@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Course = apps.get_model('lms', 'Course')
+
+    def count_of(model_name):
+        model = apps.get_model('lms', model_name)
+        counts = model.objects.filter(course=OuterRef('pk')).order_by().values('course').annotate(n=Count('pk'))
+        return Coalesce(Subquery(counts.values('n')), 0)
+
+    Course.objects.update(subscribers_count=count_of('Subscription'), lessons_count=count_of('Lesson'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0009_lesson_visibility'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='lessons_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Уроков'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['-subscribers_count', '-id'], name='course_approved_popular_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0010_course_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingCourseUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_updated_at', models.DateTimeField(verbose_name='Первое обновление в окне')),
+                ('last_updated_at', models.DateTimeField(verbose_name='Последнее обновление')),
+                ('updates_count', models.PositiveIntegerField(default=1, verbose_name='Количество обновлений')),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_update', to='lms.course', verbose_name='Курс')),
+            ],
+            options={
+                'verbose_name': 'Ожидающее уведомление',
+                'verbose_name_plural': 'Ожидающие уведомления',
+                'indexes': [models.Index(fields=['first_updated_at'], name='pending_update_first_idx')],
+            },
+        ),
+    ]
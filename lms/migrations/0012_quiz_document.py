@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0011_pending_course_update'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizDocument',
+            fields=[
+                ('quiz', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='document', serialize=False, to='lms.quizmodel', verbose_name='Тест')),
+                ('content', models.JSONField(verbose_name='Документ')),
+                ('built_at', models.DateTimeField(auto_now=True, verbose_name='Дата сборки')),
+            ],
+            options={
+                'verbose_name': 'Документ теста',
+                'verbose_name_plural': 'Документы тестов',
+            },
+        ),
+    ]
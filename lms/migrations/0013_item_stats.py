@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0012_quiz_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerStats',
+            fields=[
+                ('answer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='lms.answer', verbose_name='Вариант ответа')),
+                ('selections', models.PositiveIntegerField(default=0, verbose_name='Выборов')),
+            ],
+            options={
+                'verbose_name': 'Статистика варианта ответа',
+                'verbose_name_plural': 'Статистика вариантов ответов',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='lms.question', verbose_name='Вопрос')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток')),
+                ('correct_count', models.PositiveIntegerField(default=0, verbose_name='Верных ответов')),
+                ('score_sum', models.FloatField(default=0, verbose_name='Сумма баллов')),
+                ('score_sq_sum', models.FloatField(default=0, verbose_name='Сумма квадратов баллов')),
+                ('correct_score_sum', models.FloatField(default=0, verbose_name='Сумма баллов верно ответивших')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Статистика вопроса',
+                'verbose_name_plural': 'Статистика вопросов',
+            },
+        ),
+    ]
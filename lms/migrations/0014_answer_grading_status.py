@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+def backfill_grading_status(apps, schema_editor):
+    # Ответы с выбором уже проверены при сохранении; подтвержденные текстовые — вручную
+    StudentAnswer = apps.get_model('lms', 'StudentAnswer')
+    choice = StudentAnswer.objects.filter(question__question_type='multiple_choice')
+    choice.filter(selected_answer__is_correct=True).update(grading_status='auto_approved')
+    choice.exclude(selected_answer__is_correct=True).update(grading_status='auto_rejected')
+    StudentAnswer.objects.filter(question__question_type='text', is_approved=True).update(grading_status='reviewed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0013_item_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentanswer',
+            name='grading_status',
+            field=models.CharField(choices=[('pending', 'Ожидает проверки'), ('auto_approved', 'Засчитан автоматически'), ('auto_rejected', 'Не засчитан автоматически'), ('needs_review', 'Нужна проверка преподавателем'), ('reviewed', 'Проверен вручную')], default='pending', max_length=20, verbose_name='Статус проверки'),
+        ),
+        migrations.AddField(
+            model_name='studentanswer',
+            name='similarity',
+            field=models.FloatField(blank=True, null=True, verbose_name='Сходство с правильным ответом'),
+        ),
+        migrations.RunPython(backfill_grading_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='studentanswer',
+            index=models.Index(condition=models.Q(('grading_status', 'pending')), fields=['id'], name='studentanswer_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:29
+
+import django.contrib.postgres.fields
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def snapshot_current_state(apps, schema_editor):
+    # Считаем, что статистика заданий отражает текущее состояние результатов
+    # (как после rebuild_item_stats); дальше перепроверки добавляют только разницу
+    TestResult = apps.get_model('lms', 'TestResult')
+    StudentAnswer = apps.get_model('lms', 'StudentAnswer')
+    correct = (
+        StudentAnswer.objects.filter(test_result=OuterRef('pk'))
+        .filter(Q(question__question_type='multiple_choice', selected_answer__is_correct=True)
+                | Q(question__question_type='text', is_approved=True))
+        .order_by().values('test_result').annotate(ids=ArrayAgg('question_id', distinct=True)).values('ids')
+    )
+    empty = Value([], output_field=django.contrib.postgres.fields.ArrayField(models.BigIntegerField()))
+    TestResult.objects.update(stats_score=F('score'), stats_correct=Coalesce(Subquery(correct), empty))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0015_course_stripe_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testresult',
+            name='stats_correct',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='testresult',
+            name='stats_score',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=5, null=True),
+        ),
+        migrations.RunPython(snapshot_current_state, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,44 @@
+import math
+from decimal import Decimal
+
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+
+
+def search_vector_expression():
+    """
+    Поисковый вектор по названию (вес A) и описанию (вес B) на русском и английском.
+    """
+    return (
+        SearchVector('title', config='russian', weight='A')
+        + SearchVector('title', config='english', weight='A')
+        + SearchVector('description', config='russian', weight='B')
+        + SearchVector('description', config='english', weight='B')
+    )
+
+
+class CourseQuerySet(models.QuerySet):
+    """
+    Набор запросов для курсов с аннотациями для списка и детального просмотра.
+    Значения считаются в одном запросе, а не отдельным запросом на каждую строку.
+    """
+
+    def with_subscription(self, user):
+        return self.annotate(
+            is_subscribed=models.Exists(
+                Subscription.objects.filter(user_id=user.pk, course=models.OuterRef('pk'))
+            )
+        )
+
+    def with_lessons(self):
+        # Все уроки страницы загружаются одним дополнительным запросом
+        return self.prefetch_related(
+            models.Prefetch('lessons', queryset=Lesson.objects.order_by('id'))
+        )
 
 
 class Course(models.Model):
@@ -18,14 +57,54 @@ class Course(models.Model):
         related_name='owned_courses',
         verbose_name="Владелец"
     )
+    # Счетчики меняются только F-выражениями (см. lms.counters), сверка — reconcile_course_counters
+    subscribers_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Подписчиков")
+    lessons_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Уроков")
+    # Владелец курса — Администратор; поддерживается сигналами (см. lms.visibility)
+    is_public = models.BooleanField(default=False, editable=False, verbose_name="Публичный")
+    # Продукт и цена в Stripe; цена пересоздается при оплате, только если изменилась price (см. users.services)
+    stripe_product_id = models.CharField(max_length=255, blank=True, null=True, editable=False)
+    stripe_price_id = models.CharField(max_length=255, blank=True, null=True, editable=False)
+    stripe_price_amount = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Поддерживается самой БД при любой записи, включая bulk_create и update()
+    search_vector = models.GeneratedField(
+        expression=search_vector_expression(),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = CourseQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Курс"
         verbose_name_plural = "Курсы"
+        indexes = [
+            GinIndex(fields=['search_vector'], name='course_search_vector_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='course_title_trgm_idx'),
+            # Каталог для студентов: только утвержденные курсы в порядке id
+            models.Index(fields=['id'], condition=models.Q(status='approved'), name='course_approved_idx'),
+            # Сортировка каталога «самые популярные»
+            models.Index(fields=['-subscribers_count', '-id'], condition=models.Q(status='approved'),
+                         name='course_approved_popular_idx'),
+        ]
+
+    COUNTER_FIELDS = ('subscribers_count', 'lessons_count')
+    STRIPE_FIELDS = ('stripe_product_id', 'stripe_price_id', 'stripe_price_amount')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Обычное сохранение не перезаписывает счетчики и идентификаторы Stripe устаревшими значениями из памяти
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated
+                and field.name not in self.COUNTER_FIELDS + self.STRIPE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Lesson(models.Model):
     STATUS_CHOICES = [
@@ -36,18 +115,39 @@ class Lesson(models.Model):
     description = models.TextField(verbose_name="Описание")
     preview = models.ImageField(upload_to='lessons/', blank=True, null=True, verbose_name="Превью")
     video_url = models.URLField(max_length=255, verbose_name="Ссылка на видео")
-    course = models.ForeignKey(Course, related_name='lessons', on_delete=models.CASCADE, verbose_name="Курс")
+    # Индексы по course и owner заменены составными в Meta.indexes
+    course = models.ForeignKey(Course, related_name='lessons', on_delete=models.CASCADE, verbose_name="Курс",
+                               db_index=False)
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='owned_lessons',
-        verbose_name="Владелец"
+        verbose_name="Владелец",
+        db_index=False,
     )
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='unapproved', verbose_name="Статус")
+    # Копия Course.is_public: список уроков для студентов фильтруется без join по группам
+    is_public = models.BooleanField(default=False, editable=False, verbose_name="Публичный")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Поддерживается самой БД при любой записи, включая bulk_create и update()
+    search_vector = models.GeneratedField(
+        expression=search_vector_expression(),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     class Meta:
         verbose_name = "Урок"
         verbose_name_plural = "Уроки"
+        indexes = [
+            GinIndex(fields=['search_vector'], name='lesson_search_vector_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='lesson_title_trgm_idx'),
+            # Уроки курса (Prefetch в CourseViewSet) и уроки преподавателя, в порядке id
+            models.Index(fields=['course', 'id'], name='lesson_course_id_idx'),
+            models.Index(fields=['owner', 'id'], name='lesson_owner_id_idx'),
+            # Уроки, доступные студентам
+            models.Index(fields=['id'], condition=models.Q(is_public=True), name='lesson_public_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -57,21 +157,60 @@ class Subscription(models.Model):
     """
         Модель подписки на курс.
     """
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='subscriptions', verbose_name="Пользователь")
-    course = models.ForeignKey('Course', on_delete=models.CASCADE, related_name='subscribers', verbose_name="Курс")
+    # Поиск по user покрывает unique_together (user, course), по course — индекс (course, user)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='subscriptions', verbose_name="Пользователь",
+                             db_index=False)
+    course = models.ForeignKey('Course', on_delete=models.CASCADE, related_name='subscribers', verbose_name="Курс",
+                               db_index=False)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата подписки")
 
     class Meta:
         unique_together = ('user', 'course')
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        indexes = [
+            # Рассылка подписчикам курса читает только индекс
+            models.Index(fields=['course', 'user'], name='subscription_course_user_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} подписан на {self.course}"
 
+
+class PendingCourseUpdate(models.Model):
+    """
+    Отложенное уведомление об обновлении курса. Повторные сохранения курса
+    в пределах окна только увеличивают счетчик; рассылку делает flush_course_updates.
+    """
+    course = models.OneToOneField('Course', on_delete=models.CASCADE, related_name='pending_update',
+                                  verbose_name="Курс")
+    first_updated_at = models.DateTimeField(verbose_name="Первое обновление в окне")
+    last_updated_at = models.DateTimeField(verbose_name="Последнее обновление")
+    updates_count = models.PositiveIntegerField(default=1, verbose_name="Количество обновлений")
+
+    class Meta:
+        verbose_name = "Ожидающее уведомление"
+        verbose_name_plural = "Ожидающие уведомления"
+        indexes = [
+            models.Index(fields=['first_updated_at'], name='pending_update_first_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.course}: {self.updates_count} обновл."
+
 # УЧЕБНЫЕ ТЕСТЫ
 
 
+class QuizQuerySet(models.QuerySet):
+    def with_questions(self):
+        # Вопросы и варианты ответов всей выборки — двумя дополнительными запросами
+        return self.prefetch_related(
+            models.Prefetch('questions', queryset=Question.objects.order_by('id').prefetch_related(
+                models.Prefetch('answers', queryset=Answer.objects.order_by('id'))
+            ))
+        )
+
+
 class QuizModel(models.Model):
     """
             Модель для тестов, привязанных к курсу.
@@ -86,6 +225,9 @@ class QuizModel(models.Model):
     title = models.CharField(max_length=255, verbose_name="Название теста")
     description = models.TextField(blank=True, null=True, verbose_name="Описание")
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    objects = QuizQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Проверочный тест знаний"
@@ -113,6 +255,7 @@ class Question(models.Model):
         verbose_name="Владелец"
     )
     correct_answer = models.CharField(max_length=255, verbose_name="Правильный ответ", null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     class Meta:
         verbose_name = "Вопрос"
@@ -136,6 +279,7 @@ class Answer(models.Model):
         verbose_name="Владелец"
     )
     correct_answer = models.CharField(max_length=255, verbose_name="Правильный ответ", null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     class Meta:
         verbose_name = "Ответ"
@@ -145,37 +289,158 @@ class Answer(models.Model):
         return self.text
 
 
+class QuizDocument(models.Model):
+    """
+    Заранее отрендеренный документ утвержденного теста для студентов
+    (без правильных ответов). Пересобирается фоновой задачей при изменении
+    теста, см. lms.quiz_documents.
+    """
+    quiz = models.OneToOneField(QuizModel, on_delete=models.CASCADE, primary_key=True, related_name='document',
+                                verbose_name="Тест")
+    content = models.JSONField(verbose_name="Документ")
+    built_at = models.DateTimeField(auto_now=True, verbose_name="Дата сборки")
+
+    class Meta:
+        verbose_name = "Документ теста"
+        verbose_name_plural = "Документы тестов"
+
+    def __str__(self):
+        return f"Документ {self.quiz}"
+
+
+class QuestionStats(models.Model):
+    """
+    Статистика вопроса для анализа заданий. Хранятся только суммы, которые
+    можно наращивать при каждой попытке; доли и дискриминация вычисляются из них.
+    Обновляется в lms.item_analysis.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats',
+                                    verbose_name="Вопрос")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    correct_count = models.PositiveIntegerField(default=0, verbose_name="Верных ответов")
+    # Суммы баллов за тест: всех попыток, их квадратов и попыток с верным ответом
+    score_sum = models.FloatField(default=0, verbose_name="Сумма баллов")
+    score_sq_sum = models.FloatField(default=0, verbose_name="Сумма квадратов баллов")
+    correct_score_sum = models.FloatField(default=0, verbose_name="Сумма баллов верно ответивших")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Статистика вопроса"
+        verbose_name_plural = "Статистика вопросов"
+
+    def __str__(self):
+        return f"Статистика: {self.question}"
+
+    @property
+    def correct_rate(self):
+        return self.correct_count / self.attempts if self.attempts else None
+
+    @property
+    def discrimination(self):
+        """
+        Точечно-бисериальная корреляция верности ответа с баллом за тест.
+        """
+        n, n1 = self.attempts, self.correct_count
+        if not n or n1 in (0, n):
+            return None
+        mean = self.score_sum / n
+        variance = self.score_sq_sum / n - mean * mean
+        if variance <= 1e-12:
+            return None
+        correct_mean = self.correct_score_sum / n1
+        wrong_mean = (self.score_sum - self.correct_score_sum) / (n - n1)
+        p = n1 / n
+        return (correct_mean - wrong_mean) / math.sqrt(variance) * math.sqrt(p * (1 - p))
+
+
+class AnswerStats(models.Model):
+    """
+    Сколько раз выбирали вариант ответа (частота выбора дистрактора).
+    """
+    answer = models.OneToOneField(Answer, on_delete=models.CASCADE, primary_key=True, related_name='stats',
+                                  verbose_name="Вариант ответа")
+    selections = models.PositiveIntegerField(default=0, verbose_name="Выборов")
+
+    class Meta:
+        verbose_name = "Статистика варианта ответа"
+        verbose_name_plural = "Статистика вариантов ответов"
+
+    def __str__(self):
+        return f"Статистика: {self.answer}"
+
+
 # ХРАНЕНИЕ РЕЗУЛЬТАТОВ УЧЕБНЫХ ТЕСТОВ
+def score_from_counts(correct_count, questions_count):
+    """
+    Балл в процентах с двумя знаками, как хранится в TestResult.score.
+    """
+    if not questions_count:
+        return Decimal('0.00')
+    return (Decimal(correct_count) * 100 / questions_count).quantize(Decimal('0.01'))
+
+
+# Условие верного ответа студента: выбран верный вариант или текстовый ответ засчитан
+CORRECT_STUDENT_ANSWER = (
+    models.Q(question__question_type='multiple_choice', selected_answer__is_correct=True)
+    | models.Q(question__question_type='text', is_approved=True)
+)
+
+
+class TestResultQuerySet(models.QuerySet):
+    def with_score_parts(self):
+        """
+        Аннотирует correct_count и questions_count подзапросами, чтобы балл
+        любого числа результатов считался одним запросом.
+        """
+        correct = (
+            StudentAnswer.objects.filter(test_result=models.OuterRef('pk'))
+            .filter(CORRECT_STUDENT_ANSWER)
+            .order_by().values('test_result').annotate(n=models.Count('pk')).values('n')
+        )
+        questions = (
+            Question.objects.filter(test=models.OuterRef('test_id'))
+            .order_by().values('test').annotate(n=models.Count('pk')).values('n')
+        )
+        return self.annotate(
+            correct_count=Coalesce(models.Subquery(correct), 0),
+            questions_count=Coalesce(models.Subquery(questions), 0),
+        )
+
+
 class TestResult(models.Model):
     """
     Модель для хранения результатов прохождения тестов студентами.
     """
-    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='test_results', verbose_name="Студент")
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='test_results', verbose_name="Студент",
+                                db_index=False)  # Покрывается индексом (student, test)
     test = models.ForeignKey('QuizModel', on_delete=models.CASCADE, related_name='results', verbose_name="Тест")
     score = models.DecimalField(max_digits=5, decimal_places=2, default=0.0, verbose_name="Баллы")
     completed_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата завершения")
+    # Балл и верно отвеченные вопросы в том виде, в каком результат сейчас учтен
+    # в статистике заданий: перепроверка добавляет в нее только разницу (см. lms.item_analysis)
+    stats_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, editable=False)
+    stats_correct = ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
+
+    objects = TestResultQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Результат теста"
         verbose_name_plural = "Результаты тестов"
+        indexes = [
+            models.Index(fields=['student', 'test'], name='testresult_student_test_idx'),
+        ]
 
     def __str__(self):
         return f"Результат {self.student} для {self.test}"
 
     def calculate_score(self):
-        correct_answers_count = 0
-        total_questions = self.test.questions.count()
-
-        for answer in self.student_answers.all():
-            if answer.question.question_type == "multiple_choice":
-                if answer.selected_answer and answer.selected_answer.is_correct:
-                    correct_answers_count += 1
-            elif answer.question.question_type == "text":
-                if answer.is_approved:
-                    correct_answers_count += 1
-
-        self.score = (correct_answers_count / total_questions * 100) if total_questions > 0 else 0
-        self.save()
+        # Правильные ответы и число вопросов считаются одним агрегирующим запросом
+        parts = TestResult.objects.filter(pk=self.pk).with_score_parts().values('correct_count', 'questions_count').get()
+        self.score = score_from_counts(parts['correct_count'], parts['questions_count'])
+        self.save(update_fields=['score'])
+        # Перепроверка меняет и статистику заданий (только на разницу)
+        from .item_analysis import sync_item_stats
+        sync_item_stats([self.pk])
 
 
 class StudentAnswer(models.Model):
@@ -189,10 +454,25 @@ class StudentAnswer(models.Model):
                                         verbose_name="Выбранный ответ")
     text_response = models.TextField(null=True, blank=True, verbose_name="Текстовый ответ")
     is_approved = models.BooleanField(default=False, verbose_name="Подтверждено")
+    GRADING_STATUSES = [
+        ('pending', 'Ожидает проверки'),
+        ('auto_approved', 'Засчитан автоматически'),
+        ('auto_rejected', 'Не засчитан автоматически'),
+        ('needs_review', 'Нужна проверка преподавателем'),
+        ('reviewed', 'Проверен вручную'),
+    ]
+    grading_status = models.CharField(max_length=20, choices=GRADING_STATUSES, default='pending',
+                                      verbose_name="Статус проверки")
+    # Сходство текстового ответа с правильным после нормализации (см. lms.autograde)
+    similarity = models.FloatField(null=True, blank=True, verbose_name="Сходство с правильным ответом")
 
     class Meta:
         verbose_name = "Ответ студента"
         verbose_name_plural = "Ответы студентов"
+        indexes = [
+            # Очередь автопроверки
+            models.Index(fields=['id'], condition=models.Q(grading_status='pending'), name='studentanswer_pending_idx'),
+        ]
 
     def __str__(self):
         return f"Ответ {self.test_result.student} на {self.question}"
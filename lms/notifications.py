@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Course, PendingCourseUpdate, Subscription
+
+NOTIFY_PROGRESS_KEY = 'lms:notify:{run_id}:{field}'
+# Отметка о поставленной пачке дайджестов: повтор рассылки с тем же run_id ее пропускает
+NOTIFY_CHUNK_KEY = 'lms:notify:{run_id}:chunk:{index}'
+NOTIFY_PROGRESS_FIELDS = ('chunks', 'recipients', 'sent', 'failed')
+# Сколько хранится прогресс рассылки
+NOTIFY_PROGRESS_TIMEOUT = 60 * 60 * 24
+
+
+def record_progress(run_id, **counts):
+    """
+    Атомарно увеличивает счетчики прогресса рассылки (chunks, recipients, sent, failed).
+    """
+    for field, value in counts.items():
+        if not value:
+            continue
+        key = NOTIFY_PROGRESS_KEY.format(run_id=run_id, field=field)
+        cache.add(key, 0, NOTIFY_PROGRESS_TIMEOUT)
+        cache.incr(key, value)
+
+
+def get_progress(run_id):
+    keys = {NOTIFY_PROGRESS_KEY.format(run_id=run_id, field=field): field for field in NOTIFY_PROGRESS_FIELDS}
+    values = cache.get_many(keys)
+    return {field: values.get(key, 0) for key, field in keys.items()}
+
+
+def queue_course_update(course_id):
+    """
+    Откладывает уведомление об обновлении курса до конца окна группировки.
+    Повторные обновления в окне не создают новых рассылок.
+    """
+    now = timezone.now()
+    updated = PendingCourseUpdate.objects.filter(course_id=course_id).update(
+        updates_count=F('updates_count') + 1, last_updated_at=now
+    )
+    if not updated:
+        PendingCourseUpdate.objects.get_or_create(
+            course_id=course_id, defaults={'first_updated_at': now, 'last_updated_at': now}
+        )
+
+
+def claim_due_updates(window=None):
+    """
+    Забирает (удаляет) отложенные обновления, чье окно истекло, и возвращает
+    словарь {course_id: title}. Строки, занятые параллельным flush, пропускаются.
+
+    Транзакция короткая и фиксируется до рассылки: queue_course_update не ждет
+    блокировок, пока подзадачи ставятся в очередь.
+    """
+    if window is None:
+        window = settings.COURSE_NOTIFY_DIGEST_WINDOW
+    cutoff = timezone.now() - timedelta(seconds=window)
+    with transaction.atomic():
+        due = PendingCourseUpdate.objects.select_for_update(skip_locked=True).filter(first_updated_at__lte=cutoff)
+        course_ids = list(due.values_list('course_id', flat=True))
+        PendingCourseUpdate.objects.filter(course_id__in=course_ids).delete()
+    return dict(Course.objects.filter(pk__in=course_ids).values_list('pk', 'title'))
+
+
+def dispatch_digest_chunks(run_id, titles, send):
+    """
+    Передает `send` пачки дайджестов по курсам `titles`. Поставленные пачки
+    отмечаются по run_id и номеру, поэтому повтор той же рассылки (тот же
+    run_id, те же курсы) ставит только недостающие. Возвращает число поставленных пачек.
+    """
+    chunks = 0
+    for index, digests in enumerate(subscriber_digest_chunks(titles)):
+        key = NOTIFY_CHUNK_KEY.format(run_id=run_id, index=index)
+        if cache.get(key):
+            continue
+        send(run_id, digests)
+        cache.set(key, 1, NOTIFY_PROGRESS_TIMEOUT)
+        record_progress(run_id, chunks=1, recipients=len(digests))
+        chunks += 1
+    return chunks
+
+
+def subscriber_digest_chunks(titles, chunk_size=None):
+    """
+    Группирует подписчиков обновленных курсов: один элемент [email, [названия курсов]]
+    на подписчика. Строки идут потоково, отсортированными по пользователю.
+    """
+    chunk_size = chunk_size or settings.COURSE_NOTIFY_CHUNK_SIZE
+    rows = (
+        Subscription.objects.filter(course_id__in=list(titles), user__is_active=True)
+        .exclude(user__email='')
+        .order_by('user_id', 'course_id')
+        .values_list('user_id', 'user__email', 'course_id')
+    )
+    chunk, current_user, digest = [], None, None
+    for user_id, email, course_id in rows.iterator(chunk_size=chunk_size):
+        if user_id != current_user:
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+            current_user, digest = user_id, [email, []]
+            chunk.append(digest)
+        digest[1].append(titles[course_id])
+    if chunk:
+        yield chunk
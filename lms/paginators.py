@@ -1,4 +1,207 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from urllib import parse
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def approximate_count(queryset):
+    """
+    Оценка количества строк по плану запроса PostgreSQL, без выполнения COUNT(*).
+    Для других СУБД выполняется обычный подсчет.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (cursor/keyset) без COUNT(*) и OFFSET.
+
+    Страницы выбираются условием по кортежу (ключ сортировки, id), поэтому время
+    ответа не растет с номером страницы. Порядок берется из queryset (например,
+    после OrderingFilter) или из атрибута `keyset_ordering` вьюхи; id всегда
+    добавляется последним, чтобы порядок был однозначным.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    # count=approximate (по умолчанию) | exact | none
+    count_query_param = 'count'
+    default_ordering = ('-pk',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset, view)
+        position, reverse = self.decode_cursor(request, queryset)
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        self.count = self.get_count(queryset, request)
+
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.first_position = self._position(results[0]) if results else None
+        self.last_position = self._position(results[-1]) if results else None
+        # Пустая страница при движении назад означает, что мы в начале списка
+        if reverse and not results:
+            self.has_next = False
+        return results
+
+    def get_paginated_response(self, data):
+        body = {}
+        if self.count is not None:
+            body['count'] = self.count
+        body.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(body)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset, view):
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)] or list(
+            getattr(view, 'keyset_ordering', self.default_ordering)
+        )
+        pk_name = queryset.model._meta.pk.name
+        ordering = [
+            ('-' if field.startswith('-') else '') + (pk_name if field.lstrip('-') == 'pk' else field.lstrip('-'))
+            for field in ordering
+        ]
+        if ordering[-1].lstrip('-') != pk_name:
+            ordering.append(('-' if ordering[0].startswith('-') else '') + pk_name)
+        return tuple(ordering)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, 'approximate')
+        if mode == 'none':
+            return None
+        if mode == 'exact':
+            return queryset.count()
+        return approximate_count(queryset)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last_position, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_position is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first_position, reverse=True)
+
+    # --- Курсор ---
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(parse.unquote(encoded).encode()))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                self._ordering_field(queryset, field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, FieldDoesNotExist, ValidationError):
+            raise NotFound('Некорректный курсор.')
+        return position, bool(payload.get('r'))
+
+    @staticmethod
+    def _ordering_field(queryset, name):
+        # Сортировка может идти по аннотации (например, search_rank при ?search=)
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+    def _position(self, obj):
+        return [self._serialize(getattr(obj, field.lstrip('-'))) for field in self.ordering]
+
+    @staticmethod
+    def _serialize(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if value is None or isinstance(value, (int, float, str, bool)):
+            return value
+        return str(value)
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    @staticmethod
+    def _after(ordering, position):
+        """
+        Условие «строго после позиции» для кортежа полей:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            prefix = {f.lstrip('-'): value for f, value in zip(ordering[:index], position[:index])}
+            condition |= Q(**prefix, **{f'{name}__{lookup}': position[index]})
+        return condition
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -8,3 +211,19 @@ class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     # Максимальное количество элементов на странице
     max_page_size = 100
+    # Параметр для переключения на пагинацию по курсору: ?pagination=cursor
+    mode_query_param = 'pagination'
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.keyset_pagination_class.cursor_query_param in request.query_params):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from .models import Course, Lesson
+from .roles import has_role, MODERATOR, STUDENT, TEACHER
 
 
 class IsOwnerAndUnapproved(BasePermission):
@@ -57,7 +58,7 @@ class IsTeacher(BasePermission):
     """
 
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Преподаватель').exists() or request.user.is_superuser
+        return has_role(request.user, TEACHER) or request.user.is_superuser
 
     def has_object_permission(self, request, view, obj):
         return obj.owner == request.user or request.user.is_superuser
@@ -69,7 +70,7 @@ class IsModerator(BasePermission):
     """
 
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Модераторы').exists() or request.user.is_superuser
+        return has_role(request.user, MODERATOR) or request.user.is_superuser
 
     def has_object_permission(self, request, view, obj):
         if request.method == 'DELETE':
@@ -84,7 +85,7 @@ class IsStudent(BasePermission):
     """
 
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Студент').exists()
+        return has_role(request.user, STUDENT)
 
     def has_object_permission(self, request, view, obj):
         return request.method in ['GET', 'HEAD', 'OPTIONS']
@@ -0,0 +1,61 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import QuizDocument, QuizModel
+
+# Повторные изменения теста за это время собираются в одну пересборку документа
+QUIZ_DOCUMENT_DEBOUNCE = 5
+QUIZ_DOCUMENT_SCHEDULED_KEY = 'lms:quiz_document:{quiz_id}:scheduled'
+
+
+def render_quiz_document(quiz):
+    from .serializers import PublicTestSerializer
+
+    return dict(PublicTestSerializer(quiz).data)
+
+
+def rebuild_quiz_document(quiz_id):
+    """
+    Пересобирает документ утвержденного теста; у неутвержденного или
+    удаленного теста документ удаляется. Возвращает документ или None.
+    """
+    quiz = QuizModel.objects.filter(pk=quiz_id, status='approved').with_questions().first()
+    if quiz is None:
+        QuizDocument.objects.filter(quiz_id=quiz_id).delete()
+        return None
+    content = render_quiz_document(quiz)
+    QuizDocument.objects.update_or_create(quiz_id=quiz_id, defaults={'content': content})
+    return content
+
+
+def published_documents():
+    """
+    Документы только утвержденных тестов: пересборка, запущенная до снятия
+    теста с публикации, могла записать документ уже после его удаления.
+    """
+    return QuizDocument.objects.filter(quiz__status='approved')
+
+
+def get_quiz_document(quiz_id):
+    """
+    Документ утвержденного теста одним запросом по первичному ключу; если его
+    еще нет (тест только что утвержден), собирается сразу.
+    """
+    content = published_documents().filter(quiz_id=quiz_id).values_list('content', flat=True).first()
+    if content is None:
+        content = rebuild_quiz_document(quiz_id)
+    return content
+
+
+def schedule_quiz_document_rebuild(quiz_id):
+    """
+    Ставит фоновую пересборку документа после коммита. Пока пересборка
+    ожидает запуска, повторные изменения новых задач не создают.
+    """
+    from .tasks import rebuild_quiz_document_task
+
+    def enqueue():
+        if cache.add(QUIZ_DOCUMENT_SCHEDULED_KEY.format(quiz_id=quiz_id), 1, QUIZ_DOCUMENT_DEBOUNCE * 2):
+            rebuild_quiz_document_task.apply_async(args=(quiz_id,), countdown=QUIZ_DOCUMENT_DEBOUNCE)
+
+    transaction.on_commit(enqueue)
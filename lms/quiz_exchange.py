@@ -0,0 +1,200 @@
+import codecs
+import json
+
+from django.db.models import Prefetch
+
+from .answer_keys import bump_answer_key_version
+from .models import Answer, Question, QuizModel
+
+FORMAT_NAME = 'apprendo.quiz'
+FORMAT_VERSION = 1
+
+# Сколько вопросов вставляется одним bulk_create (варианты ответов — тем же числом запросов)
+IMPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 500
+
+QUESTION_TYPES = {value for value, _ in Question.QUESTION_TYPES}
+MAX_TEXT_LENGTH = 255
+
+
+class QuizFormatError(ValueError):
+    """
+    Файл теста не соответствует формату обмена.
+    """
+
+
+# --- Экспорт ---
+
+def quiz_record(quiz):
+    return {
+        'type': 'quiz', 'format': FORMAT_NAME, 'version': FORMAT_VERSION,
+        'title': quiz.title, 'description': quiz.description,
+    }
+
+
+def question_record(question):
+    return {
+        'type': 'question',
+        'text': question.text,
+        'question_type': question.question_type,
+        'correct_answer': question.correct_answer,
+        'answers': [
+            {'text': answer.text, 'is_correct': answer.is_correct, 'correct_answer': answer.correct_answer}
+            for answer in question.answers.all()
+        ],
+    }
+
+
+def _iter_questions(quiz):
+    # Вопросы читаются порциями с вариантами ответов: память не зависит от размера теста
+    questions = Question.objects.filter(test=quiz).order_by('id').prefetch_related(
+        Prefetch('answers', queryset=Answer.objects.order_by('id'))
+    )
+    for question in questions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield question_record(question)
+
+
+def iter_ndjson(quizzes):
+    """
+    Строки NDJSON: запись теста, затем по записи на каждый его вопрос.
+    """
+    for quiz in quizzes:
+        yield json.dumps(quiz_record(quiz), ensure_ascii=False) + '\n'
+        for record in _iter_questions(quiz):
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def iter_json(quiz):
+    """
+    Один тест как JSON-документ {..., "questions": [...]}, отдаваемый по частям.
+    """
+    header = json.dumps(quiz_record(quiz), ensure_ascii=False)
+    yield header[:-1] + ', "questions": ['
+    for number, record in enumerate(_iter_questions(quiz)):
+        yield (', ' if number else '') + json.dumps(record, ensure_ascii=False)
+    yield ']}\n'
+
+
+# --- Импорт ---
+
+def read_ndjson(upload):
+    """
+    Потоково читает записи из NDJSON-файла.
+    """
+    for line_number, line in enumerate(codecs.iterdecode(upload, 'utf-8-sig'), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise QuizFormatError(f"Строка {line_number}: некорректный JSON ({exc.msg}).")
+
+
+def read_json(document):
+    """
+    Превращает JSON-документ теста в те же записи, что и NDJSON.
+    """
+    if not isinstance(document, dict):
+        raise QuizFormatError("Ожидается JSON-объект теста.")
+    questions = document.get('questions')
+    if not isinstance(questions, list):
+        raise QuizFormatError("Поле questions должно быть списком.")
+    yield {key: value for key, value in document.items() if key != 'questions'} | {'type': 'quiz'}
+    for question in questions:
+        yield question | {'type': 'question'} if isinstance(question, dict) else question
+
+
+def _text(value, field, required=True):
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise QuizFormatError(f"Поле {field} должно быть непустой строкой.")
+    if len(value) > MAX_TEXT_LENGTH:
+        raise QuizFormatError(f"Поле {field} длиннее {MAX_TEXT_LENGTH} символов.")
+    return value
+
+
+def _check_quiz(record):
+    if record.get('format') != FORMAT_NAME:
+        raise QuizFormatError(f"Неизвестный формат: {record.get('format')!r}.")
+    version = record.get('version')
+    if not isinstance(version, int) or not 1 <= version <= FORMAT_VERSION:
+        raise QuizFormatError(f"Версия формата {version!r} не поддерживается.")
+    return {'title': _text(record.get('title'), 'title'), 'description': record.get('description')}
+
+
+def _build_question(record, quiz, owner):
+    if record.get('question_type') not in QUESTION_TYPES:
+        raise QuizFormatError(f"Неизвестный тип вопроса: {record.get('question_type')!r}.")
+    answers = record.get('answers') or []
+    if not isinstance(answers, list) or not all(isinstance(answer, dict) for answer in answers):
+        raise QuizFormatError("Поле answers должно быть списком объектов.")
+    question = Question(
+        test=quiz, owner=owner, text=_text(record.get('text'), 'text'),
+        question_type=record['question_type'],
+        correct_answer=_text(record.get('correct_answer'), 'correct_answer', required=False),
+    )
+    question.pending_answers = [
+        Answer(owner=owner, text=_text(answer.get('text'), 'answers.text'), is_correct=bool(answer.get('is_correct')),
+               correct_answer=_text(answer.get('correct_answer'), 'answers.correct_answer', required=False))
+        for answer in answers
+    ]
+    return question
+
+
+def _flush(questions):
+    Question.objects.bulk_create(questions)
+    answers = []
+    for question in questions:
+        for answer in question.pending_answers:
+            answer.question = question
+            answers.append(answer)
+    Answer.objects.bulk_create(answers, batch_size=IMPORT_BATCH_SIZE)
+    return len(answers)
+
+
+def import_quizzes(records, course, owner, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Создает тесты курса из записей формата обмена. Вопросы и варианты ответов
+    вставляются bulk_create пачками по `batch_size` вопросов. Вызывающий код
+    оборачивает импорт в транзакцию. Импортированные тесты ждут утверждения.
+
+    Возвращает список (тест, число вопросов, число вариантов ответов).
+    """
+    imported, quiz, batch = [], None, []
+    questions_count = answers_count = 0
+
+    def finish():
+        nonlocal batch, answers_count
+        if batch:
+            answers_count += _flush(batch)
+            batch = []
+        if quiz is not None:
+            # bulk_create не вызывает сигналы: ключ ответов сбрасываем явно
+            bump_answer_key_version(quiz.pk)
+            imported.append((quiz, questions_count, answers_count))
+
+    for number, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise QuizFormatError(f"Запись {number}: ожидается объект.")
+        try:
+            if record.get('type') == 'quiz':
+                finish()
+                quiz = QuizModel.objects.create(course=course, owner=owner, **_check_quiz(record))
+                questions_count = answers_count = 0
+            elif record.get('type') == 'question':
+                if quiz is None:
+                    raise QuizFormatError("Вопрос до записи теста.")
+                batch.append(_build_question(record, quiz, owner))
+                questions_count += 1
+                if len(batch) >= batch_size:
+                    answers_count += _flush(batch)
+                    batch = []
+            else:
+                raise QuizFormatError(f"Неизвестный тип записи: {record.get('type')!r}.")
+        except QuizFormatError as exc:
+            raise QuizFormatError(f"Запись {number}: {exc}")
+    finish()
+    if not imported:
+        raise QuizFormatError("В файле нет ни одного теста.")
+    return imported
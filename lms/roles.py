@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import cache
+
+# Названия групп, которые определяют роль пользователя
+ADMIN = 'Администратор'
+MODERATOR = 'Модераторы'
+TEACHER = 'Преподаватель'
+STUDENT = 'Студент'
+
+ROLES_CACHE_KEY = 'lms:roles:{user_id}'
+
+# Атрибут, в котором роли хранятся на объекте пользователя в рамках запроса
+REQUEST_ROLES_ATTR = '_lms_roles'
+
+
+def get_user_roles(user):
+    """
+    Возвращает множество названий групп пользователя.
+
+    Внутри запроса результат хранится на объекте пользователя, между запросами —
+    в общем кеше по id пользователя. Запрос к БД выполняется только при промахе.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, REQUEST_ROLES_ATTR, None)
+    if roles is None:
+        key = ROLES_CACHE_KEY.format(user_id=user.pk)
+        roles = cache.get(key)
+        if roles is None:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(key, roles, settings.ROLES_CACHE_TIMEOUT)
+        setattr(user, REQUEST_ROLES_ATTR, roles)
+    return roles
+
+
+def has_role(user, *names):
+    """
+    Проверяет, состоит ли пользователь хотя бы в одной из указанных групп.
+    """
+    return not get_user_roles(user).isdisjoint(names)
+
+
+def invalidate_user_roles(*user_ids):
+    """
+    Удаляет закешированные роли пользователей.
+    """
+    if user_ids:
+        cache.delete_many([ROLES_CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
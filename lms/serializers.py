@@ -1,50 +1,106 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import Course, Lesson, Subscription
 from users.models import Payment
 from .validators import validate_youtube_url  # Импортируем валидатор
 from .models import QuizModel, Question, Answer  # УЧЕБНЫЕ ТЕСТЫ
+from .answer_keys import get_answer_key
+from .grading import normalize_answer_text
 
 
-class LessonSerializer(serializers.ModelSerializer):
+def _split_param(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Разреженные наборы полей и раскрываемые связи для GET-запросов.
+
+    - ?fields=id,title — вернуть только перечисленные поля;
+    - ?expand=lessons — включить вложенные связи из Meta.expandable_fields.
+
+    По умолчанию в списках связи не раскрываются, в детальном просмотре —
+    раскрываются все. Параметры действуют только на корневой сериализатор;
+    запись (POST/PUT/PATCH) всегда работает с полным набором полей.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    @classmethod
+    def requested_fields(cls, request, many=False):
+        """
+        Имена полей, которые попадут в ответ. Вьюхи используют этот список,
+        чтобы не делать аннотации и prefetch для невостребованных полей.
+        """
+        meta_fields = list(cls.Meta.fields)
+        if request is None or request.method not in SAFE_METHODS:
+            return meta_fields
+
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        fields = _split_param(request.query_params.get(cls.fields_query_param))
+        expand = _split_param(request.query_params.get(cls.expand_query_param))
+        if fields is None and expand is None:
+            expanded = set() if many else expandable
+        else:
+            expanded = ((expand or set()) | (fields or set())) & expandable
+
+        return [
+            name for name in meta_fields
+            if name in expanded or (name not in expandable and (fields is None or name in fields))
+        ]
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        many = isinstance(parent, serializers.ListSerializer)
+        if (parent.parent if many else parent) is not None:
+            return fields  # Вложенный сериализатор
+        keep = set(self.requested_fields(self.context.get('request'), many=many))
+        return {name: field for name, field in fields.items() if name in keep or field.write_only}
+
+
+class LessonSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Сериализатор для модели Lesson.
     """
     video_url = serializers.URLField(validators=[validate_youtube_url])  # Добавляем валидатор
-    owner = serializers.ReadOnlyField(source='owner.id')  # Указываем owner как только для чтения
+    owner = serializers.ReadOnlyField(source='owner_id')  # Указываем owner как только для чтения, без загрузки пользователя
 
     class Meta:
         model = Lesson
         fields = ['id', 'title', 'description', 'preview', 'video_url', 'course', 'owner']
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
         Сериализатор для модели КУРС.
     """
-    lessons_count = serializers.SerializerMethodField()
     lessons = LessonSerializer(many=True, read_only=True)
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'status', 'owner', 'price', 'lessons_count', 'lessons', 'is_subscribed']
-
-    def get_lessons_count(self, obj):
-        return obj.lessons.count()
+        fields = ['id', 'title', 'description', 'status', 'owner', 'price', 'subscribers_count', 'lessons_count',
+                  'lessons', 'is_subscribed']
+        expandable_fields = ['lessons']
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         return Subscription.objects.filter(user=user, course=obj).exists()
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = ['id', 'user', 'payment_date', 'paid_course', 'paid_lesson', 'amount', 'payment_method']
 
 
 # УЧЕБНЫЕ ТЕСТЫ
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     is_correct = serializers.SerializerMethodField()
 
     class Meta:
@@ -55,34 +111,99 @@ class AnswerSerializer(serializers.ModelSerializer):
         }
 
     def get_is_correct(self, obj):
-        # Проверяем, совпадает ли ответ пользователя с правильным ответом
-        return obj.text == obj.question.correct_answer
+        # Сравниваем с правильным ответом из кешированного ключа ответов теста;
+        # ключи запоминаются в контексте, чтобы не читать версию на каждый ответ
+        keys = self.context.setdefault('answer_keys', {})
+        quiz_id = obj.question.test_id
+        if quiz_id not in keys:
+            keys[quiz_id] = get_answer_key(quiz_id)
+        entry = keys[quiz_id].get(obj.question_id)
+        if entry is None:
+            return obj.text == obj.question.correct_answer
+        return bool(entry['correct_text']) and normalize_answer_text(obj.text) == entry['correct_text']
 
     def create(self, validated_data):
-        # Создаём ответ и добавляем проверку на корректность
-        answer = Answer.objects.create(**validated_data)
-        answer.is_correct = self.get_is_correct(answer)  # Проверяем правильность ответа
+        # Правильность вычисляется до сохранения, чтобы ответ записывался одним INSERT
+        answer = Answer(**validated_data)
+        answer.is_correct = self.get_is_correct(answer)
         answer.save()
         return answer
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     answers = AnswerSerializer(many=True, read_only=True)  # Делаем поле только для чтения
 
     class Meta:
         model = Question
         fields = ['id', 'text', 'question_type', 'test', 'answers', 'owner']
+        expandable_fields = ['answers']
         extra_kwargs = {
             'owner': {'read_only': True}  # Устанавливаем только для чтения
         }
 
 
-class TestSerializer(serializers.ModelSerializer):
+class TestSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)  # Поле только для чтения
 
     class Meta:
         model = QuizModel
         fields = ['id', 'title', 'description', 'course', 'questions', 'owner']
+        expandable_fields = ['questions']
         extra_kwargs = {
             'owner': {'read_only': True}  # Только для чтения
         }
+
+
+# Документ теста для студентов: без признаков правильности ответов
+class PublicAnswerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Answer
+        fields = ['id', 'text']
+
+
+class PublicQuestionSerializer(serializers.ModelSerializer):
+    answers = PublicAnswerSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Question
+        fields = ['id', 'text', 'question_type', 'answers']
+
+
+class PublicTestSerializer(serializers.ModelSerializer):
+    questions = PublicQuestionSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = QuizModel
+        fields = ['id', 'title', 'description', 'course', 'questions']
+
+
+class SubmittedAnswerSerializer(serializers.Serializer):
+    question = serializers.IntegerField()
+    selected_answer = serializers.IntegerField(required=False, allow_null=True)
+    text_response = serializers.CharField(required=False, allow_blank=True)
+
+
+class TestSubmissionSerializer(serializers.Serializer):
+    """
+    Попытка прохождения теста целиком. Ответы проверяются в памяти
+    по ключу ответов из context['answer_key'] (см. lms.answer_keys.get_answer_key).
+    """
+    answers = SubmittedAnswerSerializer(many=True, allow_empty=False)
+
+    def validate_answers(self, answers):
+        key = self.context['answer_key']
+        seen = set()
+        for answer in answers:
+            question_id = answer['question']
+            entry = key.get(question_id)
+            if entry is None:
+                raise serializers.ValidationError(f"Вопрос {question_id} не относится к этому тесту.")
+            if question_id in seen:
+                raise serializers.ValidationError(f"На вопрос {question_id} дано несколько ответов.")
+            seen.add(question_id)
+            if entry['type'] == 'multiple_choice':
+                if answer.get('selected_answer') not in entry['answers']:
+                    raise serializers.ValidationError(f"Для вопроса {question_id} выбран неизвестный вариант ответа.")
+            elif not answer.get('text_response', '').strip():
+                raise serializers.ValidationError(f"Для вопроса {question_id} нужен текстовый ответ.")
+        return answers
@@ -0,0 +1,197 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .answer_keys import bump_answer_key_version
+from .catalog import bump_catalog_version
+from .counters import adjust_course_counters
+from .leaderboards import record_result
+from .models import Answer, Course, Lesson, Question, QuizDocument, QuizModel, Subscription, TestResult
+from .quiz_documents import schedule_quiz_document_rebuild
+from .roles import invalidate_user_roles, REQUEST_ROLES_ATTR
+from .visibility import is_public_owner, refresh_visibility
+
+User = get_user_model()
+
+
+# --- Сброс кеша ролей ---
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_groups_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Сбрасывает кеш ролей при изменении состава групп пользователя.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+
+    if not reverse:
+        # user.groups.add(...) / remove(...) / clear()
+        if action == 'pre_clear':
+            return
+        instance.__dict__.pop(REQUEST_ROLES_ATTR, None)
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        # group.user_set.clear(): после очистки состав группы уже не узнать
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+        invalidate_user_roles(*instance._cleared_user_ids)
+        return
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_user_ids', [])
+    else:
+        # group.user_set.add(...) / remove(...)
+        user_ids = pk_set or []
+
+    invalidate_user_roles(*user_ids)
+    # Членство в группе Администратор определяет видимость уроков владельца
+    refresh_visibility(user_ids)
+
+
+@receiver(post_save, sender=Group)
+def invalidate_roles_on_group_change(sender, instance, **kwargs):
+    """
+    Переименование группы меняет роли всех ее участников.
+    """
+    user_ids = list(instance.user_set.values_list('pk', flat=True))
+    invalidate_user_roles(*user_ids)
+    refresh_visibility(user_ids)
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_members(sender, instance, **kwargs):
+    instance._deleted_user_ids = list(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_roles_on_group_delete(sender, instance, **kwargs):
+    user_ids = getattr(instance, '_deleted_user_ids', [])
+    invalidate_user_roles(*user_ids)
+    refresh_visibility(user_ids)
+
+
+# --- Видимость уроков для студентов ---
+
+@receiver(pre_save, sender=Course)
+def set_course_visibility(sender, instance, **kwargs):
+    instance.is_public = is_public_owner(instance.owner_id)
+
+
+@receiver(post_save, sender=Course)
+def sync_lessons_visibility(sender, instance, created, **kwargs):
+    # При смене владельца уроки курса получают новый флаг
+    if not created:
+        Lesson.objects.filter(course=instance).exclude(is_public=instance.is_public).update(
+            is_public=instance.is_public
+        )
+
+
+@receiver(pre_save, sender=Lesson)
+def set_lesson_visibility(sender, instance, **kwargs):
+    instance.is_public = Course.objects.filter(pk=instance.course_id, is_public=True).exists()
+
+
+# --- Счетчики подписчиков и уроков курса ---
+# Сырые SQL-пути (lms.subscriptions) обновляют счетчики сами и сигналов не вызывают
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(sender, instance, created, **kwargs):
+    if created:
+        adjust_course_counters(instance.course_id, subscribers=1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(sender, instance, **kwargs):
+    adjust_course_counters(instance.course_id, subscribers=-1)
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_course(sender, instance, **kwargs):
+    if instance.pk and not instance._state.adding:
+        instance._previous_course_id = (
+            Lesson.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Lesson)
+def update_lessons_count(sender, instance, created, **kwargs):
+    previous_course_id = getattr(instance, '_previous_course_id', None)
+    if created:
+        adjust_course_counters(instance.course_id, lessons=1)
+    elif previous_course_id is not None and previous_course_id != instance.course_id:
+        # Урок перенесли в другой курс
+        adjust_course_counters(previous_course_id, lessons=-1)
+        adjust_course_counters(instance.course_id, lessons=1)
+
+
+@receiver(post_delete, sender=Lesson)
+def decrement_lessons_count(sender, instance, **kwargs):
+    adjust_course_counters(instance.course_id, lessons=-1)
+
+
+# --- Версия каталога курсов ---
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def bump_catalog_on_change(sender, **kwargs):
+    """
+    Любое изменение курса или урока делает закешированный каталог неактуальным.
+    Версия повышается сразу и еще раз после коммита, чтобы страница, собранная
+    конкурентным запросом до коммита, не осталась в кеше.
+    """
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+# --- Версия ключа ответов теста ---
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def bump_answer_key_on_change(sender, instance, **kwargs):
+    """
+    Изменение вопроса или варианта ответа делает ключ ответов теста неактуальным.
+    Как и для каталога, версия повышается сразу и еще раз после коммита.
+    """
+    if sender is Question:
+        quiz_id = instance.test_id
+    elif Answer._meta.get_field('question').is_cached(instance):
+        quiz_id = instance.question.test_id
+    else:
+        quiz_id = Question.objects.filter(pk=instance.question_id).values_list('test_id', flat=True).first()
+    if quiz_id is None:
+        return
+    bump_answer_key_version(quiz_id)
+    transaction.on_commit(lambda: bump_answer_key_version(quiz_id))
+    # Документ теста для студентов тоже устарел
+    schedule_quiz_document_rebuild(quiz_id)
+
+
+@receiver(post_save, sender=QuizModel)
+def rebuild_quiz_document_on_quiz_change(sender, instance, **kwargs):
+    # Утверждение, снятие с публикации или правка названия теста
+    if instance.status != 'approved':
+        # Снятый с публикации тест пропадает у студентов вместе с коммитом, без ожидания задачи
+        QuizDocument.objects.filter(quiz_id=instance.pk).delete()
+        return
+    schedule_quiz_document_rebuild(instance.pk)
+
+
+# --- Рейтинги студентов ---
+
+@receiver(post_save, sender=TestResult)
+def update_leaderboards(sender, instance, **kwargs):
+    """
+    Сохраненный результат учитывается в рейтингах теста и курса после коммита.
+    Рейтинг хранит лучший балл, поэтому снижение балла здесь не учитывается;
+    массовый пересчет (lms.grading.recalculate_scores) обновляет рейтинги сам.
+    """
+    def record():
+        course_id = QuizModel.objects.filter(pk=instance.test_id).values_list('course_id', flat=True).first()
+        if course_id is not None:
+            record_result(instance.student_id, instance.test_id, course_id, instance.score)
+
+    transaction.on_commit(record)
@@ -0,0 +1,181 @@
+import codecs
+import csv
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from .catalog import bump_catalog_version
+from .models import Course, Subscription
+from .roles import has_role, MODERATOR
+
+User = get_user_model()
+
+# Сколько строк массовой операции обрабатывается одним INSERT/DELETE
+BULK_BATCH_SIZE = 1000
+
+ENROLL = 'enroll'
+UNENROLL = 'unenroll'
+
+_TOGGLE_SQL = """
+    WITH course AS (
+        SELECT 1 FROM {course_table} WHERE id = %(course_id)s
+    ), deleted AS (
+        DELETE FROM {table} WHERE user_id = %(user_id)s AND course_id = %(course_id)s
+        RETURNING 1
+    ), inserted AS (
+        INSERT INTO {table} (user_id, course_id, created_at)
+        SELECT %(user_id)s, %(course_id)s, now()
+        WHERE NOT EXISTS (SELECT 1 FROM deleted) AND EXISTS (SELECT 1 FROM course)
+        ON CONFLICT (user_id, course_id) DO NOTHING
+        RETURNING 1
+    ), counter AS (
+        UPDATE {course_table}
+        SET subscribers_count = subscribers_count
+            + (SELECT count(*) FROM inserted) - (SELECT count(*) FROM deleted)
+        WHERE id = %(course_id)s
+    )
+    SELECT EXISTS (SELECT 1 FROM course), EXISTS (SELECT 1 FROM deleted)
+"""
+
+# Счетчик subscribers_count меняется в том же выражении, что и сами подписки
+_BULK_COUNTER_SQL = """
+    , counter AS (
+        UPDATE {course_table} AS c
+        SET subscribers_count = c.subscribers_count {sign} changed.n
+        FROM (SELECT course_id, count(*) AS n FROM changed GROUP BY course_id) AS changed
+        WHERE c.id = changed.course_id
+    )
+    SELECT user_id, course_id FROM changed
+"""
+
+_BULK_INSERT_SQL = """
+    WITH changed AS (
+        INSERT INTO {table} (user_id, course_id, created_at)
+        SELECT t.user_id, t.course_id, now()
+        FROM unnest(%s::bigint[], %s::bigint[]) AS t(user_id, course_id)
+        ON CONFLICT (user_id, course_id) DO NOTHING
+        RETURNING user_id, course_id
+    )
+""" + _BULK_COUNTER_SQL.replace('{sign}', '+')
+
+_BULK_DELETE_SQL = """
+    WITH changed AS (
+        DELETE FROM {table} AS s
+        USING unnest(%s::bigint[], %s::bigint[]) AS t(user_id, course_id)
+        WHERE s.user_id = t.user_id AND s.course_id = t.course_id
+        RETURNING s.user_id, s.course_id
+    )
+""" + _BULK_COUNTER_SQL.replace('{sign}', '-')
+
+
+def toggle_subscription(user_id, course_id):
+    """
+    Подписывает или отписывает пользователя одним SQL-запросом.
+
+    Удаление, вставка и изменение счетчика подписчиков выполняются в одном
+    выражении, поэтому одновременные клики не приводят к IntegrityError. Возвращает True, если подписка
+    теперь есть, False — если удалена, None — если курса нет.
+
+    Сигналы моделей при этом не вызываются, поэтому кеш каталога (в нем есть
+    subscribers_count) инвалидируется здесь же после коммита.
+    """
+    sql = _TOGGLE_SQL.format(table=Subscription._meta.db_table, course_table=Course._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'user_id': user_id, 'course_id': course_id})
+        course_exists, unsubscribed = cursor.fetchone()
+    if not course_exists:
+        return None
+    transaction.on_commit(bump_catalog_version)
+    return not unsubscribed
+
+
+def read_csv_rows(upload, course_id=None):
+    """
+    Потоково читает CSV со столбцами user_id,course_id (заголовок необязателен).
+    Если передан course_id, файл может содержать только столбец user_id.
+    Возвращает пары (user_id, course_id); некорректные строки — (None, None).
+    """
+    reader = csv.reader(codecs.iterdecode(upload, 'utf-8-sig'))
+    columns = None
+    for row in reader:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if columns is None:
+            columns = ['user_id', 'course_id']
+            if not row[0].strip().isdigit():
+                columns = [cell.strip() for cell in row]
+                continue
+        values = dict(zip(columns, (cell.strip() for cell in row)))
+        try:
+            yield int(values['user_id']), int(values.get('course_id') or course_id)
+        except (KeyError, TypeError, ValueError):
+            yield None, None
+
+
+def bulk_subscriptions(actor, action, pairs, batch_size=BULK_BATCH_SIZE):
+    """
+    Массово подписывает (enroll) или отписывает (unenroll) пары (user_id, course_id).
+
+    Пары обрабатываются пачками: на пачку — проверка пользователей и курсов
+    и один INSERT ... ON CONFLICT DO NOTHING или DELETE с RETURNING.
+    Для каждой строки возвращается результат со статусом.
+    """
+    batch = []
+    for row, (user_id, course_id) in enumerate(pairs, start=1):
+        batch.append((row, user_id, course_id))
+        if len(batch) >= batch_size:
+            yield from _process_batch(actor, action, batch)
+            batch = []
+    if batch:
+        yield from _process_batch(actor, action, batch)
+
+
+def _process_batch(actor, action, batch):
+    course_ids = {course_id for _, _, course_id in batch if course_id is not None}
+    user_ids = {user_id for _, user_id, _ in batch if user_id is not None}
+    owners = dict(Course.objects.filter(pk__in=course_ids).values_list('pk', 'owner_id'))
+    existing_users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    is_staff = actor.is_superuser or has_role(actor, MODERATOR)
+
+    statuses, allowed = {}, []
+    for row, user_id, course_id in batch:
+        if user_id is None or course_id is None:
+            statuses[row] = 'invalid'
+        elif course_id not in owners or user_id not in existing_users:
+            statuses[row] = 'not_found'
+        elif not (is_staff or user_id == actor.pk or owners[course_id] == actor.pk):
+            statuses[row] = 'forbidden'
+        else:
+            allowed.append((user_id, course_id))
+
+    changed = _apply(action, allowed) if allowed else set()
+    done, unchanged = ('enrolled', 'already_enrolled') if action == ENROLL else ('unenrolled', 'not_enrolled')
+    for row, user_id, course_id in batch:
+        status = statuses.get(row)
+        if status is None:
+            # Повтор пары в той же пачке считается уже выполненным
+            status = done if (user_id, course_id) in changed else unchanged
+            changed.discard((user_id, course_id))
+        yield {'row': row, 'user_id': user_id, 'course_id': course_id, 'status': status}
+
+
+def enroll_pairs(pairs):
+    """
+    Подписывает пары (user_id, course_id) без проверки прав одним INSERT
+    (например, после оплаты курса). Возвращает пары, подписанные впервые.
+    """
+    pairs = list(pairs)
+    return _apply(ENROLL, pairs) if pairs else set()
+
+
+def _apply(action, pairs):
+    sql = _BULK_INSERT_SQL if action == ENROLL else _BULK_DELETE_SQL
+    user_ids, course_ids = zip(*pairs)
+    with connection.cursor() as cursor:
+        sql = sql.format(table=Subscription._meta.db_table, course_table=Course._meta.db_table)
+        cursor.execute(sql, [list(user_ids), list(course_ids)])
+        changed = set(cursor.fetchall())
+    if changed:
+        # Изменились счетчики подписчиков в каталоге (см. toggle_subscription)
+        transaction.on_commit(bump_catalog_version)
+    return changed
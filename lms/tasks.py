@@ -1,6 +1,8 @@
 from celery import shared_task
 from datetime import datetime
-from django.core.mail import send_mail
+from smtplib import SMTPException
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
 
 from datetime import timedelta
@@ -14,22 +16,73 @@ def sample_task():
     print(f'Периодическая задача выполнена: {datetime.now()}')
 
 
-@shared_task
-def send_course_update_email(course_title, emails):
+def _send_individually(task, run_id, items, build_message, retry_args):
+    """
+    Отправляет по письму на элемент через одно SMTP-соединение.
+    При ошибке задача повторяется только для еще не отправленных элементов.
+    """
+    from lms.notifications import record_progress
+
+    sent = 0
+    try:
+        with get_connection(fail_silently=False) as connection:
+            for item in items:
+                build_message(item, connection).send()
+                sent += 1
+    except (SMTPException, OSError) as exc:
+        remaining = items[sent:]
+        record_progress(run_id, sent=sent)
+        if task.request.retries >= task.max_retries:
+            record_progress(run_id, failed=len(remaining))
+            return f'Не отправлено писем: {len(remaining)}'
+        raise task.retry(args=retry_args(remaining), exc=exc)
+
+    record_progress(run_id, sent=sent)
+    return f'Отправлено писем: {sent}'
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_course_digest_chunk(self, run_id, digests):
+    """
+    Отправляет пачку дайджестов: digests — список [email, [названия курсов]].
     """
-    Асинхронная задача для отправки email при обновлении курса.
+    def build_message(digest, connection):
+        email, titles = digest
+        if len(titles) == 1:
+            subject = f"Обновление курса: {titles[0]}"
+        else:
+            subject = f"Обновления курсов: {len(titles)}"
+        message = "Обновлены курсы, на которые вы подписаны:\n" + "\n".join(f"- {title}" for title in titles)
+        return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [email], connection=connection)
+
+    return _send_individually(self, run_id, digests, build_message, lambda remaining: (run_id, remaining))
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=60)
+def flush_course_updates(self, claimed=None):
+    """
+    Периодическая задача: забирает обновления курсов с истекшим окном группировки
+    и отправляет каждому подписчику один дайджест по всем его обновленным курсам.
+
+    Обновления забираются отдельной короткой транзакцией, рассылка ставится
+    уже после нее. Если брокер недоступен, задача повторяется с теми же курсами
+    (`claimed` — пары [course_id, title]) и тем же id; уже поставленные пачки
+    повторно не ставятся (см. lms.notifications.dispatch_digest_chunks).
     """
-    subject = f"Обновление курса: {course_title}"
-    message = f"Курс {course_title} был обновлен. Проверьте новые материалы."
+    from kombu.exceptions import OperationalError
+    from lms.notifications import claim_due_updates, dispatch_digest_chunks
+
+    titles = dict(claimed) if claimed is not None else claim_due_updates()
+    if not titles:
+        return 'Нет обновлений для рассылки'
 
-    # Отправляем письмо каждому подписчику
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        emails,  # список email подписчиков
-        fail_silently=False,
-    )
+    run_id = self.request.id
+    try:
+        chunks = dispatch_digest_chunks(run_id, titles, send_course_digest_chunk.delay)
+    except (OperationalError, OSError) as exc:
+        # Ключи JSON — строки, поэтому курсы передаются парами
+        raise self.retry(kwargs={'claimed': list(titles.items())}, exc=exc)
+    return f'Курсов: {len(titles)}, пачек дайджестов: {chunks}'
 
 
 @shared_task
@@ -46,3 +99,125 @@ def block_inactive_users():
     inactive_users.update(is_active=False)
 
     return f'Заблокировано пользователей: {inactive_users.count()}'
+
+
+@shared_task
+def reconcile_course_counters():
+    """
+    Ночная сверка денормализованных счетчиков курсов с таблицами подписок и уроков.
+    """
+    from lms.counters import refresh_course_counters
+
+    return f'Исправлено счетчиков курсов: {refresh_course_counters()}'
+
+
+@shared_task(bind=True)
+def recalculate_test_scores(self, result_ids):
+    """
+    Фоновый пересчет баллов результатов тестов (действие админки).
+    Прогресс доступен через состояние задачи PROGRESS: {'done', 'total'}.
+    """
+    from lms.grading import recalculate_scores
+    from lms.models import TestResult
+
+    def report(done, total):
+        self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+
+    updated = recalculate_scores(TestResult.objects.filter(pk__in=result_ids), progress=report)
+    return f'Пересчитано результатов: {len(result_ids)}, изменено баллов: {updated}'
+
+
+@shared_task
+def rebuild_quiz_document_task(quiz_id):
+    """
+    Пересборка документа теста для студентов после изменения вопросов или ответов.
+    """
+    from lms.quiz_documents import QUIZ_DOCUMENT_SCHEDULED_KEY, rebuild_quiz_document
+
+    # Флаг снимается до сборки: изменения во время сборки запланируют новую
+    cache.delete(QUIZ_DOCUMENT_SCHEDULED_KEY.format(quiz_id=quiz_id))
+    content = rebuild_quiz_document(quiz_id)
+    return 'Документ пересобран' if content is not None else 'Документ удален'
+
+
+@shared_task(bind=True)
+def autograde_text_answers_task(self):
+    """
+    Периодическая автопроверка текстовых ответов. Прогресс — состояние PROGRESS: {'done'}.
+    Проверка идет в процессе воркера: дочерний процесс prefork не может запускать
+    пул процессов. Большой объем с пулом — команда autograde_text_answers.
+    """
+    from lms.autograde import autograde_text_answers
+
+    def report(done):
+        self.update_state(state='PROGRESS', meta={'done': done})
+
+    totals = autograde_text_answers(processes=0, progress=report)
+    return (f"Засчитано: {totals['auto_approved']}, не засчитано: {totals['auto_rejected']}, "
+            f"на проверку: {totals['needs_review']}")
+
+
+@shared_task(bind=True, max_retries=3, soft_time_limit=60)
+def create_checkout_session_task(self, payment_id):
+    """
+    Создает сессию оплаты Stripe для платежа в состоянии pending. Временные
+    ошибки Stripe повторяются с нарастающей задержкой; причина каждой ошибки
+    и итоговый отказ записываются в платеж.
+    """
+    import stripe
+    from celery.exceptions import SoftTimeLimitExceeded
+    from users.models import Payment
+    from users.services import RETRYABLE_STRIPE_ERRORS, open_checkout, record_checkout_error
+
+    payment = Payment.objects.select_related('user', 'paid_course').filter(pk=payment_id, status='pending').first()
+    if payment is None:
+        return 'Платеж уже обработан'
+    try:
+        open_checkout(payment)
+    except RETRYABLE_STRIPE_ERRORS as exc:
+        last_attempt = self.request.retries >= self.max_retries
+        record_checkout_error(payment_id, exc, failed=last_attempt)
+        if last_attempt:
+            return f'Сессия не создана: {exc}'
+        raise self.retry(exc=exc, countdown=2 ** self.request.retries)
+    except (stripe.StripeError, SoftTimeLimitExceeded) as exc:
+        record_checkout_error(payment_id, str(exc) or 'Превышено время создания сессии', failed=True)
+        return f'Сессия не создана: {exc}'
+    return f'Сессия оплаты создана: {payment.stripe_session_id}'
+
+
+@shared_task
+def fail_stale_checkouts_task():
+    """
+    Периодически помечает ошибочными платежи, сессия для которых так и не была создана.
+    """
+    from users.services import fail_stale_checkouts
+
+    return f'Зависших платежей: {fail_stale_checkouts()}'
+
+
+@shared_task
+def process_stripe_events_task():
+    """
+    Обработка входящих событий Stripe пачками и очистка старых обработанных событий.
+    """
+    from users.webhooks import process_stripe_events, prune_stripe_events
+
+    totals = process_stripe_events()
+    return (f"Событий: {totals['events']}, оплачено: {totals['paid']}, истекло: {totals['expired']}, "
+            f"ошибок оплаты: {totals['failed']}, удалено старых событий: {prune_stripe_events()}")
+
+
+@shared_task
+def rebuild_revenue_rollups_task(date_from=None, date_to=None):
+    """
+    Пересборка сводки выручки за диапазон дней (даты в ISO-формате); по умолчанию — вчера и сегодня.
+    """
+    from datetime import date
+    from users.revenue import default_rebuild_range, rebuild_revenue_rollups
+
+    default_from, default_to = default_rebuild_range()
+    date_from = date.fromisoformat(date_from) if date_from else default_from
+    date_to = date.fromisoformat(date_to) if date_to else default_to
+    rows = rebuild_revenue_rollups(date_from, date_to)
+    return f'Сводка выручки за {date_from}..{date_to} пересобрана, строк: {rows}'
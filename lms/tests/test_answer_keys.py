@@ -0,0 +1,61 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.answer_keys import get_answer_key
+from lms.models import Course, QuizModel, Question, Answer
+
+
+@pytest.fixture
+def quiz():
+    teacher = User.objects.create_user(email='teacher@example.com', password='password')
+    course = Course.objects.create(title='Курс', description='Описание', owner=teacher)
+    quiz = QuizModel.objects.create(course=course, owner=teacher, title='Тест')
+    question = Question.objects.create(text='Столица Франции?', question_type='multiple_choice', test=quiz,
+                                       owner=teacher, correct_answer='  Париж ')
+    Answer.objects.create(text='Париж', is_correct=True, question=question, owner=teacher)
+    Answer.objects.create(text='Лион', question=question, owner=teacher)
+    return quiz
+
+
+@pytest.mark.django_db
+def test_answer_key_is_cached_and_invalidated(quiz):
+    question = quiz.questions.get()
+    key = get_answer_key(quiz.pk)
+    assert key[question.pk]['correct'] == {question.answers.get(text='Париж').pk}
+    assert key[question.pk]['correct_text'] == 'париж'
+
+    with CaptureQueriesContext(connection) as queries:
+        assert get_answer_key(quiz.pk) is key
+    assert len(queries) == 0
+
+    lyon = question.answers.get(text='Лион')
+    lyon.is_correct = True
+    lyon.save()
+    assert lyon.pk in get_answer_key(quiz.pk)[question.pk]['correct']
+
+    question.delete()
+    assert get_answer_key(quiz.pk) == {}
+
+
+@pytest.mark.django_db
+def test_answers_serialize_correctness_from_answer_key(quiz):
+    client = APIClient()
+    client.force_authenticate(user=quiz.owner)
+    get_answer_key(quiz.pk)
+
+    with CaptureQueriesContext(connection) as few:
+        response = client.get(reverse('lms:answer-list'))
+    assert response.status_code == 200
+    assert {answer['text']: answer['is_correct'] for answer in response.data['results']} == {
+        'Париж': True, 'Лион': False,
+    }
+
+    # Вопрос приходит через select_related, правильность — из ключа: число запросов не растет
+    question = quiz.questions.get()
+    Answer.objects.bulk_create([Answer(text=f'Город {i}', question=question, owner=quiz.owner) for i in range(5)])
+    with CaptureQueriesContext(connection) as many:
+        client.get(reverse('lms:answer-list'))
+    assert len(many) == len(few)
@@ -0,0 +1,71 @@
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from users.models import User
+from lms.autograde import autograde_text_answers, grade_text, normalize, NORMALIZATION_STEPS
+from lms.leaderboards import QUIZ_LEADERBOARD_KEY, get_leaderboard_backend
+from lms.models import Course, QuizModel, Question, QuestionStats, StudentAnswer
+from lms.models import TestResult as QuizResult  # Имя Test* pytest принял бы за тестовый класс
+
+
+def test_normalization_folds_case_spaces_and_homoglyphs():
+    # «Pаris» с кириллической «а», неразрывный пробел и пунктуация
+    assert normalize('  Pаris, FRANCE! ') == normalize('paris france')
+    assert normalize('Ｐａｒｉｓ') == 'paris'  # полноширинные символы (NFKC)
+    assert normalize('Paris!', steps=('case',)) == 'paris!'
+
+
+def test_grade_text_uses_thresholds():
+    grade = lambda response: grade_text(response, 'Фотосинтез', NORMALIZATION_STEPS, 0.9, 0.5)[0]
+    assert grade('фотосинтез.') == 'auto_approved'
+    assert grade('фотосинтес') == 'auto_approved'  # одна опечатка
+    assert grade('синтез') == 'needs_review'
+    assert grade('дыхание') == 'auto_rejected'
+    assert grade_text('что угодно', '', NORMALIZATION_STEPS, 0.9, 0.5) == ('needs_review', None)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('processes', [0, 2])
+def test_autograde_marks_confident_answers_and_rescores(processes, django_capture_on_commit_callbacks):
+    teacher = User.objects.create_user(email='teacher@example.com', password='password')
+    course = Course.objects.create(title='Курс', description='Описание', owner=teacher)
+    quiz = QuizModel.objects.create(course=course, owner=teacher, title='Тест')
+    question = Question.objects.create(text='Процесс?', question_type='text', test=quiz, owner=teacher,
+                                       correct_answer='Фотосинтез')
+    responses = ['ФОТОСИНТЕЗ', 'синтез', 'дыхание']
+    results = []
+    for i, response in enumerate(responses):
+        student = User.objects.create_user(email=f's{i}@example.com', password='password')
+        result = QuizResult.objects.create(student=student, test=quiz)
+        StudentAnswer.objects.create(test_result=result, question=question, text_response=response)
+        results.append(result)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        totals = autograde_text_answers(batch_size=2, processes=processes)
+    assert totals == {'auto_approved': 1, 'auto_rejected': 1, 'needs_review': 1}
+    statuses = dict(StudentAnswer.objects.values_list('text_response', 'grading_status'))
+    assert statuses == {'ФОТОСИНТЕЗ': 'auto_approved', 'синтез': 'needs_review', 'дыхание': 'auto_rejected'}
+    assert [QuizResult.objects.get(pk=r.pk).score for r in results] == [Decimal('100.00'), 0, 0]
+    # Пересчитанный балл попадает в статистику заданий и рейтинг
+    assert QuestionStats.objects.get(question=question).correct_count == 1
+    assert get_leaderboard_backend().top(QUIZ_LEADERBOARD_KEY.format(quiz_id=quiz.pk), 0, 10) == [
+        (results[0].student_id, 100.0),
+    ]
+
+    # Повторный запуск проверенные ответы не трогает
+    assert autograde_text_answers(processes=processes) == {'auto_approved': 0, 'auto_rejected': 0, 'needs_review': 0}
+
+
+@pytest.mark.django_db
+def test_autograde_command_runs_process_pool(capsys):
+    teacher = User.objects.create_user(email='teacher@example.com', password='password')
+    course = Course.objects.create(title='Курс', description='Описание', owner=teacher)
+    quiz = QuizModel.objects.create(course=course, owner=teacher, title='Тест')
+    question = Question.objects.create(text='Столица?', question_type='text', test=quiz, owner=teacher,
+                                       correct_answer='Париж')
+    for i, response in enumerate(['париж', 'Лондон', 'Париж!']):
+        result = QuizResult.objects.create(student=User.objects.create_user(email=f's{i}@example.com'), test=quiz)
+        StudentAnswer.objects.create(test_result=result, question=question, text_response=response)
+
+    call_command('autograde_text_answers', processes=2, batch_size=2)
+    assert 'Засчитано: 2, не засчитано: 1, на проверку: 0' in capsys.readouterr().out
@@ -0,0 +1,135 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.catalog import get_catalog_page, get_catalog_version
+from lms.counters import refresh_course_counters
+from lms.subscriptions import ENROLL, bulk_subscriptions, toggle_subscription
+from lms.models import Course, Lesson, Subscription
+from django.contrib.auth.models import Group
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def student_group():
+    group, _ = Group.objects.get_or_create(name='Студент')
+    return group
+
+
+@pytest.fixture
+def student_user(student_group):
+    user = User.objects.create_user(email='student@example.com', password='password')
+    user.groups.add(student_group)
+    return user
+
+
+@pytest.fixture
+def course(student_user):
+    return Course.objects.create(title='Курс 1', description='Описание', owner=student_user, status='approved')
+
+
+def _course_queries(context):
+    return [query['sql'] for query in context.captured_queries if 'FROM "lms_course"' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_catalog_page_served_from_cache(api_client, student_user, course):
+    api_client.force_authenticate(user=student_user)
+    api_client.get(reverse('lms:course-list'))
+
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get(reverse('lms:course-list'))
+
+    assert response.status_code == 200
+    assert response.data['results'][0]['title'] == 'Курс 1'
+    assert _course_queries(context) == []
+
+
+@pytest.mark.django_db
+def test_catalog_invalidated_on_course_and_lesson_change(api_client, student_user, course):
+    api_client.force_authenticate(user=student_user)
+    api_client.get(reverse('lms:course-list'))
+    version = get_catalog_version()
+
+    course.title = 'Новое название'
+    course.save()
+    Lesson.objects.create(title='Урок', description='Описание', video_url='https://youtu.be/abc123',
+                          course=course, owner=student_user)
+
+    assert get_catalog_version() > version
+    response = api_client.get(reverse('lms:course-list'))
+    assert response.data['results'][0]['title'] == 'Новое название'
+    assert response.data['results'][0]['lessons_count'] == 1
+
+
+@pytest.mark.django_db
+def test_catalog_subscription_overlay_is_per_user(api_client, student_user, student_group, course):
+    other = User.objects.create_user(email='other@example.com', password='password')
+    other.groups.add(student_group)
+    Subscription.objects.create(user=student_user, course=course)
+
+    api_client.force_authenticate(user=student_user)
+    assert api_client.get(reverse('lms:course-list')).data['results'][0]['is_subscribed'] is True
+    api_client.force_authenticate(user=other)
+    assert api_client.get(reverse('lms:course-list')).data['results'][0]['is_subscribed'] is False
+
+
+@pytest.mark.django_db
+def test_catalog_invalidated_on_subscription_change(api_client, student_user, course,
+                                                    django_capture_on_commit_callbacks):
+    api_client.force_authenticate(user=student_user)
+    api_client.get(reverse('lms:course-list'))
+    version = get_catalog_version()
+
+    # Подписка меняет subscribers_count сырым SQL, без сигналов моделей
+    with django_capture_on_commit_callbacks(execute=True):
+        toggle_subscription(student_user.pk, course.pk)
+    assert get_catalog_version() > version
+    assert api_client.get(reverse('lms:course-list')).data['results'][0]['subscribers_count'] == 1
+
+    # Пачка, которая ничего не изменила, кеш не сбрасывает
+    version = get_catalog_version()
+    with django_capture_on_commit_callbacks(execute=True):
+        list(bulk_subscriptions(student_user, ENROLL, [(student_user.pk, course.pk)]))
+    assert get_catalog_version() == version
+
+
+@pytest.mark.django_db
+def test_catalog_invalidated_on_counter_updates(api_client, student_user, course,
+                                                django_capture_on_commit_callbacks):
+    api_client.force_authenticate(user=student_user)
+    api_client.get(reverse('lms:course-list'))
+    version = get_catalog_version()
+
+    # Подписка через ORM меняет счетчик update() в сигнале, без post_save курса
+    with django_capture_on_commit_callbacks(execute=True):
+        Subscription.objects.create(user=student_user, course=course)
+    assert get_catalog_version() > version
+    assert api_client.get(reverse('lms:course-list')).data['results'][0]['subscribers_count'] == 1
+
+    version = get_catalog_version()
+    Course.objects.filter(pk=course.pk).update(subscribers_count=5)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert refresh_course_counters() == 1
+    assert get_catalog_version() > version
+    assert api_client.get(reverse('lms:course-list')).data['results'][0]['subscribers_count'] == 1
+
+
+@pytest.mark.django_db
+def test_catalog_page_built_once(rf):
+    request = rf.get('/api/lms/courses/')
+    calls = []
+
+    def build_page():
+        calls.append(1)
+        return {'count': 0, 'results': []}
+
+    assert get_catalog_page(request, build_page) == {'count': 0, 'results': []}
+    assert get_catalog_page(request, build_page) == {'count': 0, 'results': []}
+    assert len(calls) == 1
@@ -0,0 +1,74 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.models import Course, Lesson, QuizModel, Question, Answer
+from django.contrib.auth.models import Group
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def teacher_user():
+    user = User.objects.create_user(email='teacher@example.com', password='passwordteacher')
+    group, _ = Group.objects.get_or_create(name='Преподаватель')
+    user.groups.add(group)
+    return user
+
+
+@pytest.fixture
+def course(teacher_user):
+    return Course.objects.create(title='Test Course', description='Description', owner=teacher_user)
+
+
+@pytest.fixture
+def lesson(teacher_user, course):
+    return Lesson.objects.create(title='Test Lesson', description='Lesson Description',
+                                 video_url='https://www.youtube.com/watch?v=abc123', course=course, owner=teacher_user)
+
+
+@pytest.fixture
+def quiz(teacher_user, course):
+    quiz = QuizModel.objects.create(course=course, owner=teacher_user, title='Quiz')
+    question = Question.objects.create(text='2 + 2?', question_type='multiple_choice', test=quiz, owner=teacher_user)
+    Answer.objects.create(text='4', is_correct=True, question=question, owner=teacher_user)
+    return quiz
+
+
+@pytest.mark.django_db
+def test_course_detail_not_modified(api_client, teacher_user, course, lesson):
+    api_client.force_authenticate(user=teacher_user)
+    url = reverse('lms:course-detail', args=[course.id])
+    response = api_client.get(url)
+    assert response.status_code == 200
+    etag = response['ETag']
+
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    lesson.delete()
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_lesson_detail_if_modified_since(api_client, teacher_user, lesson):
+    api_client.force_authenticate(user=teacher_user)
+    url = reverse('lms:lesson-detail', args=[lesson.id])
+    response = api_client.get(url)
+    assert response.status_code == 200
+    assert api_client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code == 304
+
+
+@pytest.mark.django_db
+def test_quiz_detail_etag_follows_answers(api_client, teacher_user, quiz):
+    api_client.force_authenticate(user=teacher_user)
+    url = reverse('lms:test-detail', args=[quiz.id])
+    etag = api_client.get(url)['ETag']
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    Answer.objects.create(text='5', question=quiz.questions.get(), owner=teacher_user)
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
@@ -0,0 +1,87 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.models import Course, Lesson, Subscription
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def owner():
+    return User.objects.create_user(email='owner@example.com', password='password')
+
+
+@pytest.fixture
+def course(owner):
+    return Course.objects.create(title='Курс', description='Описание', owner=owner, status='approved')
+
+
+def create_lesson(course, title='Урок'):
+    return Lesson.objects.create(title=title, description='Описание', video_url='https://www.youtube.com/watch?v=abc123',
+                                 course=course, owner=course.owner)
+
+
+@pytest.mark.django_db
+def test_lessons_count_follows_lesson_writes(course, owner):
+    other = Course.objects.create(title='Другой курс', description='Описание', owner=owner)
+    lesson = create_lesson(course)
+    create_lesson(course, 'Урок 2')
+    course.refresh_from_db()
+    assert course.lessons_count == 2
+
+    lesson.course = other
+    lesson.save()
+    course.refresh_from_db()
+    other.refresh_from_db()
+    assert (course.lessons_count, other.lessons_count) == (1, 1)
+
+    lesson.delete()
+    other.refresh_from_db()
+    assert other.lessons_count == 0
+
+
+@pytest.mark.django_db
+def test_subscribers_count_follows_toggle_and_bulk(api_client, course, owner):
+    students = [User.objects.create_user(email=f's{i}@example.com', password='password') for i in range(3)]
+    api_client.force_authenticate(user=students[0])
+    api_client.post(reverse('lms:course-subscription'), {'course_id': course.id})
+    course.refresh_from_db()
+    assert course.subscribers_count == 1
+
+    api_client.force_authenticate(user=owner)
+    api_client.post(reverse('lms:course-subscription-bulk'), {
+        'action': 'enroll', 'course_id': course.id, 'user_ids': [s.id for s in students],
+    }, format='json')
+    course.refresh_from_db()
+    assert course.subscribers_count == 3
+
+    api_client.post(reverse('lms:course-subscription-bulk'), {
+        'action': 'unenroll', 'course_id': course.id, 'user_ids': [students[1].id],
+    }, format='json')
+    Subscription.objects.filter(user=students[2]).delete()
+    course.refresh_from_db()
+    assert course.subscribers_count == 1
+
+
+@pytest.mark.django_db
+def test_course_save_does_not_overwrite_counters(course):
+    stale = Course.objects.get(pk=course.pk)
+    create_lesson(course)
+    stale.title = 'Новое название'
+    stale.save()
+    course.refresh_from_db()
+    assert course.lessons_count == 1
+
+
+@pytest.mark.django_db
+def test_reconcile_command_fixes_drift(course):
+    create_lesson(course)
+    Course.objects.filter(pk=course.pk).update(lessons_count=10, subscribers_count=5)
+    call_command('reconcile_course_counters')
+    course.refresh_from_db()
+    assert (course.subscribers_count, course.lessons_count) == (0, 1)
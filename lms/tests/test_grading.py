@@ -0,0 +1,128 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.grading import recalculate_scores
+from lms.models import Course, QuizModel, Question, Answer, StudentAnswer
+from lms.models import TestResult as QuizResult  # Имя Test* pytest принял бы за тестовый класс
+from lms.roles import get_user_roles
+from lms.tasks import recalculate_test_scores
+
+
+@pytest.fixture
+def quiz():
+    teacher = User.objects.create_user(email='teacher@example.com', password='password')
+    course = Course.objects.create(title='Курс', description='Описание', owner=teacher)
+    quiz = QuizModel.objects.create(course=course, owner=teacher, title='Тест')
+    for i in range(2):
+        question = Question.objects.create(text=f'Вопрос {i}', question_type='multiple_choice', test=quiz, owner=teacher)
+        Answer.objects.create(text='Верно', is_correct=True, question=question, owner=teacher)
+        Answer.objects.create(text='Неверно', is_correct=False, question=question, owner=teacher)
+    Question.objects.create(text='Опишите', question_type='text', test=quiz, owner=teacher)
+    return quiz
+
+
+def submit(quiz, email, correct):
+    """
+    Результат, в котором первые `correct` вопросов отвечены верно.
+    """
+    student = User.objects.create_user(email=email, password='password')
+    result = QuizResult.objects.create(student=student, test=quiz)
+    for i, question in enumerate(quiz.questions.order_by('id')):
+        if question.question_type == 'text':
+            StudentAnswer.objects.create(test_result=result, question=question, text_response='...',
+                                         is_approved=i < correct)
+        else:
+            StudentAnswer.objects.create(test_result=result, question=question,
+                                         selected_answer=question.answers.get(is_correct=i < correct))
+    return result
+
+
+@pytest.mark.django_db
+def test_calculate_score_uses_constant_queries(quiz):
+    result = submit(quiz, 'student@example.com', correct=2)
+    with CaptureQueriesContext(connection) as queries:
+        result.calculate_score()
+    # Агрегирующий SELECT и UPDATE, затем синхронизация статистики заданий в точке сохранения
+    assert len(queries) == 2 + 2 + 5
+    result.refresh_from_db()
+    assert result.score == Decimal('66.67')
+
+
+@pytest.mark.django_db
+def test_bulk_recalculation_and_task(quiz):
+    results = [submit(quiz, f'student{i}@example.com', correct=i) for i in range(4)]
+    with CaptureQueriesContext(connection) as queries:
+        assert recalculate_scores(QuizResult.objects.all(), batch_size=2) == 3  # у нулевого балл не меняется
+    # Выборка id, затем на каждую из двух пачек — SELECT, bulk_update в точке сохранения
+    # и синхронизация статистики заданий в своей точке сохранения (результаты FOR UPDATE,
+    # вопросы, верные ответы, UPSERT, снимки)
+    assert len(queries) == 1 + 2 * (1 + 3 + 2 + 5)
+    assert [r.score for r in QuizResult.objects.order_by('id')] == [
+        Decimal('0.00'), Decimal('33.33'), Decimal('66.67'), Decimal('100.00'),
+    ]
+
+    QuizResult.objects.update(score=0)
+    recalculate_test_scores.apply(args=([r.pk for r in results],))
+    assert QuizResult.objects.get(pk=results[3].pk).score == Decimal('100.00')
+
+
+def attempt_payload(quiz, correct):
+    answers = []
+    for i, question in enumerate(quiz.questions.order_by('id')):
+        if question.question_type == 'text':
+            answers.append({'question': question.id, 'text_response': 'Ответ'})
+        else:
+            answers.append({'question': question.id,
+                            'selected_answer': question.answers.get(is_correct=i < correct).id})
+    return {'answers': answers}
+
+
+@pytest.mark.django_db
+def test_submit_attempt_in_constant_queries(quiz):
+    QuizModel.objects.filter(pk=quiz.pk).update(status='approved')
+    student = User.objects.create_user(email='student@example.com', password='password')
+    client = APIClient()
+    client.force_authenticate(user=student)
+    url = reverse('lms:test-submit', args=[quiz.pk])
+    get_user_roles(student)  # роли кешируются после первого запроса, прогреваем заранее
+
+    payload = attempt_payload(quiz, correct=1)
+    with CaptureQueriesContext(connection) as small:
+        response = client.post(url, payload, format='json')
+    assert response.status_code == 201
+    assert response.data['score'] == Decimal('33.33')
+    assert StudentAnswer.objects.filter(test_result_id=response.data['id']).count() == 3
+
+    # Длина теста не влияет на число запросов
+    for i in range(10):
+        question = Question.objects.create(text=f'Доп. {i}', question_type='multiple_choice', test=quiz,
+                                           owner=quiz.owner)
+        Answer.objects.create(text='Верно', is_correct=True, question=question, owner=quiz.owner)
+    payload = attempt_payload(quiz, correct=13)
+    with CaptureQueriesContext(connection) as large:
+        response = client.post(url, payload, format='json')
+    assert response.status_code == 201
+    assert len(large) == len(small)
+
+
+@pytest.mark.django_db
+def test_submit_rejects_foreign_and_duplicate_answers(quiz):
+    QuizModel.objects.filter(pk=quiz.pk).update(status='approved')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(email='student@example.com', password='password'))
+    url = reverse('lms:test-submit', args=[quiz.pk])
+    question = quiz.questions.filter(question_type='multiple_choice').first()
+    other_answer = Answer.objects.exclude(question=question).first()
+
+    for answers in (
+        [{'question': question.id, 'selected_answer': other_answer.id}],
+        [{'question': question.id, 'selected_answer': question.answers.first().id}] * 2,
+        [{'question': 999999, 'selected_answer': 1}],
+    ):
+        response = client.post(url, {'answers': answers}, format='json')
+        assert response.status_code == 400
+    assert not QuizResult.objects.exists()
@@ -0,0 +1,72 @@
+import pytest
+from datetime import timedelta
+from django.db import connection
+from django.utils import timezone
+from users.models import User, Payment
+from lms.models import Course, Lesson, Subscription, QuizModel
+from lms.models import TestResult as QuizResult  # Имя Test* pytest принял бы за тестовый класс
+
+
+@pytest.fixture
+def seeded():
+    """
+    Заполняет таблицы данными и обновляет статистику планировщика.
+    """
+    teacher = User.objects.create_user(email='teacher@example.com', password='password')
+    students = User.objects.bulk_create([
+        User(email=f'student{i}@example.com', last_login=timezone.now() - timedelta(days=i)) for i in range(50)
+    ])
+    courses = Course.objects.bulk_create([
+        Course(title=f'Курс {i}', description='Описание', owner=teacher,
+               status='approved' if i % 5 == 0 else 'draft')
+        for i in range(200)
+    ])
+    # Уроки распределены между преподавателем и студентами-авторами
+    Lesson.objects.bulk_create([
+        Lesson(title=f'Урок {i}', description='Описание', video_url='https://youtu.be/abc123',
+               course=course, owner=teacher if i == 0 else students[(n + i) % len(students)])
+        for n, course in enumerate(courses) for i in range(3)
+    ])
+    Subscription.objects.bulk_create([Subscription(user=student, course=courses[0]) for student in students])
+    Payment.objects.bulk_create([
+        Payment(user=student, paid_course=courses[0], amount=10, payment_method='cash') for student in students
+    ])
+    quiz = QuizModel.objects.create(course=courses[0], owner=teacher, title='Тест')
+    QuizResult.objects.bulk_create([QuizResult(student=student, test=quiz) for student in students])
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        # На маленьких таблицах планировщик всегда выбирает Seq Scan;
+        # запрещаем его, чтобы проверить, что подходящий индекс вообще есть
+        cursor.execute('SET LOCAL enable_seqscan = off')
+    return {'teacher': teacher, 'student': students[0], 'course': courses[0], 'quiz': quiz}
+
+
+def hot_queries(data):
+    month_ago = timezone.now() - timedelta(days=30)
+    return {
+        'course_approved_idx': Course.objects.filter(status='approved').order_by('id')[:20],
+        'course_approved_popular_idx': Course.objects.filter(status='approved').order_by('-subscribers_count', '-id')[:20],
+        'lesson_owner_id_idx': Lesson.objects.filter(owner=data['teacher']).order_by('id'),
+        'lesson_course_id_idx': Lesson.objects.filter(course=data['course']).order_by('id'),
+        'subscription_course_user_idx': Subscription.objects.filter(course=data['course']).values_list('user_id'),
+        'payment_user_date_idx': Payment.objects.filter(user=data['student']).order_by('-payment_date'),
+        'testresult_student_test_idx': QuizResult.objects.filter(student=data['student'], test=data['quiz']),
+        'user_active_last_login_idx': User.objects.filter(last_login__lt=month_ago, is_active=True),
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('index_name', [
+    'course_approved_idx',
+    'course_approved_popular_idx',
+    'lesson_owner_id_idx',
+    'lesson_course_id_idx',
+    'subscription_course_user_idx',
+    'payment_user_date_idx',
+    'testresult_student_test_idx',
+    'user_active_last_login_idx',
+])
+def test_hot_query_uses_index(seeded, index_name):
+    plan = hot_queries(seeded)[index_name].explain()
+    assert index_name in plan, plan
@@ -0,0 +1,109 @@
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.grading import recalculate_scores
+from lms.models import Course, QuizModel, Question, Answer, QuestionStats, AnswerStats, StudentAnswer
+from lms.models import TestResult as QuizResult  # Имя Test* pytest принял бы за тестовый класс
+
+
+@pytest.fixture
+def teacher():
+    user = User.objects.create_user(email='teacher@example.com', password='password')
+    user.groups.add(Group.objects.get_or_create(name='Преподаватель')[0])
+    return user
+
+
+@pytest.fixture
+def quiz(teacher):
+    course = Course.objects.create(title='Курс', description='Описание', owner=teacher)
+    quiz = QuizModel.objects.create(course=course, owner=teacher, title='Тест', status='approved')
+    for i in range(2):
+        question = Question.objects.create(text=f'Вопрос {i}', question_type='multiple_choice', test=quiz,
+                                           owner=teacher)
+        Answer.objects.create(text='Верно', is_correct=True, question=question, owner=teacher)
+        Answer.objects.create(text='Неверно', question=question, owner=teacher)
+    return quiz
+
+
+def submit_attempts(quiz, patterns):
+    """
+    patterns — для каждого студента кортеж верности ответов по вопросам.
+    """
+    questions = list(quiz.questions.order_by('id'))
+    for n, pattern in enumerate(patterns):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(email=f's{n}@example.com', password='password'))
+        answers = [{'question': q.id, 'selected_answer': q.answers.get(is_correct=ok).id}
+                   for q, ok in zip(questions, pattern)]
+        response = client.post(reverse('lms:test-submit', args=[quiz.pk]), {'answers': answers}, format='json')
+        assert response.status_code == 201
+
+
+def snapshot(quiz):
+    return (
+        sorted(QuestionStats.objects.filter(question__test=quiz).values_list(
+            'question_id', 'attempts', 'correct_count', 'score_sum', 'score_sq_sum', 'correct_score_sum')),
+        sorted(AnswerStats.objects.values_list('answer_id', 'selections')),
+    )
+
+
+@pytest.mark.django_db
+def test_stats_are_incremental_and_match_full_rebuild(teacher, quiz):
+    submit_attempts(quiz, [(True, True), (True, False), (False, False), (True, False)])
+    first, second = quiz.questions.order_by('id')
+    stats = QuestionStats.objects.get(question=first)
+    assert (stats.attempts, stats.correct_count) == (4, 3)
+    # Первый вопрос хорошо отделяет сильных студентов от слабых
+    assert stats.discrimination > 0.5
+
+    incremental = snapshot(quiz)
+    call_command('rebuild_item_stats', quiz=[quiz.pk])
+    assert snapshot(quiz) == incremental
+
+    client = APIClient()
+    client.force_authenticate(user=teacher)
+    response = client.get(reverse('lms:test-item-analysis', args=[quiz.pk]))
+    assert response.status_code == 200
+    report = {question['id']: question for question in response.data['questions']}
+    assert report[second.pk]['correct_rate'] == 0.25
+    wrong = next(answer for answer in report[second.pk]['answers'] if not answer['is_correct'])
+    assert wrong['selection_rate'] == 0.75
+
+
+@pytest.mark.django_db
+def test_item_analysis_is_for_quiz_owner_only(quiz):
+    other = User.objects.create_user(email='other@example.com', password='password')
+    other.groups.add(Group.objects.get_or_create(name='Преподаватель')[0])
+    client = APIClient()
+    client.force_authenticate(user=other)
+    assert client.get(reverse('lms:test-item-analysis', args=[quiz.pk])).status_code == 403
+
+
+@pytest.mark.django_db
+def test_regrading_updates_stats_by_difference(teacher, quiz):
+    text = Question.objects.create(text='Опишите', question_type='text', correct_answer='Ответ', test=quiz,
+                                   owner=teacher)
+    questions = list(quiz.questions.order_by('id'))
+    for n, pattern in enumerate([(True, True), (True, False), (False, False)]):
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(email=f's{n}@example.com', password='password'))
+        answers = [{'question': q.id, 'selected_answer': q.answers.get(is_correct=ok).id}
+                   for q, ok in zip(questions, pattern)] + [{'question': text.id, 'text_response': 'Ответ'}]
+        assert client.post(reverse('lms:test-submit', args=[quiz.pk]), {'answers': answers},
+                           format='json').status_code == 201
+    assert QuestionStats.objects.get(question=text).correct_count == 0
+
+    # Засчитанные позже текстовые ответы меняют и балл, и статистику всех вопросов теста
+    StudentAnswer.objects.filter(question=text, test_result__student__email__in=['s1@example.com',
+                                                                                 's2@example.com']).update(
+        is_approved=True, grading_status='auto_approved')
+    assert recalculate_scores(QuizResult.objects.all()) == 2
+    stats = QuestionStats.objects.get(question=text)
+    assert (stats.attempts, stats.correct_count) == (3, 2)
+
+    incremental = snapshot(quiz)
+    call_command('rebuild_item_stats', quiz=[quiz.pk])
+    assert snapshot(quiz) == incremental
@@ -0,0 +1,116 @@
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+import redis
+from lms import leaderboards
+from lms.grading import recalculate_scores
+from lms.leaderboards import QUIZ_LEADERBOARD_KEY, get_leaderboard_backend, get_leaderboard_page
+from lms.models import Course, QuizModel, Question, StudentAnswer
+from lms.models import TestResult as QuizResult  # Имя Test* pytest принял бы за тестовый класс
+
+
+@pytest.fixture
+def course():
+    owner = User.objects.create_user(email='teacher@example.com', password='password')
+    course = Course.objects.create(title='Курс', description='Описание', owner=owner, status='approved')
+    for i in range(2):
+        QuizModel.objects.create(course=course, owner=owner, title=f'Тест {i}', status='approved')
+    return course
+
+
+@pytest.fixture
+def students():
+    group, _ = Group.objects.get_or_create(name='Студент')
+    users = [User.objects.create_user(email=f's{i}@example.com', password='password') for i in range(3)]
+    group.user_set.add(*users)
+    return users
+
+
+@pytest.mark.django_db
+def test_results_update_quiz_and_course_leaderboards(course, students, django_capture_on_commit_callbacks):
+    first, second = course.tests.order_by('id')
+    with django_capture_on_commit_callbacks(execute=True):
+        QuizResult.objects.create(student=students[0], test=first, score=50)
+        QuizResult.objects.create(student=students[0], test=first, score=80)  # лучший балл
+        QuizResult.objects.create(student=students[0], test=first, score=60)
+        QuizResult.objects.create(student=students[1], test=first, score=90)
+        QuizResult.objects.create(student=students[1], test=second, score=10)
+        QuizResult.objects.create(student=students[2], test=second, score=95)
+
+    client = APIClient()
+    client.force_authenticate(user=students[0])
+    response = client.get(reverse('lms:test-leaderboard', args=[first.pk]))
+    assert response.data['results'] == [
+        {'rank': 1, 'student': students[1].pk, 'score': 90}, {'rank': 2, 'student': students[0].pk, 'score': 80},
+    ]
+    assert response.data['me'] == {'rank': 2, 'score': 80}
+
+    response = client.get(reverse('lms:course-leaderboard', args=[course.pk]), {'offset': 1, 'limit': 1})
+    assert response.data['count'] == 3
+    assert response.data['results'] == [{'rank': 2, 'student': students[2].pk, 'score': 95}]
+    assert response.data['me'] == {'rank': 3, 'score': 80}
+
+    # Email участников видит только владелец курса (и модераторы)
+    course.owner.groups.add(Group.objects.get_or_create(name='Преподаватель')[0])
+    client.force_authenticate(user=course.owner)
+    response = client.get(reverse('lms:course-leaderboard', args=[course.pk]), {'offset': 1, 'limit': 1})
+    assert response.data['results'] == [{'rank': 2, 'student': students[2].pk, 'score': 95, 'email': 's2@example.com'}]
+
+
+@pytest.mark.django_db
+def test_rebuild_restores_leaderboards(course, students):
+    quiz = course.tests.first()
+    QuizResult.objects.create(student=students[0], test=quiz, score=40)
+    QuizResult.objects.create(student=students[1], test=quiz, score=70)
+    key = QUIZ_LEADERBOARD_KEY.format(quiz_id=quiz.pk)
+    assert get_leaderboard_backend().count(key) == 0  # коммита не было — рейтинг не обновлялся
+
+    call_command('rebuild_leaderboards')
+    assert get_leaderboard_backend().top(key, 0, 10) == [(students[1].pk, 70.0), (students[0].pk, 40.0)]
+
+
+@pytest.mark.django_db
+def test_rescoring_updates_leaderboards(course, students, django_capture_on_commit_callbacks):
+    quiz = course.tests.first()
+    question = Question.objects.create(text='Опишите', question_type='text', correct_answer='Ответ', test=quiz,
+                                       owner=course.owner)
+    with django_capture_on_commit_callbacks(execute=True):
+        results = [QuizResult.objects.create(student=student, test=quiz, score=0) for student in students[:2]]
+    answers = [StudentAnswer.objects.create(test_result=result, question=question, text_response='Ответ')
+               for result in results]
+    key = QUIZ_LEADERBOARD_KEY.format(quiz_id=quiz.pk)
+
+    # bulk_update обходит post_save: рейтинг обновляет сам пересчет
+    StudentAnswer.objects.filter(pk__in=[answer.pk for answer in answers]).update(is_approved=True)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert recalculate_scores(QuizResult.objects.all()) == 2
+    assert get_leaderboard_backend().top(key, 0, 10) == [(students[0].pk, 100.0), (students[1].pk, 100.0)]
+
+    # Сниженный балл не может попасть в рейтинг лучших баллов — рейтинг курса пересобирается
+    StudentAnswer.objects.filter(pk=answers[0].pk).update(is_approved=False)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert recalculate_scores(QuizResult.objects.all()) == 1
+    assert get_leaderboard_backend().top(key, 0, 10) == [(students[1].pk, 100.0), (students[0].pk, 0.0)]
+
+
+@pytest.mark.django_db
+def test_leaderboard_ties_and_redis_errors(course, students, monkeypatch):
+    quiz = course.tests.first()
+    for student in reversed(students):
+        QuizResult.objects.create(student=student, test=quiz, score=50)
+    call_command('rebuild_leaderboards')
+    key = QUIZ_LEADERBOARD_KEY.format(quiz_id=quiz.pk)
+    # При равных баллах выше студент с меньшим id
+    page = get_leaderboard_page(key, students[1].pk, 0, 10)
+    assert [row['student'] for row in page['results']] == [student.pk for student in students]
+    assert page['me'] == {'rank': 2, 'score': 50.0}
+
+    class BrokenBackend:
+        def top(self, *args):
+            raise redis.ConnectionError('Redis недоступен')
+
+    monkeypatch.setattr(leaderboards, 'get_leaderboard_backend', BrokenBackend)
+    assert get_leaderboard_page(key, students[1].pk, 0, 10) == {'count': 0, 'results': [], 'me': None}
@@ -1,4 +1,6 @@
 import pytest
+from io import StringIO
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework.test import APIClient
 from users.models import User
@@ -45,3 +47,55 @@ def test_teacher_can_create_lesson(api_client, teacher_user, course):
         'course': course.id
     })
     assert response.status_code == 201
+
+
+@pytest.fixture
+def student_user():
+    user = User.objects.create_user(email='student@example.com', password='password')
+    group, _ = Group.objects.get_or_create(name='Студент')
+    user.groups.add(group)
+    return user
+
+
+@pytest.fixture
+def admin_group():
+    group, _ = Group.objects.get_or_create(name='Администратор')
+    return group
+
+
+def _lesson_titles(api_client):
+    response = api_client.get(reverse('lms:lesson-list-create'))
+    return [item['title'] for item in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_student_sees_lessons_of_admin_courses(api_client, student_user, teacher_user, admin_group, lesson):
+    api_client.force_authenticate(user=student_user)
+    assert _lesson_titles(api_client) == []
+
+    teacher_user.groups.add(admin_group)
+    assert _lesson_titles(api_client) == ['Test Lesson']
+
+    admin_group.user_set.clear()
+    assert _lesson_titles(api_client) == []
+
+
+@pytest.mark.django_db
+def test_lesson_visibility_follows_course_owner(api_client, student_user, admin_group, course, lesson):
+    admin = User.objects.create_user(email='admin@example.com', password='password')
+    admin.groups.add(admin_group)
+    course.owner = admin
+    course.save()
+
+    api_client.force_authenticate(user=student_user)
+    assert _lesson_titles(api_client) == ['Test Lesson']
+
+
+@pytest.mark.django_db
+def test_backfill_lesson_visibility(teacher_user, admin_group, lesson):
+    teacher_user.groups.add(admin_group)
+    Lesson.objects.update(is_public=False)  # Рассинхронизация, например после прямого SQL
+
+    call_command('backfill_lesson_visibility', stdout=StringIO())
+    lesson.refresh_from_db()
+    assert lesson.is_public is True
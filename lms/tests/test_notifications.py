@@ -0,0 +1,108 @@
+import pytest
+from smtplib import SMTPException
+from unittest import mock
+
+from celery import current_app
+from django.core import mail
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.models import Course, PendingCourseUpdate, Subscription
+from lms.notifications import get_progress, queue_course_update
+from lms.tasks import flush_course_updates, send_course_digest_chunk
+
+
+@pytest.fixture
+def eager_celery():
+    current_app.conf.task_always_eager = True
+    yield
+    current_app.conf.task_always_eager = False
+
+
+@pytest.fixture
+def course():
+    owner = User.objects.create_user(email='teacher@example.com', password='password')
+    course = Course.objects.create(title='Курс', description='Описание', owner=owner, status='approved')
+    students = User.objects.bulk_create([User(email=f'student{i}@example.com') for i in range(5)])
+    Subscription.objects.bulk_create([Subscription(user=student, course=course) for student in students])
+    return course
+
+
+@pytest.mark.django_db
+def test_digests_fan_out_in_chunks(settings, eager_celery, course):
+    settings.COURSE_NOTIFY_CHUNK_SIZE = 2
+    settings.COURSE_NOTIFY_DIGEST_WINDOW = 0
+    queue_course_update(course.pk)
+    result = flush_course_updates.apply()
+
+    # Каждому подписчику — отдельное письмо
+    assert sorted(message.to[0] for message in mail.outbox) == [f'student{i}@example.com' for i in range(5)]
+    assert all(len(message.to) == 1 for message in mail.outbox)
+    assert get_progress(result.id) == {'chunks': 3, 'recipients': 5, 'sent': 5, 'failed': 0}
+
+
+@pytest.mark.django_db
+def test_failed_chunk_retries_only_unsent_emails(eager_celery):
+    sent = []
+
+    def send(self):
+        if self.to == ['b@example.com'] and not sent.count('fail'):
+            sent.append('fail')
+            raise SMTPException('Соединение разорвано')
+        sent.extend(self.to)
+
+    with mock.patch('lms.tasks.EmailMessage.send', send):
+        send_course_digest_chunk.apply(args=('run', [[email, ['Курс']] for email in
+                                                     ['a@example.com', 'b@example.com', 'c@example.com']]))
+
+    assert sent == ['a@example.com', 'fail', 'b@example.com', 'c@example.com']
+    assert get_progress('run')['sent'] == 3
+
+
+@pytest.mark.django_db
+def test_repeated_updates_are_coalesced_into_one_digest(settings, eager_celery, course):
+    settings.COURSE_NOTIFY_DIGEST_WINDOW = 0
+    other = Course.objects.create(title='Другой курс', description='Описание', owner=course.owner,
+                                  status='unapproved')
+    student = User.objects.get(email='student0@example.com')
+    Subscription.objects.create(user=student, course=other)
+
+    client = APIClient()
+    client.force_authenticate(user=course.owner)
+    for i in range(3):
+        response = client.patch(reverse('lms:course-update', args=[other.pk]), {'title': f'Другой курс {i}'})
+        assert response.status_code == 200
+    assert PendingCourseUpdate.objects.get(course=other).updates_count == 3
+    assert not mail.outbox
+
+    queue_course_update(course.pk)
+    flush_course_updates.apply()
+
+    # По одному письму на подписчика; у подписчика обоих курсов — оба названия
+    assert len(mail.outbox) == 5
+    digest = next(message for message in mail.outbox if message.to == ['student0@example.com'])
+    assert 'Курс' in digest.body and 'Другой курс 2' in digest.body
+    assert not PendingCourseUpdate.objects.exists()
+
+
+@pytest.mark.django_db
+def test_failed_dispatch_resumes_without_duplicates(settings, eager_celery, course):
+    settings.COURSE_NOTIFY_CHUNK_SIZE = 2
+    settings.COURSE_NOTIFY_DIGEST_WINDOW = 0
+    queue_course_update(course.pk)
+    dispatched, calls = [], []
+
+    def delay(run_id, digests):
+        calls.append(run_id)
+        if len(calls) == 2:
+            raise OSError('Брокер недоступен')
+        dispatched.append([email for email, _ in digests])
+
+    with mock.patch('lms.tasks.send_course_digest_chunk.delay', side_effect=delay):
+        flush_course_updates.apply()
+
+    # Обновление забрано до рассылки; повтор с тем же id ставит только недостающие пачки
+    assert not PendingCourseUpdate.objects.exists()
+    assert len(set(calls)) == 1
+    assert dispatched == [['student0@example.com', 'student1@example.com'],
+                          ['student2@example.com', 'student3@example.com'], ['student4@example.com']]
@@ -3,6 +3,7 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from users.models import User
 from lms.models import Course
+from users.models import Payment
 from django.contrib.auth.models import Group
 
 
@@ -37,3 +38,58 @@ def test_course_pagination(api_client, student_user, create_courses):
     # Проверка сортировки по id
     course_ids = [course['id'] for course in response.data['results']]
     assert course_ids == sorted(course_ids)
+
+
+@pytest.fixture
+def create_payments(student_user):
+    # Все платежи создаются одной датой, поэтому порядок определяет id
+    return Payment.objects.bulk_create([
+        Payment(user=student_user, amount=100 + i, payment_method='cash') for i in range(25)
+    ])
+
+
+@pytest.mark.django_db
+def test_payment_keyset_pagination(api_client, student_user, create_payments):
+    api_client.force_authenticate(user=student_user)
+    url = reverse('lms:payment-list') + '?count=exact'
+    seen = []
+    while url:
+        response = api_client.get(url)
+        assert response.status_code == 200
+        assert response.data['count'] == 25
+        seen.extend(payment['id'] for payment in response.data['results'])
+        url = response.data['next']
+
+    assert seen == sorted((payment.id for payment in create_payments), reverse=True)
+
+
+@pytest.mark.django_db
+def test_payment_keyset_previous_page(api_client, student_user, create_payments):
+    api_client.force_authenticate(user=student_user)
+    first = api_client.get(reverse('lms:payment-list'), {'count': 'none'})
+    assert 'count' not in first.data
+    second = api_client.get(first.data['next'])
+    previous = api_client.get(second.data['previous'])
+
+    assert [p['id'] for p in previous.data['results']] == [p['id'] for p in first.data['results']]
+    assert previous.data['previous'] is None
+
+
+@pytest.mark.django_db
+def test_course_cursor_mode(api_client, student_user, create_courses):
+    api_client.force_authenticate(user=student_user)
+    response = api_client.get(reverse('lms:course-list'), {'pagination': 'cursor', 'page_size': 10})
+    assert response.status_code == 200
+    assert len(response.data['results']) == 10
+    assert response.data['next'] is not None
+
+    response = api_client.get(response.data['next'])
+    assert [course['title'] for course in response.data['results']] == [f'Курс {i}' for i in range(11, 16)]
+    assert response.data['next'] is None
+
+
+@pytest.mark.django_db
+def test_invalid_cursor(api_client, student_user):
+    api_client.force_authenticate(user=student_user)
+    response = api_client.get(reverse('lms:payment-list'), {'cursor': 'not-a-cursor'})
+    assert response.status_code == 404
@@ -0,0 +1,63 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.roles import get_user_roles, STUDENT, TEACHER
+from django.contrib.auth.models import Group
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def student_user():
+    user = User.objects.create_user(email='student@example.com', password='password')
+    group, _ = Group.objects.get_or_create(name='Студент')
+    user.groups.add(group)
+    return user
+
+
+def _group_queries(context):
+    return [query['sql'] for query in context.captured_queries if 'auth_group' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_roles_are_cached_between_requests(api_client, student_user):
+    api_client.force_authenticate(user=student_user)
+    api_client.get(reverse('lms:course-list'))
+
+    # Новый объект пользователя, как при аутентификации по JWT
+    api_client.force_authenticate(user=User.objects.get(pk=student_user.pk))
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get(reverse('lms:course-list'))
+
+    assert response.status_code == 200
+    assert _group_queries(context) == []
+
+
+@pytest.mark.django_db
+def test_roles_cache_invalidated_on_group_change(student_user):
+    assert get_user_roles(User.objects.get(pk=student_user.pk)) == {STUDENT}
+
+    teacher_group, _ = Group.objects.get_or_create(name='Преподаватель')
+    student_user.groups.add(teacher_group)
+    assert get_user_roles(User.objects.get(pk=student_user.pk)) == {STUDENT, TEACHER}
+
+    teacher_group.user_set.clear()
+    assert get_user_roles(User.objects.get(pk=student_user.pk)) == {STUDENT}
+
+
+@pytest.mark.django_db
+def test_teacher_permission_uses_roles(api_client, student_user):
+    api_client.force_authenticate(user=student_user)
+    data = {'title': 'Курс', 'description': 'Описание', 'owner': student_user.id}
+    response = api_client.post(reverse('lms:course-list'), data)
+    assert response.status_code == 403
+
+    student_user.groups.add(Group.objects.get_or_create(name='Преподаватель')[0])
+    response = api_client.post(reverse('lms:course-list'), data)
+    assert response.status_code == 201
@@ -0,0 +1,73 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.counters import refresh_course_counters
+from lms.models import Course, Lesson, Subscription
+from django.contrib.auth.models import Group
+
+# Максимальное количество запросов на одну страницу списка курсов,
+# не зависящее от размера страницы
+COURSE_LIST_QUERY_BUDGET = 5
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def student_user():
+    user = User.objects.create_user(email='student@example.com', password='password')
+    group, _ = Group.objects.get_or_create(name='Студент')
+    user.groups.add(group)
+    return user
+
+
+@pytest.fixture
+def create_courses(student_user):
+    teacher = User.objects.create_user(email='teacher@example.com', password='password')
+    courses = Course.objects.bulk_create([
+        Course(title=f'Курс {i + 1}', description='Описание', owner=teacher, status='approved')
+        for i in range(100)
+    ])
+    Lesson.objects.bulk_create([
+        Lesson(title=f'Урок {j}', description='Описание', video_url='https://www.youtube.com/watch?v=abc123',
+               course=course, owner=teacher)
+        for course in courses for j in range(2)
+    ])
+    Subscription.objects.bulk_create([
+        Subscription(user=student_user, course=course) for course in courses[::2]
+    ])
+    # bulk_create не вызывает сигналы, счетчики пересчитываем явно
+    refresh_course_counters()
+    return courses
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('page_size', [10, 100])
+def test_course_list_query_budget(api_client, student_user, create_courses, page_size,
+                                  django_assert_max_num_queries):
+    api_client.force_authenticate(user=student_user)
+    with django_assert_max_num_queries(COURSE_LIST_QUERY_BUDGET):
+        response = api_client.get(reverse('lms:course-list'), {'page_size': page_size, 'expand': 'lessons'})
+
+    assert response.status_code == 200
+    assert len(response.data['results']) == page_size
+    subscribed_ids = {course.id for course in create_courses[::2]}
+    for course in response.data['results']:
+        assert course['lessons_count'] == 2
+        assert len(course['lessons']) == 2
+        assert course['is_subscribed'] == (course['id'] in subscribed_ids)
+
+
+@pytest.mark.django_db
+def test_course_detail_query_budget(api_client, student_user, create_courses, django_assert_max_num_queries):
+    api_client.force_authenticate(user=student_user)
+    course = create_courses[0]
+    with django_assert_max_num_queries(COURSE_LIST_QUERY_BUDGET):
+        response = api_client.get(reverse('lms:course-detail', args=[course.id]))
+
+    assert response.status_code == 200
+    assert response.data['lessons_count'] == 2
+    assert response.data['is_subscribed'] is True
@@ -0,0 +1,119 @@
+import pytest
+from celery import current_app
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from django.contrib.auth.models import Group
+from lms.models import Course, QuizModel, QuizDocument, Question, Answer
+from lms.roles import get_user_roles
+
+
+@pytest.fixture
+def teacher():
+    user = User.objects.create_user(email='teacher@example.com', password='password')
+    user.groups.add(Group.objects.get_or_create(name='Преподаватель')[0])
+    return user
+
+
+@pytest.fixture
+def quiz(teacher):
+    course = Course.objects.create(title='Курс', description='Описание', owner=teacher)
+    quiz = QuizModel.objects.create(course=course, owner=teacher, title='Тест')
+    add_questions(quiz, 2)
+    return quiz
+
+
+def add_questions(quiz, count):
+    for i in range(count):
+        question = Question.objects.create(text=f'Вопрос {i}', question_type='multiple_choice', test=quiz,
+                                           owner=quiz.owner)
+        Answer.objects.bulk_create([
+            Answer(text='Верно', is_correct=True, question=question, owner=quiz.owner),
+            Answer(text='Неверно', question=question, owner=quiz.owner),
+        ])
+
+
+@pytest.mark.django_db
+def test_quiz_detail_queries_do_not_grow_with_questions(teacher, quiz):
+    client = APIClient()
+    client.force_authenticate(user=teacher)
+    get_user_roles(teacher)
+    url = reverse('lms:test-detail', args=[quiz.pk])
+
+    with CaptureQueriesContext(connection) as few:
+        response = client.get(url)
+    assert len(response.data['questions']) == 2
+    add_questions(quiz, 5)
+    with CaptureQueriesContext(connection) as many:
+        response = client.get(url)
+    assert len(response.data['questions']) == 7
+    assert len(many) == len(few)
+
+
+@pytest.mark.django_db
+def test_answer_create_saves_once(teacher, quiz):
+    client = APIClient()
+    client.force_authenticate(user=teacher)
+    question = quiz.questions.first()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.post(reverse('lms:answer-list'), {'text': 'Еще вариант', 'question': question.pk})
+    assert response.status_code == 201
+    writes = [q['sql'] for q in queries.captured_queries
+              if q['sql'].startswith(('INSERT INTO "lms_answer"', 'UPDATE "lms_answer"'))]
+    assert len(writes) == 1
+
+
+@pytest.fixture
+def eager_celery():
+    current_app.conf.task_always_eager = True
+    yield
+    current_app.conf.task_always_eager = False
+
+
+@pytest.mark.django_db
+def test_approved_quiz_document_is_prerendered(quiz, eager_celery, django_capture_on_commit_callbacks):
+    student = User.objects.create_user(email='student@example.com', password='password')
+    client = APIClient()
+    client.force_authenticate(user=student)
+    url = reverse('lms:test-document', args=[quiz.pk])
+    assert client.get(url).status_code == 404  # Неутвержденный тест студентам недоступен
+
+    with django_capture_on_commit_callbacks(execute=True):
+        quiz.status = 'approved'
+        quiz.save()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert len(queries) == 1
+    answers = response.data['questions'][0]['answers']
+    assert answers == [{'id': answers[0]['id'], 'text': 'Верно'}, {'id': answers[1]['id'], 'text': 'Неверно'}]
+
+    # Изменение варианта ответа пересобирает документ
+    with django_capture_on_commit_callbacks(execute=True):
+        answer = Answer.objects.get(pk=answers[1]['id'])
+        answer.text = 'Совсем неверно'
+        answer.save()
+    assert client.get(url).data['questions'][0]['answers'][1]['text'] == 'Совсем неверно'
+
+
+@pytest.mark.django_db
+def test_unpublished_quiz_document_is_removed_on_commit(quiz, eager_celery, django_capture_on_commit_callbacks):
+    student = User.objects.create_user(email='student@example.com', password='password')
+    client = APIClient()
+    client.force_authenticate(user=student)
+    url = reverse('lms:test-document', args=[quiz.pk])
+    with django_capture_on_commit_callbacks(execute=True):
+        quiz.status = 'approved'
+        quiz.save()
+    assert client.get(url).status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        quiz.status = 'pending'
+        quiz.save()
+    assert not QuizDocument.objects.filter(quiz=quiz).exists()
+    assert client.get(url).status_code == 404
+
+    # Документ, записанный запоздавшей пересборкой, студентам тоже не отдается
+    QuizDocument.objects.create(quiz=quiz, content={'title': quiz.title})
+    assert client.get(url).status_code == 404
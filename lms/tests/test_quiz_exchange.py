@@ -0,0 +1,144 @@
+import io
+import json
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from django.contrib.auth.models import Group
+from lms.answer_keys import get_answer_key
+from lms.models import Course, QuizModel, Question, Answer
+from lms.quiz_exchange import FORMAT_NAME, FORMAT_VERSION, QuizFormatError, import_quizzes, read_ndjson
+
+
+@pytest.fixture
+def teacher():
+    user = User.objects.create_user(email='teacher@example.com', password='password')
+    user.groups.add(Group.objects.get_or_create(name='Преподаватель')[0])
+    return user
+
+
+@pytest.fixture
+def course(teacher):
+    return Course.objects.create(title='Курс', description='Описание', owner=teacher)
+
+
+@pytest.fixture
+def quiz(course, teacher):
+    quiz = QuizModel.objects.create(course=course, owner=teacher, title='Тест', description='Описание теста')
+    choice = Question.objects.create(text='2 + 2?', question_type='multiple_choice', test=quiz, owner=teacher)
+    Answer.objects.create(text='4', is_correct=True, question=choice, owner=teacher)
+    Answer.objects.create(text='5', question=choice, owner=teacher)
+    Question.objects.create(text='Столица Франции?', question_type='text', correct_answer='Париж', test=quiz,
+                            owner=teacher)
+    return quiz
+
+
+def document(questions_count):
+    return {
+        'format': FORMAT_NAME, 'version': FORMAT_VERSION, 'title': 'Банк вопросов', 'description': None,
+        'questions': [
+            {'text': f'Вопрос {i}', 'question_type': 'multiple_choice',
+             'answers': [{'text': 'Да', 'is_correct': True}, {'text': 'Нет', 'is_correct': False}]}
+            for i in range(questions_count)
+        ],
+    }
+
+
+def streamed(response):
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_export_json_round_trip(teacher, course, quiz):
+    client = APIClient()
+    client.force_authenticate(user=teacher)
+    response = client.get(reverse('lms:test-export', args=[quiz.pk]))
+    assert response.status_code == 200
+    data = json.loads(streamed(response))
+    assert data['format'] == FORMAT_NAME and data['title'] == 'Тест'
+    assert [question['text'] for question in data['questions']] == ['2 + 2?', 'Столица Франции?']
+    assert data['questions'][0]['answers'][0] == {'text': '4', 'is_correct': True, 'correct_answer': None}
+
+    data['course_id'] = course.pk
+    response = client.post(reverse('lms:test-import-quizzes'), data, format='json')
+    assert response.status_code == 201
+    [imported] = response.data['tests']
+    assert (imported['questions'], imported['answers']) == (2, 2)
+    copy = QuizModel.objects.get(pk=imported['id'])
+    assert copy.status == 'pending'
+    key = get_answer_key(copy.pk)
+    assert sorted(entry['type'] for entry in key.values()) == ['multiple_choice', 'text']
+
+
+@pytest.mark.django_db
+def test_import_ndjson_file_and_export_ndjson(teacher, course, quiz):
+    client = APIClient()
+    client.force_authenticate(user=teacher)
+    content = streamed(client.get(reverse('lms:test-export', args=[quiz.pk]), {'as': 'ndjson'}))
+    lines = content.splitlines()
+    assert len(lines) == 3 and json.loads(lines[0])['type'] == 'quiz'
+
+    upload = SimpleUploadedFile('bank.ndjson', (content * 2).encode(), content_type='application/x-ndjson')
+    response = client.post(reverse('lms:test-import-quizzes'), {'course_id': course.pk, 'file': upload})
+    assert response.status_code == 201
+    assert [test['questions'] for test in response.data['tests']] == [2, 2]
+
+
+@pytest.mark.django_db
+def test_import_queries_do_not_grow_with_questions(teacher, course):
+    def imported(questions_count):
+        with CaptureQueriesContext(connection) as queries:
+            import_quizzes(read_ndjson_document(document(questions_count)), course, teacher, batch_size=100)
+        return len(queries)
+
+    assert imported(3) == imported(90)
+    assert Question.objects.count() == 93
+    assert Answer.objects.count() == 186
+
+
+def read_ndjson_document(data):
+    header = {key: value for key, value in data.items() if key != 'questions'} | {'type': 'quiz'}
+    lines = [header] + [question | {'type': 'question'} for question in data['questions']]
+    return read_ndjson(io.BytesIO('\n'.join(json.dumps(line) for line in lines).encode()))
+
+
+@pytest.mark.django_db
+def test_invalid_import_is_rolled_back(teacher, course):
+    client = APIClient()
+    client.force_authenticate(user=teacher)
+    data = document(3)
+    data['questions'][2]['question_type'] = 'essay'
+    response = client.post(reverse('lms:test-import-quizzes'), data | {'course_id': course.pk}, format='json')
+    assert response.status_code == 400
+    assert 'Запись 4' in response.data['file'][0]
+    assert not QuizModel.objects.exists() and not Question.objects.exists()
+
+    with pytest.raises(QuizFormatError):
+        import_quizzes(read_ndjson_document(document(1) | {'version': FORMAT_VERSION + 1}), course, teacher)
+
+
+@pytest.mark.django_db
+def test_import_into_foreign_course_is_forbidden(course):
+    other = User.objects.create_user(email='other@example.com', password='password')
+    other.groups.add(Group.objects.get_or_create(name='Преподаватель')[0])
+    client = APIClient()
+    client.force_authenticate(user=other)
+    response = client.post(reverse('lms:test-import-quizzes'), document(1) | {'course_id': course.pk}, format='json')
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_quiz_bank_commands(tmp_path, teacher, course, quiz):
+    target = Course.objects.create(title='Копия', description='Описание', owner=teacher)
+    path = tmp_path / 'bank.ndjson'
+    call_command('export_quiz_bank', course=course.pk, output=str(path), stderr=io.StringIO())
+    call_command('import_quiz_bank', str(path), course=target.pk, stdout=io.StringIO())
+    copy = QuizModel.objects.get(course=target)
+    assert list(copy.questions.order_by('id').values_list('text', 'correct_answer')) == [
+        ('2 + 2?', None), ('Столица Франции?', 'Париж')]
+    assert Answer.objects.filter(question__test=copy, is_correct=True).count() == 1
@@ -0,0 +1,79 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.models import Course, Lesson
+from django.contrib.auth.models import Group
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def teacher_user():
+    user = User.objects.create_user(email='teacher@example.com', password='passwordteacher')
+    group, _ = Group.objects.get_or_create(name='Преподаватель')
+    user.groups.add(group)
+    return user
+
+
+@pytest.fixture
+def courses(teacher_user):
+    other = User.objects.create_user(email='other@example.com', password='password')
+    return [
+        Course.objects.create(title='Основы программирования', description='Переменные и циклы', owner=teacher_user),
+        Course.objects.create(title='Python for beginners', description='Learn programming', owner=teacher_user),
+        Course.objects.create(title='Рисование', description='Акварель', owner=teacher_user),
+        Course.objects.create(title='Python advanced', description='Чужой курс', owner=other),
+    ]
+
+
+def _titles(response):
+    return [item['title'] for item in response.data['results']]
+
+
+@pytest.mark.django_db
+def test_course_search_russian_and_english(api_client, teacher_user, courses):
+    api_client.force_authenticate(user=teacher_user)
+    response = api_client.get(reverse('lms:course-list'), {'search': 'программированию'})
+    assert _titles(response) == ['Основы программирования']
+
+    response = api_client.get(reverse('lms:course-list'), {'search': 'programs'})
+    assert _titles(response) == ['Python for beginners']
+
+
+@pytest.mark.django_db
+def test_course_search_tolerates_typos_and_respects_roles(api_client, teacher_user, courses):
+    api_client.force_authenticate(user=teacher_user)
+    response = api_client.get(reverse('lms:course-list'), {'search': 'pythn'})
+    # Чужой курс «Python advanced» преподавателю не виден
+    assert _titles(response) == ['Python for beginners']
+
+
+@pytest.mark.django_db
+def test_lesson_search(api_client, teacher_user, courses):
+    for title in ('Циклы в Python', 'Акварельные техники'):
+        Lesson.objects.create(title=title, description='Описание', video_url='https://youtu.be/abc123',
+                              course=courses[0], owner=teacher_user)
+    api_client.force_authenticate(user=teacher_user)
+    response = api_client.get(reverse('lms:lesson-list-create'), {'search': 'цикл'})
+    assert _titles(response) == ['Циклы в Python']
+
+
+@pytest.mark.django_db
+def test_search_results_paginate_by_cursor(api_client, teacher_user):
+    for i in range(5):
+        Course.objects.create(title=f'Python {"курс " * i}{i}', description='Программирование', owner=teacher_user)
+    api_client.force_authenticate(user=teacher_user)
+    response = api_client.get(reverse('lms:course-list'), {'search': 'python', 'pagination': 'cursor',
+                                                           'page_size': 2})
+    titles = _titles(response)
+    # Курсор хранит позицию по search_rank — аннотации, а не полю модели
+    while response.data['next']:
+        response = api_client.get(response.data['next'])
+        assert response.status_code == 200
+        titles += _titles(response)
+    assert sorted(titles) == sorted(Course.objects.values_list('title', flat=True))
+    assert len(titles) == 5
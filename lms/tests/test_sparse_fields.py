@@ -0,0 +1,81 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from lms.models import Course, Lesson, QuizModel, Question, Answer
+from django.contrib.auth.models import Group
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def teacher_user():
+    user = User.objects.create_user(email='teacher@example.com', password='passwordteacher')
+    group, _ = Group.objects.get_or_create(name='Преподаватель')
+    user.groups.add(group)
+    return user
+
+
+@pytest.fixture
+def course(teacher_user):
+    course = Course.objects.create(title='Test Course', description='Description', owner=teacher_user)
+    Lesson.objects.create(title='Test Lesson', description='Lesson Description',
+                          video_url='https://www.youtube.com/watch?v=abc123', course=course, owner=teacher_user)
+    return course
+
+
+def _lesson_queries(context):
+    return [query['sql'] for query in context.captured_queries if 'FROM "lms_lesson"' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_course_list_is_lean_by_default(api_client, teacher_user, course):
+    api_client.force_authenticate(user=teacher_user)
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get(reverse('lms:course-list'))
+
+    item = response.data['results'][0]
+    assert 'lessons' not in item
+    assert item['lessons_count'] == 1
+    assert _lesson_queries(context) == []
+
+
+@pytest.mark.django_db
+def test_course_list_expand_and_fields(api_client, teacher_user, course):
+    api_client.force_authenticate(user=teacher_user)
+    response = api_client.get(reverse('lms:course-list'), {'expand': 'lessons'})
+    assert response.data['results'][0]['lessons'][0]['title'] == 'Test Lesson'
+
+    with CaptureQueriesContext(connection) as context:
+        response = api_client.get(reverse('lms:course-list'), {'fields': 'id,title'})
+    assert set(response.data['results'][0]) == {'id', 'title'}
+    assert not any('lms_subscription' in query['sql'] for query in context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_detail_expands_by_default(api_client, teacher_user, course):
+    api_client.force_authenticate(user=teacher_user)
+    response = api_client.get(reverse('lms:course-detail', args=[course.id]))
+    assert len(response.data['lessons']) == 1
+
+    response = api_client.get(reverse('lms:course-detail', args=[course.id]), {'fields': 'id,lessons_count'})
+    assert response.data == {'id': course.id, 'lessons_count': 1}
+
+
+@pytest.mark.django_db
+def test_quiz_list_expand_questions(api_client, teacher_user, course):
+    quiz = QuizModel.objects.create(course=course, owner=teacher_user, title='Quiz')
+    question = Question.objects.create(text='2 + 2?', question_type='multiple_choice', test=quiz, owner=teacher_user)
+    Answer.objects.create(text='4', is_correct=True, question=question, owner=teacher_user)
+    api_client.force_authenticate(user=teacher_user)
+
+    response = api_client.get(reverse('lms:test-list'))
+    assert 'questions' not in response.data['results'][0]
+
+    response = api_client.get(reverse('lms:test-list'), {'expand': 'questions'})
+    assert response.data['results'][0]['questions'][0]['answers'][0]['text'] == '4'
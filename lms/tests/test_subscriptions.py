@@ -1,4 +1,5 @@
 import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from rest_framework.test import APIClient
 from users.models import User
@@ -29,3 +30,55 @@ def test_subscribe_and_unsubscribe(api_client, user, course):
     response = api_client.post(reverse('lms:course-subscription'), {'course_id': course.id})
     assert response.status_code == 200
     assert not Subscription.objects.filter(user=user, course=course).exists()
+
+
+@pytest.mark.django_db
+def test_subscribe_to_missing_course(api_client, user):
+    api_client.force_authenticate(user=user)
+    response = api_client.post(reverse('lms:course-subscription'), {'course_id': 999999})
+    assert response.status_code == 404
+
+
+@pytest.fixture
+def students():
+    return [User.objects.create_user(email=f'student{i}@example.com', password='password') for i in range(3)]
+
+
+@pytest.mark.django_db
+def test_teacher_bulk_enrolls_users(api_client, user, course, students):
+    Subscription.objects.create(user=students[0], course=course)
+    other_course = Course.objects.create(title='Чужой курс', description='Описание', owner=students[1])
+    api_client.force_authenticate(user=user)
+
+    response = api_client.post(reverse('lms:course-subscription-bulk'), {
+        'action': 'enroll', 'course_id': course.id, 'user_ids': [s.id for s in students] + [999999],
+    }, format='json')
+    assert response.status_code == 200
+    assert [row['status'] for row in response.data['results']] == [
+        'already_enrolled', 'enrolled', 'enrolled', 'not_found',
+    ]
+    assert Subscription.objects.filter(course=course).count() == 3
+
+    response = api_client.post(reverse('lms:course-subscription-bulk'), {
+        'course_id': other_course.id, 'user_ids': [students[2].id],
+    }, format='json')
+    assert response.data['results'][0]['status'] == 'forbidden'
+
+
+@pytest.mark.django_db
+def test_bulk_unenroll_from_csv(api_client, user, course, students):
+    for student in students:
+        Subscription.objects.create(user=student, course=course)
+    csv_file = SimpleUploadedFile('users.csv', (
+        'user_id,course_id\n'
+        f'{students[0].id},{course.id}\n'
+        f'{students[1].id},{course.id}\n'
+        'abc,def\n'
+    ).encode())
+    api_client.force_authenticate(user=user)
+
+    response = api_client.post(reverse('lms:course-subscription-bulk'),
+                               {'action': 'unenroll', 'file': csv_file}, format='multipart')
+    assert response.status_code == 200
+    assert response.data['summary'] == {'unenrolled': 2, 'invalid': 1}
+    assert list(Subscription.objects.filter(course=course).values_list('user_id', flat=True)) == [students[2].id]
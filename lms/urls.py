@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     CourseViewSet, CourseUpdateAPIView,
     LessonListCreateView, LessonDetailView,
-    PaymentViewSet, CourseSubscriptionAPIView
+    PaymentViewSet, CourseSubscriptionAPIView, BulkSubscriptionAPIView
 )
 from .views import TestViewSet, QuestionViewSet, AnswerViewSet
 
@@ -40,5 +40,6 @@ urlpatterns = [
 
     # Подписка
     path('subscribe/', CourseSubscriptionAPIView.as_view(), name='course-subscription'),
+    path('subscribe/bulk/', BulkSubscriptionAPIView.as_view(), name='course-subscription-bulk'),
 
 ]
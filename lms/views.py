@@ -1,12 +1,13 @@
 from rest_framework import viewsets, generics
-from .models import Course, Lesson, Subscription
+from rest_framework.decorators import action
+from .models import Course, Lesson
 from .serializers import CourseSerializer, LessonSerializer, PaymentSerializer
 
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
-from users.models import Payment
-from .filters import PaymentFilter
+from users.models import Payment, User
+from .filters import CatalogSearchFilter, PaymentFilter
 
 from .permissions import IsTeacher, IsStudent, IsModerator, IsOwnerAndUnapproved, IsOwnerOrReadOnly
 from rest_framework.permissions import IsAuthenticated
@@ -14,48 +15,128 @@ from rest_framework.permissions import IsAuthenticated
 # Импорты для подписки
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from django.http import Http404
+from rest_framework import status
+from collections import Counter
+from .subscriptions import bulk_subscriptions, read_csv_rows, toggle_subscription, ENROLL, UNENROLL
 
 # Импорты для пагинации
-from .paginators import CustomPageNumberPagination
+from .paginators import CustomPageNumberPagination, KeysetPagination
 
-from .tasks import send_course_update_email  # Импортируем задачу
+from .notifications import queue_course_update
 
 # УЧЕБНЫЕ ТЕСТЫ
 from .models import QuizModel, Question, Answer
-from .serializers import TestSerializer, QuestionSerializer, AnswerSerializer
+from .quiz_documents import get_quiz_document, published_documents
+from .serializers import TestSerializer, QuestionSerializer, AnswerSerializer, TestSubmissionSerializer
+from .answer_keys import get_answer_key
+from .grading import submit_attempt
+from .item_analysis import item_analysis_report
+from .leaderboards import COURSE_LEADERBOARD_KEY, QUIZ_LEADERBOARD_KEY, get_leaderboard_page
 from .permissions import IsOwnerOrUnapproved
 from django.core.exceptions import PermissionDenied
 
+# Импорт и экспорт тестов
+import json
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from .quiz_exchange import QuizFormatError, import_quizzes, iter_json, iter_ndjson, read_json, read_ndjson
+
+# Роли пользователей
+from .roles import get_user_roles, has_role, ADMIN, MODERATOR, STUDENT, TEACHER
+
+# Кеш каталога курсов
+from django.db.models import Count, Max, Prefetch, Value
+from .catalog import get_catalog_page, overlay_subscriptions
+
+# Условные GET-запросы (ETag / Last-Modified)
+from .conditional import ConditionalRetrieveMixin
+
 # --- Вьюхи для Курсов ---
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all().order_by('id')
     serializer_class = CourseSerializer
     pagination_class = CustomPageNumberPagination
+    keyset_ordering = ('id',)  # Порядок для ?pagination=cursor
+    filter_backends = [DjangoFilterBackend, CatalogSearchFilter, OrderingFilter]
+    # ?ordering=-subscribers_count — самые популярные курсы, по счетчику без агрегации
+    ordering_fields = ['id', 'subscribers_count', 'lessons_count']
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
     def get_queryset(self):
         user = self.request.user
+        roles = get_user_roles(user)
         if user.is_superuser:
             queryset = Course.objects.all()
-        elif user.groups.filter(name='Модераторы').exists():
+        elif MODERATOR in roles:
             queryset = Course.objects.all()
-        elif user.groups.filter(name='Преподаватель').exists():
+        elif TEACHER in roles:
             queryset = Course.objects.filter(owner=user)
-        elif user.groups.filter(name='Студент').exists():
+        elif STUDENT in roles:
             queryset = Course.objects.filter(status='approved')
         else:
             queryset = Course.objects.none()
 
-        # Отладочный вывод для студента
-        if user.groups.filter(name='Студент').exists():
-            print(f"Student view: Total approved courses accessible: {queryset.count()}")
+        # Количество уроков, подписка и уроки считаются для всей страницы сразу
+        # и только если эти поля запрошены (?fields= / ?expand=)
+        fields = self.get_requested_fields()
+        if 'is_subscribed' in fields:
+            queryset = queryset.with_subscription(user)
+        if 'lessons' in fields:
+            queryset = queryset.with_lessons()
         return queryset.order_by('id')
 
+    def get_requested_fields(self):
+        return self.get_serializer_class().requested_fields(self.request, many=self.action == 'list')
+
+    def list(self, request, *args, **kwargs):
+        # Студенты видят один и тот же каталог: отдаем его из кеша,
+        # а подписку пользователя накладываем отдельно
+        if self._is_catalog_request():
+            data = get_catalog_page(request, self._build_catalog_page)
+            return Response(overlay_subscriptions(data, request.user))
+        return super().list(request, *args, **kwargs)
+
+    def get_tree_state(self, instance):
+        # Уроки уже загружены через Prefetch в get_queryset
+        lessons = instance.lessons.all()
+        return [
+            (instance.updated_at, 1),
+            (max((lesson.updated_at for lesson in lessons), default=None), len(lessons)),
+        ]
+
+    def get_etag_extra(self, instance):
+        # Счетчики меняются без updated_at, поэтому тоже входят в ETag
+        return f"{getattr(instance, 'is_subscribed', '')}:{instance.subscribers_count}:{instance.lessons_count}"
+
+    def _is_catalog_request(self):
+        user = self.request.user
+        roles = get_user_roles(user)
+        return not user.is_superuser and STUDENT in roles and not roles & {MODERATOR, TEACHER}
+
+    def _build_catalog_page(self):
+        fields = self.get_requested_fields()
+        queryset = Course.objects.filter(status='approved')
+        if 'lessons' in fields:
+            queryset = queryset.with_lessons()
+        # is_subscribed заполняется в overlay_subscriptions
+        queryset = queryset.annotate(is_subscribed=Value(False)).order_by('id')
+        page = self.paginate_queryset(self.filter_queryset(queryset))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data).data
+
+    @action(detail=True, methods=['get'])
+    def leaderboard(self, request, pk=None):
+        """
+        Рейтинг студентов курса по сумме лучших баллов за его тесты.
+        """
+        course = self.get_object()
+        return _leaderboard_response(request, COURSE_LEADERBOARD_KEY.format(course_id=course.pk), course.owner_id)
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
@@ -83,13 +164,9 @@ class CourseUpdateAPIView(generics.UpdateAPIView):
     def perform_update(self, serializer):
         course = serializer.save()
 
-        # Получаем всех подписчиков на данный курс
-        subscribers = Subscription.objects.filter(course=course)
-        subscriber_emails = [subscription.user.email for subscription in subscribers]
-
-        if subscriber_emails:
-            # Запускаем асинхронную задачу по отправке писем
-            send_course_update_email.delay(course.title, subscriber_emails)
+        # Уведомление откладывается: частые сохранения курса уходят подписчикам
+        # одним дайджестом (см. flush_course_updates)
+        queue_course_update(course.pk)
 
 # ---Вьюхи для подписки---
 
@@ -101,25 +178,89 @@ class CourseSubscriptionAPIView(APIView):
         user = request.user
         # Получаем id курса из данных запроса
         course_id = request.data.get('course_id')
-        # Получаем объект курса, если не найден - вернется ошибка 404
-        course = get_object_or_404(Course, id=course_id)
 
-        # Проверяем, есть ли уже подписка на этот курс
-        subscription = Subscription.objects.filter(user=user, course=course)
-
-        if subscription.exists():
-            # Если подписка существует, удаляем ее
-            subscription.delete()
-            message = "Подписка удалена"
-        else:
-            # Если подписки нет, создаем ее
-            Subscription.objects.create(user=user, course=course)
-            message = "Подписка добавлена"
+        # Подписка или отписка одним атомарным запросом; несуществующий курс - ошибка 404
+        subscribed = toggle_subscription(user.pk, _to_int(course_id))
+        if subscribed is None:
+            raise Http404
+        message = "Подписка добавлена" if subscribed else "Подписка удалена"
 
         # Возвращаем ответ с сообщением
         return Response({"message": message})
 
 
+class BulkSubscriptionAPIView(APIView):
+    """
+    Массовая подписка и отписка.
+
+    - {"action": "enroll", "course_ids": [...]} — текущий пользователь на несколько курсов;
+    - {"action": "enroll", "course_id": 1, "user_ids": [...]} — преподаватель записывает
+      пользователей на свой курс;
+    - multipart с файлом `file` (CSV: user_id,course_id или только user_id + поле course_id).
+
+    action: enroll (по умолчанию) или unenroll. Ответ содержит итог и статус каждой строки.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        action = request.data.get('action', ENROLL)
+        if action not in (ENROLL, UNENROLL):
+            return Response({'action': ['Допустимые значения: enroll, unenroll.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = request.FILES.get('file')
+        course_id = request.data.get('course_id')
+        if upload is not None:
+            pairs = read_csv_rows(upload, course_id=course_id)
+        elif 'user_ids' in request.data:
+            pairs = ((_to_int(user_id), _to_int(course_id)) for user_id in _get_list(request.data, 'user_ids'))
+        elif 'course_ids' in request.data:
+            pairs = ((request.user.pk, _to_int(item)) for item in _get_list(request.data, 'course_ids'))
+        else:
+            return Response({'detail': 'Передайте file, user_ids или course_ids.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = list(bulk_subscriptions(request.user, action, pairs))
+        return Response({
+            'summary': Counter(result['status'] for result in results),
+            'results': results,
+        })
+
+
+def _get_list(data, key):
+    # JSON приходит словарем, form-data и multipart - QueryDict
+    if hasattr(data, 'getlist'):
+        return data.getlist(key)
+    return data.get(key) or []
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Максимальный размер страницы рейтинга
+LEADERBOARD_MAX_LIMIT = 100
+
+
+def _leaderboard_response(request, key, owner_id):
+    """
+    Страница рейтинга по ?offset=&limit= и место текущего пользователя.
+    Студентам видны только id, места и баллы; email подгружаются одним
+    запросом для владельца курса или теста и модераторов.
+    """
+    offset = max(_to_int(request.query_params.get('offset')) or 0, 0)
+    limit = min(max(_to_int(request.query_params.get('limit')) or 10, 1), LEADERBOARD_MAX_LIMIT)
+    page = get_leaderboard_page(key, request.user.pk, offset, limit)
+    user = request.user
+    if not (user.is_superuser or user.pk == owner_id or has_role(user, MODERATOR)):
+        return Response(page)
+    emails = dict(User.objects.filter(pk__in=[row['student'] for row in page['results']]).values_list('pk', 'email'))
+    for row in page['results']:
+        row['email'] = emails.get(row['student'])
+    return Response(page)
+
+
 # ---Вьюхи для Уроков---
 
 
@@ -127,15 +268,18 @@ class LessonListCreateView(generics.ListCreateAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     pagination_class = CustomPageNumberPagination
+    keyset_ordering = ('id',)  # Порядок для ?pagination=cursor
+    filter_backends = [DjangoFilterBackend, CatalogSearchFilter]
 
     def get_queryset(self):
         user = self.request.user
-        if user.groups.filter(name='Модераторы').exists():
+        roles = get_user_roles(user)
+        if MODERATOR in roles:
             return Lesson.objects.all()
-        elif user.groups.filter(name='Преподаватель').exists():
+        elif TEACHER in roles:
             return Lesson.objects.filter(owner=user)
-        elif user.groups.filter(name='Студент').exists():
-            return Lesson.objects.filter(course__owner__groups__name='Администратор')  # Только админские курсы
+        elif STUDENT in roles:
+            return Lesson.objects.filter(is_public=True).order_by('id')  # Только админские курсы (lms.visibility)
         return Lesson.objects.none()
 
     def get_permissions(self):
@@ -149,7 +293,7 @@ class LessonListCreateView(generics.ListCreateAPIView):
         serializer.save(owner=self.request.user)
 
 
-class LessonDetailView(generics.RetrieveUpdateDestroyAPIView):
+class LessonDetailView(ConditionalRetrieveMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
 
@@ -175,27 +319,141 @@ class PaymentViewSet(viewsets.ModelViewSet):
     filterset_class = PaymentFilter
     ordering_fields = ['payment_date']  # Позволяем сортировать по дате оплаты
     ordering = ['-payment_date']  # По умолчанию сортировка по дате оплаты (от новых к старым)
+    # Платежей много: страницы выбираются по ключу (payment_date, id), без OFFSET
+    pagination_class = KeysetPagination
 
 
 # --- Вьюхи для УЧ ТЕСТОВ ---
 
-class TestViewSet(viewsets.ModelViewSet):
+class TestViewSet(ConditionalRetrieveMixin, viewsets.ModelViewSet):
     queryset = QuizModel.objects.all()
     serializer_class = TestSerializer
     permission_classes = [IsAuthenticated, IsTeacher]
 
-    def get_queryset(self):
+    def _get_base_queryset(self):
         user = self.request.user
-        if user.groups.filter(name__in=['Администратор', 'Преподаватель']).exists():
+        if has_role(user, ADMIN, TEACHER):
             return QuizModel.objects.all()  # Все тесты для админов и преподавателей
         return QuizModel.objects.filter(status="approved")  # Только утвержденные тесты для остальных
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-    def retrieve(self, request, *args, **kwargs):
-        print(f"Retrieving Test with ID: {kwargs['pk']} for user {request.user}")
-        return super().retrieve(request, *args, **kwargs)
+    def get_queryset(self):
+        queryset = self._get_base_queryset()
+        # Вопросы и ответы загружаются только если они будут в ответе
+        many = self.action == 'list'
+        if self.action in ('list', 'retrieve') and 'questions' in self.get_serializer_class().requested_fields(
+                self.request, many=many):
+            queryset = queryset.with_questions()
+        return queryset
+
+    def get_tree_state(self, instance):
+        questions = Question.objects.filter(test=instance).aggregate(updated=Max('updated_at'), count=Count('id'))
+        answers = Answer.objects.filter(question__test=instance).aggregate(updated=Max('updated_at'), count=Count('id'))
+        return [
+            (instance.updated_at, 1),
+            (questions['updated'], questions['count']),
+            (answers['updated'], answers['count']),
+        ]
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def leaderboard(self, request, pk=None):
+        """
+        Рейтинг студентов теста по лучшему баллу.
+        """
+        quiz = self.get_object()
+        return _leaderboard_response(request, QUIZ_LEADERBOARD_KEY.format(quiz_id=quiz.pk), quiz.owner_id)
+
+    @action(detail=True, methods=['get'], url_path='item-analysis')
+    def item_analysis(self, request, pk=None):
+        """
+        Анализ заданий теста для его автора: сложность вопросов,
+        дискриминация и частота выбора вариантов ответа.
+        """
+        quiz = self.get_object()
+        return Response({'test': quiz.pk, 'questions': item_analysis_report(quiz.pk)})
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def document(self, request, pk=None):
+        """
+        Документ утвержденного теста для студентов (без правильных ответов),
+        отрендеренный заранее: на чтение — один запрос по первичному ключу.
+        """
+        content = published_documents().filter(quiz_id=_to_int(pk)).values_list('content', flat=True).first()
+        if content is None:
+            quiz = self.get_object()
+            if quiz.status != 'approved':
+                raise Http404
+            content = get_quiz_document(quiz.pk)
+        return Response(content)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def submit(self, request, pk=None):
+        """
+        Прием попытки целиком: проверка по ключу ответов в памяти, результат
+        и все ответы студента — в одной транзакции за постоянное число запросов.
+        """
+        quiz = self.get_object()
+        key = get_answer_key(quiz.pk)
+        serializer = TestSubmissionSerializer(data=request.data, context={'answer_key': key})
+        serializer.is_valid(raise_exception=True)
+
+        result = submit_attempt(quiz, request.user, serializer.validated_data['answers'], key)
+        return Response({
+            'id': result.pk,
+            'test': quiz.pk,
+            'score': result.score,
+            'correct_count': result.correct_count,
+            'questions_count': len(key),
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        """
+        Выгрузка теста автора в формате обмена: ?as=json (по умолчанию) или ?as=ndjson.
+        Ответ отдается потоком, вопросы читаются из базы порциями.
+        """
+        quiz = self.get_object()
+        if request.query_params.get('as') == 'ndjson':
+            content, content_type, extension = iter_ndjson([quiz]), 'application/x-ndjson', 'ndjson'
+        else:
+            content, content_type, extension = iter_json(quiz), 'application/json', 'json'
+        response = StreamingHttpResponse(content, content_type=f'{content_type}; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="quiz-{quiz.pk}.{extension}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_quizzes(self, request):
+        """
+        Загрузка тестов в свой курс (поле course_id): JSON-документ в теле запроса
+        или файл `file` (.json или .ndjson). Все тесты файла создаются в одной
+        транзакции и ожидают утверждения.
+        """
+        course_id = request.data.get('course_id') or request.query_params.get('course_id')
+        course = Course.objects.filter(pk=_to_int(course_id)).first()
+        if course is None:
+            raise ValidationError({'course_id': ['Курс не найден.']})
+        if course.owner_id != request.user.pk and not request.user.is_superuser:
+            raise PermissionDenied
+
+        upload = request.FILES.get('file')
+        try:
+            if upload is None:
+                records = read_json(request.data)
+            elif upload.name.endswith(('.ndjson', '.jsonl')):
+                records = read_ndjson(upload)
+            else:
+                records = read_json(json.load(upload))
+            with transaction.atomic():
+                imported = import_quizzes(records, course, request.user)
+        except (QuizFormatError, UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise ValidationError({'file': [str(exc)]})
+
+        return Response({'tests': [
+            {'id': quiz.pk, 'title': quiz.title, 'questions': questions, 'answers': answers}
+            for quiz, questions, answers in imported
+        ]}, status=status.HTTP_201_CREATED)
 
 
 
@@ -204,12 +462,18 @@ class QuestionViewSet(viewsets.ModelViewSet):
     serializer_class = QuestionSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrUnapproved]
 
+    def get_queryset(self):
+        queryset = Question.objects.order_by('id')
+        if 'answers' in self.get_serializer_class().requested_fields(self.request, many=self.action == 'list'):
+            queryset = queryset.prefetch_related(Prefetch('answers', queryset=Answer.objects.order_by('id')))
+        return queryset
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)  # Устанавливаем владельца как текущего пользователя
 
 
 class AnswerViewSet(viewsets.ModelViewSet):
-    queryset = Answer.objects.all()
+    queryset = Answer.objects.select_related('question')  # question.test_id нужен для ключа ответов
     serializer_class = AnswerSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
 
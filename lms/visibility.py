@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef, Subquery
+
+from .models import Course, Lesson
+from .roles import ADMIN
+
+User = get_user_model()
+
+
+def admin_membership(owner_ref):
+    """
+    Условие «владелец состоит в группе Администратор» для подзапроса.
+    """
+    return Exists(User.groups.through.objects.filter(user_id=owner_ref, group__name=ADMIN))
+
+
+def is_public_owner(owner_id):
+    return User.groups.through.objects.filter(user_id=owner_id, group__name=ADMIN).exists()
+
+
+def refresh_visibility(owner_ids=None):
+    """
+    Пересчитывает флаг is_public у курсов указанных владельцев и у их уроков
+    двумя UPDATE-запросами. Без owner_ids пересчитываются все курсы.
+    """
+    courses = Course.objects.all()
+    lessons = Lesson.objects.all()
+    if owner_ids is not None:
+        owner_ids = list(owner_ids)
+        if not owner_ids:
+            return
+        courses = courses.filter(owner_id__in=owner_ids)
+        lessons = lessons.filter(course__owner_id__in=owner_ids)
+
+    courses.update(is_public=admin_membership(OuterRef('owner_id')))
+    lessons.update(is_public=Subquery(Course.objects.filter(pk=OuterRef('course_id')).values('is_public')[:1]))
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Payment
+from .models import User, Payment, RevenueRollup, StripeEvent
 
 
 # users/admin.py
@@ -12,6 +12,23 @@ class UserAdmin(admin.ModelAdmin):
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
-    list_display = ('user', 'amount', 'payment_date', 'payment_method')
+    list_display = ('user', 'amount', 'payment_date', 'payment_method', 'status')
+    list_filter = ('payment_method', 'status')
+    search_fields = ('user__email', 'stripe_session_id')
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'type', 'received_at', 'processed_at')
+    list_filter = ('type',)
+    search_fields = ('id',)
+    readonly_fields = ('id', 'type', 'payload', 'received_at', 'processed_at')
+
+
+@admin.register(RevenueRollup)
+class RevenueRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'course', 'payment_method', 'amount', 'payments_count')
     list_filter = ('payment_method',)
-    search_fields = ('user__email',)
+    date_hierarchy = 'day'
+    list_select_related = ('course',)
+    readonly_fields = ('day', 'course', 'payment_method', 'amount', 'payments_count')
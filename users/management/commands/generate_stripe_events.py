@@ -0,0 +1,82 @@
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from users.models import Payment
+from users.webhooks import sign_payload, store_event
+
+
+class Command(BaseCommand):
+    help = ("Генерирует подписанные события Stripe для сессий оплаты (нагрузочное тестирование "
+            "вебхука без Stripe): отправляет их на --url или сразу кладет во входящую очередь")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help="число событий (без учета повторов)")
+        parser.add_argument('--paid-share', type=float, default=0.8,
+                            help="доля оплаченных сессий; остальные истекают")
+        parser.add_argument('--duplicates', type=float, default=0.1,
+                            help="доля событий, доставляемых повторно, как это делает Stripe")
+        parser.add_argument('--url', help="адрес вебхука, например http://localhost:8000/api/users/stripe/webhook/")
+        parser.add_argument('--concurrency', type=int, default=8, help="параллельных запросов при --url")
+
+    def handle(self, *args, **options):
+        count = options['count']
+        # Сначала — реальные открытые сессии, остальное — несуществующие (событие без платежа)
+        sessions = list(Payment.objects.filter(status='open').exclude(stripe_session_id=None)
+                        .values_list('stripe_session_id', flat=True)[:count])
+        sessions += [f'cs_test_{uuid.uuid4().hex}' for _ in range(count - len(sessions))]
+
+        payloads = [self.build_event(session_id, options['paid_share']) for session_id in sessions]
+        payloads += random.sample(payloads, int(len(payloads) * options['duplicates']))
+        random.shuffle(payloads)
+
+        started = time.monotonic()
+        if options['url']:
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                statuses = list(pool.map(lambda payload: self.post(options['url'], payload), payloads))
+            failed = sum(status != 200 for status in statuses)
+        else:
+            for payload in payloads:
+                store_event(payload.encode())
+            failed = 0
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Событий: {len(payloads)} за {elapsed:.2f} с ({len(payloads) / max(elapsed, 1e-9):.0f}/с), "
+            f"ошибок доставки: {failed}"
+        ))
+
+    @staticmethod
+    def build_event(session_id, paid_share):
+        paid = random.random() < paid_share
+        return json.dumps({
+            'id': f'evt_{uuid.uuid4().hex}',
+            'object': 'event',
+            'type': 'checkout.session.completed' if paid else 'checkout.session.expired',
+            'created': int(time.time()),
+            'data': {'object': {
+                'id': session_id,
+                'object': 'checkout.session',
+                'payment_status': 'paid' if paid else 'unpaid',
+            }},
+        })
+
+    @staticmethod
+    def post(url, payload):
+        request = urllib.request.Request(url, data=payload.encode(), method='POST', headers={
+            'Content-Type': 'application/json',
+            'Stripe-Signature': sign_payload(payload),
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+        except OSError:
+            return None
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from users.models import Payment
+from users.revenue import rebuild_revenue_rollups
+
+
+class Command(BaseCommand):
+    help = "Пересобирает сводку выручки по дням, курсам и способам оплаты из таблицы платежей"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat,
+                            help="первый день (YYYY-MM-DD); по умолчанию — день первого платежа")
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat,
+                            help="последний день (YYYY-MM-DD); по умолчанию — сегодня")
+
+    def handle(self, *args, **options):
+        date_to = options['date_to'] or timezone.localdate()
+        date_from = options['date_from'] or Payment.objects.aggregate(first=Min('payment_date'))['first'] or date_to
+        if date_from > date_to:
+            raise CommandError("Начало диапазона позже его конца.")
+        rows = rebuild_revenue_rollups(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f"Сводка за {date_from}..{date_to} пересобрана, строк: {rows}"))
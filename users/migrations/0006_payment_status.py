@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_stripe_checkouts_open(apps, schema_editor):
+    # Платежи со ссылкой Stripe создавались при открытии оплаты, а не по ее факту
+    Payment = apps.get_model('users', 'Payment')
+    Payment.objects.filter(stripe_session_id__isnull=False).update(status='open')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_payment_session_expires_at'),
+    ]
+
+    # Платежи, внесенные вручную (наличные, перевод), считаются оплаченными
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Создается ссылка на оплату'), ('open', 'Ожидает оплаты'), ('paid', 'Оплачен'), ('failed', 'Ошибка')], default='paid', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['updated_at'], name='payment_pending_idx'),
+        ),
+        migrations.RunPython(mark_stripe_checkouts_open, migrations.RunPython.noop),
+    ]
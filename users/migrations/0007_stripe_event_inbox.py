@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0015_course_stripe_ids'),
+        ('users', '0006_payment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('type', models.CharField(max_length=100)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Событие Stripe',
+                'verbose_name_plural': 'События Stripe',
+            },
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Создается ссылка на оплату'), ('open', 'Ожидает оплаты'), ('paid', 'Оплачен'), ('expired', 'Сессия истекла'), ('failed', 'Ошибка')], default='paid', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('stripe_session_id__isnull', False)), fields=['stripe_session_id'], name='payment_stripe_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stripeevent',
+            index=models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['received_at'], name='stripe_event_inbox_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_revenue_rollups(apps, schema_editor):
+    # Оплаченные платежи за всю историю; платеж за урок — в курс урока
+    Payment = apps.get_model('users', 'Payment')
+    RevenueRollup = apps.get_model('users', 'RevenueRollup')
+    rows = (
+        Payment.objects.filter(status='paid')
+        .values('payment_date', 'payment_method', course=Coalesce('paid_course', 'paid_lesson__course'))
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    RevenueRollup.objects.bulk_create((
+        RevenueRollup(day=row['payment_date'], course_id=row['course'], payment_method=row['payment_method'],
+                      amount=row['total'], payments_count=row['count'])
+        for row in rows.iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0015_course_stripe_ids'),
+        ('users', '0007_stripe_event_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('payment_method', models.CharField(choices=[('cash', 'Наличные'), ('transfer', 'Перевод на счет')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_count', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='lms.course')),
+            ],
+            options={
+                'verbose_name': 'Выручка за день',
+                'verbose_name_plural': 'Выручка по дням',
+                'indexes': [models.Index(fields=['course', 'day'], name='revenue_rollup_course_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'course', 'payment_method'), name='revenue_rollup_key', nulls_distinct=False)],
+            },
+        ),
+        migrations.RunPython(backfill_revenue_rollups, migrations.RunPython.noop),
+    ]
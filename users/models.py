@@ -49,6 +49,10 @@ class User(AbstractUser):
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        indexes = [
+            # Поиск неактивных пользователей в задаче block_inactive_users
+            models.Index(fields=['last_login'], condition=models.Q(is_active=True), name='user_active_last_login_idx'),
+        ]
 
 
 class Payment(models.Model):
@@ -62,22 +66,38 @@ class Payment(models.Model):
         paid_lesson (ForeignKey): Урок, за который произведена оплата, связь с моделью Lesson.
         amount (DecimalField): Сумма оплаты.
         payment_method (CharField): Способ оплаты (наличные или перевод на счёт).
+        status (CharField): Состояние оплаты через Stripe; платежи, внесенные вручную, — paid.
+        error (TextField): Причина последней ошибки создания сессии оплаты.
     """
     PAYMENT_METHOD_CHOICES = [
         ('cash', 'Наличные'),
         ('transfer', 'Перевод на счет')
     ]
+    # Оплата через Stripe: pending — сессия создается в фоне, open — ссылка на оплату готова
+    STATUS_CHOICES = [
+        ('pending', 'Создается ссылка на оплату'),
+        ('open', 'Ожидает оплаты'),
+        ('paid', 'Оплачен'),
+        ('expired', 'Сессия истекла'),
+        ('failed', 'Ошибка'),
+    ]
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             db_index=False)  # Покрывается индексом (user, payment_date)
     payment_date = models.DateField(auto_now_add=True)  # Автоматически устанавливаем текущую дату при создании
     paid_course = models.ForeignKey(Course, null=True, blank=True, on_delete=models.CASCADE)
     paid_lesson = models.ForeignKey(Lesson, null=True, blank=True, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_method = models.CharField(max_length=10, choices=PAYMENT_METHOD_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='paid')
+    error = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
 
     # Добавляем поля для хранения информации о Stripe
     stripe_session_id = models.CharField(max_length=255, blank=True, null=True)
     stripe_payment_url = models.CharField(max_length=1000, blank=True, null=True)
+    # До этого момента открытая сессия переиспользуется для повторной оплаты того же курса
+    stripe_session_expires_at = models.DateTimeField(blank=True, null=True)
 
     def __str__(self):
         return f"Платеж {self.user} - {self.amount} {self.payment_method}"
@@ -85,3 +105,73 @@ class Payment(models.Model):
     class Meta:
         verbose_name = 'Платеж'
         verbose_name_plural = 'Платежи'
+        indexes = [
+            # Ключ для пагинации по курсору (KeysetPagination) в PaymentViewSet
+            models.Index(fields=['payment_date', 'id'], name='payment_date_id_idx'),
+            # Платежи пользователя по дате
+            models.Index(fields=['user', 'payment_date'], name='payment_user_date_idx'),
+            # Поиск зависших сессий в задаче fail_stale_checkouts
+            models.Index(fields=['updated_at'], condition=models.Q(status='pending'), name='payment_pending_idx'),
+            # Поиск платежей по событиям Stripe в process_stripe_events
+            models.Index(fields=['stripe_session_id'], condition=models.Q(stripe_session_id__isnull=False),
+                         name='payment_stripe_session_idx'),
+        ]
+
+
+class StripeEvent(models.Model):
+    """
+    Входящее событие Stripe (webhook) в исходном виде.
+
+    Вебхук только сохраняет событие; повторная доставка того же события
+    отбрасывается по первичному ключу. Обработка — пачками в process_stripe_events.
+    """
+    id = models.CharField(max_length=255, primary_key=True)  # id события Stripe (evt_...)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.type} {self.id}"
+
+    class Meta:
+        verbose_name = 'Событие Stripe'
+        verbose_name_plural = 'События Stripe'
+        indexes = [
+            # Очередь необработанных событий
+            models.Index(fields=['received_at'], condition=models.Q(processed_at__isnull=True),
+                         name='stripe_event_inbox_idx'),
+        ]
+
+
+class RevenueRollup(models.Model):
+    """
+    Выручка за день по курсу и способу оплаты: сумма и число оплаченных платежей.
+
+    Поддерживается инкрементально при каждой записи платежа (см. users.revenue);
+    платеж за урок относится к курсу урока. Диапазон дней можно пересобрать
+    задачей rebuild_revenue_rollups_task.
+    """
+    day = models.DateField()
+    course = models.ForeignKey(Course, null=True, blank=True, on_delete=models.CASCADE,
+                               db_index=False)  # Покрывается индексом (course, day)
+    payment_method = models.CharField(max_length=10, choices=Payment.PAYMENT_METHOD_CHOICES)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Не PositiveIntegerField: CHECK проверяется до ON CONFLICT, а вычитание платежа
+    # приходит отрицательным приращением
+    payments_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.course_id} {self.payment_method}: {self.amount}"
+
+    class Meta:
+        verbose_name = 'Выручка за день'
+        verbose_name_plural = 'Выручка по дням'
+        constraints = [
+            # Ключ для INSERT ... ON CONFLICT; платежи без курса тоже сводятся в одну строку
+            models.UniqueConstraint(fields=['day', 'course', 'payment_method'], nulls_distinct=False,
+                                    name='revenue_rollup_key'),
+        ]
+        indexes = [
+            models.Index(fields=['course', 'day'], name='revenue_rollup_course_day_idx'),
+        ]
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from lms.models import Lesson
+from .models import Payment, RevenueRollup
+
+# Добавляет к строкам сводки вклад платежей из {source}: столбцы payment_date,
+# paid_course_id, paid_lesson_id, payment_method, amount и sign (+1 / -1)
+ROLLUP_UPSERT_SQL = """
+    INSERT INTO {rollup} (day, course_id, payment_method, amount, payments_count)
+    SELECT paid.payment_date, COALESCE(paid.paid_course_id, lesson.course_id), paid.payment_method,
+           sum(paid.amount * paid.sign), sum(paid.sign)
+    FROM {source} AS paid
+    LEFT JOIN {lesson} AS lesson ON lesson.id = paid.paid_lesson_id
+    GROUP BY 1, 2, 3
+    ON CONFLICT ON CONSTRAINT revenue_rollup_key DO UPDATE
+    SET amount = {rollup}.amount + EXCLUDED.amount,
+        payments_count = {rollup}.payments_count + EXCLUDED.payments_count
+"""
+
+_DELTAS_SOURCE = """(
+    SELECT * FROM unnest(%s::date[], %s::bigint[], %s::bigint[], %s::varchar[], %s::numeric[], %s::int[])
+    AS t(payment_date, paid_course_id, paid_lesson_id, payment_method, amount, sign)
+)"""
+
+_PAID_SOURCE = """(
+    SELECT payment_date, paid_course_id, paid_lesson_id, payment_method, amount, 1 AS sign
+    FROM {payment} WHERE status = 'paid' AND payment_date BETWEEN %s AND %s
+)"""
+
+
+def rollup_upsert_sql(source):
+    return ROLLUP_UPSERT_SQL.format(
+        rollup=RevenueRollup._meta.db_table, lesson=Lesson._meta.db_table, source=source,
+    )
+
+
+def revenue_row(payment):
+    """
+    Вклад платежа в сводку: (день, курс, урок, способ оплаты, сумма) или None, если он не оплачен.
+    """
+    if payment.status != 'paid':
+        return None
+    return payment.payment_date, payment.paid_course_id, payment.paid_lesson_id, payment.payment_method, payment.amount
+
+
+def apply_revenue_deltas(added=(), removed=()):
+    """
+    Учитывает в сводке добавленные и убранные вклады платежей одним INSERT ... ON CONFLICT.
+    """
+    rows = [(*row, 1) for row in added if row] + [(*row, -1) for row in removed if row]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(rollup_upsert_sql(_DELTAS_SOURCE), [list(column) for column in zip(*rows)])
+
+
+def rebuild_revenue_rollups(date_from, date_to):
+    """
+    Пересобирает сводку за дни [date_from, date_to] по таблице платежей.
+    Возвращает число строк сводки за этот диапазон.
+    """
+    with transaction.atomic():
+        RevenueRollup.objects.filter(day__range=(date_from, date_to)).delete()
+        with connection.cursor() as cursor:
+            source = _PAID_SOURCE.format(payment=Payment._meta.db_table)
+            cursor.execute(rollup_upsert_sql(source), [date_from, date_to])
+            return cursor.rowcount
+
+
+def default_rebuild_range():
+    # Ночная пересборка: вчера и сегодня, куда еще приходят поздние события оплаты
+    today = timezone.localdate()
+    return today - timedelta(days=1), today
@@ -1,15 +1,17 @@
 from rest_framework import serializers
-from .models import User, Payment
-from lms.serializers import PaymentSerializer  # Импортируем сериализатор платежей
+from .models import User
+from lms.serializers import DynamicFieldsMixin, PaymentSerializer  # Импортируем сериализатор платежей
 
 
-class UserSerializer(serializers.ModelSerializer):
-    payments = serializers.SerializerMethodField()  # Поле для платежей
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    # Платежи пользователя; в списке пользователей раскрываются только по ?expand=payments
+    payments = PaymentSerializer(many=True, read_only=True, source='payment_set')
     password = serializers.CharField(write_only=True, required=True)  # Поле для пароля, write-only
 
     class Meta:
         model = User
         fields = ['id', 'email', 'phone', 'city', 'avatar', 'payments', 'password']  # Добавляем поле password
+        expandable_fields = ['payments']
 
     def create(self, validated_data):
         # Извлекаем пароль из данных
@@ -21,10 +23,3 @@ class UserSerializer(serializers.ModelSerializer):
         # Сохраняем пользователя в базе данных
         user.save()
         return user
-
-    def get_payments(self, obj):
-        """
-        Метод для получения всех платежей, связанных с пользователем.
-        """
-        payments = Payment.objects.filter(user=obj)  # Получаем платежи, связанные с пользователем
-        return PaymentSerializer(payments, many=True).data  # Сериализуем их с помощью PaymentSerializer
@@ -1,8 +1,21 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
 import stripe
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from lms.models import Course
+from .models import Payment
 
 # Устанавливаем секретный ключ для работы с Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
+# Ограничиваем ожидание ответа Stripe, чтобы медленный ответ не занимал воркер бесконечно
+stripe.default_http_client = stripe.new_default_http_client(timeout=settings.STRIPE_REQUEST_TIMEOUT)
+
+# Временные ошибки Stripe: создание сессии повторяется задачей Celery
+RETRYABLE_STRIPE_ERRORS = (stripe.APIConnectionError, stripe.RateLimitError)
 
 
 def create_stripe_product(course):
@@ -25,7 +38,7 @@ def create_stripe_price(product_id, course_price):
 
 
 def create_stripe_checkout_session(price_id, user_email, success_url, cancel_url):
-    """Создает сессию для оплаты в Stripe."""
+    """Создает сессию для оплаты в Stripe. Возвращает id, ссылку и время истечения сессии."""
     session = stripe.checkout.Session.create(
         payment_method_types=['card'],
         line_items=[{
@@ -37,4 +50,111 @@ def create_stripe_checkout_session(price_id, user_email, success_url, cancel_url
         success_url=success_url,
         cancel_url=cancel_url,
     )
-    return session.id, session.url
+    return session.id, session.url, datetime.fromtimestamp(session.expires_at, tz=dt_timezone.utc)
+
+
+def get_course_price_id(course):
+    """
+    Цена курса в Stripe. Продукт создается один раз на курс, цена — только
+    если price курса изменилась с момента создания последней цены.
+
+    Проверка и создание идут под блокировкой строки курса по ее актуальным
+    значениям: одновременные первые оплаты не создают лишних продуктов и цен.
+    """
+    if course.stripe_price_id and course.stripe_price_amount == course.price:
+        return course.stripe_price_id
+
+    with transaction.atomic():
+        locked = Course.objects.select_for_update().only(
+            'title', 'description', 'price', *Course.STRIPE_FIELDS,
+        ).get(pk=course.pk)
+        if not (locked.stripe_price_id and locked.stripe_price_amount == locked.price):
+            if not locked.stripe_product_id:
+                locked.stripe_product_id = create_stripe_product(locked)
+            locked.stripe_price_id = create_stripe_price(locked.stripe_product_id, locked.price)
+            locked.stripe_price_amount = locked.price
+            # update() вместо save(): не трогаем остальные поля и updated_at курса
+            Course.objects.filter(pk=course.pk).update(
+                stripe_product_id=locked.stripe_product_id,
+                stripe_price_id=locked.stripe_price_id,
+                stripe_price_amount=locked.stripe_price_amount,
+            )
+    for field in ('price', *Course.STRIPE_FIELDS):
+        setattr(course, field, getattr(locked, field))
+    return course.stripe_price_id
+
+
+def find_open_checkout(user, course):
+    """
+    Платеж того же курса по текущей цене, который можно отдать повторно:
+    неистекшая сессия оплаты или сессия, которая еще создается в фоне.
+    """
+    now = timezone.now()
+    return Payment.objects.filter(user=user, paid_course=course, amount=course.price).filter(
+        Q(status='open', stripe_session_expires_at__gt=now + timedelta(seconds=settings.STRIPE_SESSION_REUSE_MARGIN))
+        | Q(status='pending', updated_at__gt=now - timedelta(seconds=settings.STRIPE_CHECKOUT_TIMEOUT))
+    ).order_by('-id').first()
+
+
+def start_checkout(user, course):
+    """
+    Платеж для оплаты курса: открытый или новый в состоянии pending.
+    Возвращает (платеж, создан ли он).
+
+    Поиск и создание — под блокировкой строки курса, с ценой, перечитанной
+    после блокировки: двойной клик не создает два платежа и две сессии.
+    """
+    with transaction.atomic():
+        course.price = Course.objects.select_for_update().values_list('price', flat=True).get(pk=course.pk)
+        payment = find_open_checkout(user, course)
+        if payment is not None:
+            return payment, False
+        payment = Payment.objects.create(
+            user=user,
+            paid_course=course,
+            amount=course.price,
+            payment_method="transfer",  # Или другое значение в зависимости от логики
+            status='pending',
+        )
+    return payment, True
+
+
+def open_checkout(payment):
+    """
+    Создает сессию оплаты Stripe для платежа в состоянии pending (плюс продукт
+    и цену курса, если их еще нет или цена изменилась). Платеж, который уже
+    перестал быть pending (например, помечен зависшим), не меняется.
+    """
+    session_id, payment_url, expires_at = create_stripe_checkout_session(
+        get_course_price_id(payment.paid_course), payment.user.email,
+        settings.STRIPE_SUCCESS_URL, settings.STRIPE_CANCEL_URL,
+    )
+    changes = {
+        'status': 'open', 'error': '', 'updated_at': timezone.now(),
+        'stripe_session_id': session_id, 'stripe_payment_url': payment_url, 'stripe_session_expires_at': expires_at,
+    }
+    if Payment.objects.filter(pk=payment.pk, status='pending').update(**changes):
+        for field, value in changes.items():
+            setattr(payment, field, value)
+    return payment
+
+
+def record_checkout_error(payment_id, error, failed=False):
+    """
+    Сохраняет причину ошибки создания сессии; failed=True — платеж больше не ждет сессии.
+    """
+    changes = {'error': str(error)[:1000]}
+    if failed:
+        changes.update(status='failed', updated_at=timezone.now())
+    Payment.objects.filter(pk=payment_id, status='pending').update(**changes)
+
+
+def fail_stale_checkouts():
+    """
+    Помечает ошибочными платежи, сессия для которых не создана за
+    STRIPE_CHECKOUT_TIMEOUT секунд (задача потеряна или воркер упал).
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.STRIPE_CHECKOUT_TIMEOUT)
+    return Payment.objects.filter(status='pending', updated_at__lt=deadline).update(
+        status='failed', error='Истекло время ожидания сессии оплаты', updated_at=timezone.now()
+    )
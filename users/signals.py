@@ -0,0 +1,28 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Payment
+from .revenue import apply_revenue_deltas, revenue_row
+
+
+# --- Сводка выручки ---
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_revenue(sender, instance, **kwargs):
+    instance._previous_revenue = None
+    if instance.pk and not instance._state.adding:
+        previous = Payment.objects.filter(pk=instance.pk).first()
+        instance._previous_revenue = revenue_row(previous) if previous else None
+
+
+@receiver(post_save, sender=Payment)
+def update_revenue_on_save(sender, instance, **kwargs):
+    current = revenue_row(instance)
+    previous = getattr(instance, '_previous_revenue', None)
+    if current != previous:
+        apply_revenue_deltas(added=[current], removed=[previous])
+
+
+@receiver(post_delete, sender=Payment)
+def update_revenue_on_delete(sender, instance, **kwargs):
+    apply_revenue_deltas(removed=[revenue_row(instance)])
@@ -88,3 +88,334 @@ def test_create_payment(api_client, create_user):
     assert payment is not None
     print(f"Stripe Session ID: {payment.stripe_session_id}")
     print(f"Stripe Payment URL: {payment.stripe_payment_url}")
+
+
+@pytest.mark.django_db
+def test_user_list_expands_payments_on_request(api_client, create_user):
+    user = create_user(email='testuser@example.com', password='password')
+    Payment.objects.create(user=user, amount=100, payment_method='cash')
+    api_client.force_authenticate(user=user)
+
+    response = api_client.get(reverse('users:user-list'))
+    assert 'payments' not in response.data['results'][0]
+
+    response = api_client.get(reverse('users:user-list'), {'expand': 'payments'})
+    assert response.data['results'][0]['payments'][0]['amount'] == '100.00'
+
+
+@pytest.fixture
+def eager_celery():
+    from celery import current_app
+    current_app.conf.task_always_eager = True
+    yield
+    current_app.conf.task_always_eager = False
+
+
+@pytest.fixture
+def stripe_calls(monkeypatch):
+    import time
+    from types import SimpleNamespace
+    import stripe
+
+    class StripeCalls(list):
+        errors = []  # Исключения, которые вернут следующие попытки создать сессию
+
+    def fake(kind):
+        def create(**kwargs):
+            calls.append((kind, kwargs))
+            if kind == 'cs' and calls.errors:
+                raise calls.errors.pop(0)
+            number = len(calls)
+            return SimpleNamespace(id=f'{kind}_{number}', url=f'https://checkout.test/{number}',
+                                   expires_at=int(time.time()) + 24 * 3600)
+        return create
+
+    calls = StripeCalls()
+    monkeypatch.setattr(stripe.Product, 'create', fake('prod'))
+    monkeypatch.setattr(stripe.Price, 'create', fake('price'))
+    monkeypatch.setattr(stripe.checkout.Session, 'create', fake('cs'))
+    return calls
+
+
+@pytest.mark.django_db
+def test_checkout_reuses_stripe_objects(api_client, create_user, stripe_calls):
+    user = create_user(email='buyer@example.com', password='password')
+    other = create_user(email='other@example.com', password='password')
+    course = Course.objects.create(title='Course', description='Description', price=100, owner=user)
+    url = reverse('users:create-payment')
+
+    api_client.force_authenticate(user=user)
+    first = api_client.post(url, {'course_id': course.id}, format='json').data['payment_url']
+    assert [kind for kind, _ in stripe_calls] == ['prod', 'price', 'cs']
+
+    # Повторный клик отдает ту же открытую сессию без обращений к Stripe
+    assert api_client.post(url, {'course_id': course.id}, format='json').data['payment_url'] == first
+    assert len(stripe_calls) == 3 and Payment.objects.count() == 1
+
+    # Другой пользователь: только новая сессия по сохраненной цене
+    api_client.force_authenticate(user=other)
+    api_client.post(url, {'course_id': course.id}, format='json')
+    assert [kind for kind, _ in stripe_calls[3:]] == ['cs']
+    assert stripe_calls[3][1]['line_items'][0]['price'] == 'price_2'
+
+    # Изменилась цена: новая цена того же продукта и новая сессия
+    course.refresh_from_db()
+    course.price = 150
+    course.save()
+    api_client.post(url, {'course_id': course.id}, format='json')
+    assert [kind for kind, _ in stripe_calls[4:]] == ['price', 'cs']
+    assert stripe_calls[4][1] == {'product': 'prod_1', 'unit_amount': 15000, 'currency': 'usd'}
+    course.refresh_from_db()
+    assert (course.stripe_price_id, course.stripe_price_amount) == ('price_5', 150)
+
+
+@pytest.mark.django_db
+def test_price_is_rechecked_under_lock(create_user, stripe_calls):
+    from users.services import get_course_price_id
+
+    user = create_user(email='buyer@example.com', password='password')
+    course = Course.objects.create(title='Course', description='Description', price=100, owner=user)
+    stale = Course.objects.get(pk=course.pk)
+    # Параллельная оплата уже создала продукт и цену, пока этот экземпляр был в памяти
+    assert get_course_price_id(course) == 'price_2'
+    assert get_course_price_id(stale) == 'price_2'
+    assert [kind for kind, _ in stripe_calls] == ['prod', 'price']
+    assert stale.stripe_product_id == 'prod_1'
+
+
+@pytest.mark.django_db
+def test_async_checkout_returns_pending_payment(api_client, create_user, stripe_calls, eager_celery,
+                                                django_capture_on_commit_callbacks, settings):
+    settings.STRIPE_CHECKOUT_ASYNC = True
+    user = create_user(email='buyer@example.com', password='password')
+    course = Course.objects.create(title='Course', description='Description', price=100, owner=user)
+    api_client.force_authenticate(user=user)
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        response = api_client.post(reverse('users:create-payment'), {'course_id': course.id}, format='json')
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert (response.data['status'], response.data['payment_url']) == ('pending', None)
+    assert stripe_calls == []  # Запрос не ждет Stripe
+
+    status_url = reverse('users:payment-status', args=[response.data['id']])
+    polled = api_client.get(status_url)
+    assert polled.data['status'] == 'pending' and polled['Retry-After'] == '1'
+    # Повторный клик, пока сессия создается, не создает второй платеж
+    assert api_client.post(reverse('users:create-payment'), {'course_id': course.id}, format='json').data['id'] == \
+        response.data['id']
+
+    for callback in callbacks:
+        callback()
+    polled = api_client.get(status_url)
+    assert polled.data['status'] == 'open'
+    assert polled.data['payment_url'] == Payment.objects.get().stripe_payment_url
+
+    other = create_user(email='other@example.com', password='password')
+    api_client.force_authenticate(user=other)
+    assert api_client.get(status_url).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_checkout_failures_are_recorded(create_user, stripe_calls, eager_celery):
+    import stripe
+    from datetime import timedelta
+    from django.utils import timezone
+    from lms.tasks import create_checkout_session_task
+    from users.services import fail_stale_checkouts, start_checkout
+
+    user = create_user(email='buyer@example.com', password='password')
+    course = Course.objects.create(title='Course', description='Description', price=100, owner=user)
+
+    # Временная ошибка повторяется, постоянная — сразу фиксируется в платеже
+    stripe_calls.errors.extend([stripe.APIConnectionError('timeout'), stripe.InvalidRequestError('bad', None)])
+    payment, _ = start_checkout(user, course)
+    create_checkout_session_task.delay(payment.pk)
+    payment.refresh_from_db()
+    assert [kind for kind, _ in stripe_calls].count('cs') == 2
+    assert (payment.status, payment.error) == ('failed', 'bad')
+
+    stripe_calls.errors.extend([stripe.APIConnectionError('timeout')] * 4)
+    payment, _ = start_checkout(user, course)
+    create_checkout_session_task.delay(payment.pk)
+    payment.refresh_from_db()
+    assert (payment.status, payment.error) == ('failed', 'timeout')
+
+    # Платеж, сессия для которого так и не создана, помечается зависшим
+    stale = Payment.objects.create(user=user, paid_course=course, amount=100, payment_method='transfer',
+                                   status='pending')
+    Payment.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+    assert fail_stale_checkouts() == 1
+    stale.refresh_from_db()
+    assert stale.status == 'failed'
+
+
+def stripe_event(event_id, event_type, session_id, payment_status='paid'):
+    import json
+    return json.dumps({
+        'id': event_id, 'object': 'event', 'type': event_type,
+        'data': {'object': {'id': session_id, 'object': 'checkout.session', 'payment_status': payment_status}},
+    })
+
+
+@pytest.mark.django_db
+def test_stripe_webhook_stores_events_once(api_client):
+    from users.models import StripeEvent
+    from users.webhooks import sign_payload
+
+    url = reverse('users:stripe-webhook')
+    payload = stripe_event('evt_1', 'checkout.session.completed', 'cs_1')
+    for _ in range(2):  # Stripe может доставить событие повторно
+        response = api_client.post(url, payload, content_type='application/json',
+                                   HTTP_STRIPE_SIGNATURE=sign_payload(payload))
+        assert response.status_code == status.HTTP_200_OK
+    assert list(StripeEvent.objects.values_list('id', 'processed_at')) == [('evt_1', None)]
+
+    response = api_client.post(url, payload, content_type='application/json',
+                               HTTP_STRIPE_SIGNATURE=sign_payload(payload, secret='whsec_other'))
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+def test_stripe_events_processed_in_batches(create_user, django_assert_max_num_queries):
+    from lms.models import Subscription
+    from users.models import StripeEvent
+    from users.webhooks import process_stripe_events, store_event
+
+    owner = create_user(email='owner@example.com', password='password')
+    course = Course.objects.create(title='Course', description='Description', price=100, owner=owner)
+    payments = {}
+    for number in range(6):
+        buyer = create_user(email=f'buyer{number}@example.com', password='password')
+        payments[number] = Payment.objects.create(user=buyer, paid_course=course, amount=100, payment_method='transfer',
+                                                  status='open', stripe_session_id=f'cs_{number}')
+
+    events = [
+        ('checkout.session.completed', 'cs_0', 'paid'),
+        ('checkout.session.completed', 'cs_1', 'paid'),
+        ('checkout.session.completed', 'cs_2', 'unpaid'),  # Отложенная оплата еще не поступила
+        ('checkout.session.async_payment_succeeded', 'cs_2', 'paid'),
+        ('checkout.session.async_payment_failed', 'cs_3', 'unpaid'),
+        ('checkout.session.expired', 'cs_4', 'unpaid'),
+        ('checkout.session.expired', 'cs_0', 'unpaid'),  # Оплаченный платеж не меняется
+        ('checkout.session.completed', 'cs_unknown', 'paid'),
+        ('customer.created', 'cus_1', 'paid'),
+    ]
+    for number, (event_type, session_id, payment_status) in enumerate(events):
+        store_event(stripe_event(f'evt_{number}', event_type, session_id, payment_status).encode())
+
+    # На пачку — постоянное число запросов, независимо от числа событий в ней
+    with django_assert_max_num_queries(12):
+        totals = process_stripe_events(batch_size=100)
+    assert (totals['events'], totals['paid'], totals['enrolled']) == (9, 3, 3)
+
+    statuses = {number: Payment.objects.get(pk=payment.pk).status for number, payment in payments.items()}
+    assert statuses == {0: 'paid', 1: 'paid', 2: 'paid', 3: 'failed', 4: 'expired', 5: 'open'}
+    assert set(Subscription.objects.values_list('user__email', flat=True)) == {
+        'buyer0@example.com', 'buyer1@example.com', 'buyer2@example.com'}
+    course.refresh_from_db()
+    assert course.subscribers_count == 3
+    assert not StripeEvent.objects.filter(processed_at=None).exists()
+    assert process_stripe_events()['events'] == 0
+
+
+@pytest.mark.django_db
+def test_generate_stripe_events_command(create_user):
+    import io
+    from django.core.management import call_command
+    from users.models import StripeEvent
+    from users.webhooks import process_stripe_events
+
+    user = create_user(email='buyer@example.com', password='password')
+    Payment.objects.create(user=user, amount=100, payment_method='transfer', status='open', stripe_session_id='cs_1')
+    call_command('generate_stripe_events', count=20, duplicates=0.5, paid_share=1, stdout=io.StringIO())
+    assert StripeEvent.objects.count() == 20
+    assert process_stripe_events()['paid'] == 1
+    assert Payment.objects.get().status == 'paid'
+
+
+def rollup_rows():
+    from users.models import RevenueRollup
+    return {
+        (row.course_id, row.payment_method): (row.amount, row.payments_count)
+        for row in RevenueRollup.objects.exclude(payments_count=0)
+    }
+
+
+@pytest.mark.django_db
+def test_revenue_rollup_follows_payment_writes(create_user):
+    from decimal import Decimal
+    from lms.models import Lesson
+    from users.webhooks import process_stripe_events, store_event
+
+    user = create_user(email='buyer@example.com', password='password')
+    course = Course.objects.create(title='Course', description='Description', price=100, owner=user)
+    lesson = Lesson.objects.create(title='Lesson', description='Description', course=course, owner=user)
+
+    cash = Payment.objects.create(user=user, paid_course=course, amount=100, payment_method='cash')
+    Payment.objects.create(user=user, paid_lesson=lesson, amount=20, payment_method='cash')  # В курс урока
+    pending = Payment.objects.create(user=user, paid_course=course, amount=50, payment_method='transfer',
+                                     status='open', stripe_session_id='cs_1')
+    assert rollup_rows() == {(course.pk, 'cash'): (Decimal('120.00'), 2)}
+
+    cash.amount = 80
+    cash.save()
+    store_event(stripe_event('evt_1', 'checkout.session.completed', 'cs_1').encode())
+    process_stripe_events()
+    assert rollup_rows() == {(course.pk, 'cash'): (Decimal('100.00'), 2), (course.pk, 'transfer'): (Decimal('50.00'), 1)}
+
+    pending.refresh_from_db()
+    pending.delete()
+    cash.status = 'failed'
+    cash.save()
+    assert rollup_rows() == {(course.pk, 'cash'): (Decimal('20.00'), 1)}
+
+
+@pytest.mark.django_db
+def test_revenue_rebuild_matches_incremental_rollup(create_user):
+    import io
+    from django.core.management import call_command
+    from users.models import RevenueRollup
+
+    user = create_user(email='buyer@example.com', password='password')
+    course = Course.objects.create(title='Course', description='Description', price=100, owner=user)
+    for amount in (10, 20, 30):
+        Payment.objects.create(user=user, paid_course=course, amount=amount, payment_method='transfer')
+    Payment.objects.create(user=user, amount=5, payment_method='cash')
+    expected = rollup_rows()
+
+    RevenueRollup.objects.update(amount=0, payments_count=0)
+    call_command('rebuild_revenue_rollups', stdout=io.StringIO())
+    assert rollup_rows() == expected
+
+
+@pytest.mark.django_db
+def test_revenue_report_reads_rollups(api_client, create_user, django_assert_num_queries):
+    from django.contrib.auth.models import Group
+    from lms.roles import get_user_roles
+
+    admin = create_user(email='admin@example.com', password='password')
+    admin.groups.add(Group.objects.get_or_create(name='Администратор')[0])
+    courses = [Course.objects.create(title=f'Course {i}', description='Description', price=100, owner=admin)
+               for i in range(3)]
+    for number, course in enumerate(courses):
+        for _ in range(number + 1):
+            Payment.objects.create(user=admin, paid_course=course, amount=100, payment_method='transfer')
+
+    api_client.force_authenticate(user=admin)
+    get_user_roles(admin)
+    url = reverse('users:revenue-report')
+    # Серия, топ и итог — по запросу к сводке, сколько бы ни было платежей
+    with django_assert_num_queries(3):
+        response = api_client.get(url, {'top': 2})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['total'] == {'amount': 600, 'count': 6}
+    assert [point['count'] for point in response.data['series']] == [6]
+    assert [(item['title'], item['count']) for item in response.data['top_courses']] == [
+        ('Course 2', 3), ('Course 1', 2)]
+
+    assert api_client.get(url, {'course': courses[1].pk}).data['total'] == {'amount': 200, 'count': 2}
+    assert api_client.get(url, {'date_from': 'yesterday'}).status_code == status.HTTP_400_BAD_REQUEST
+    assert api_client.get(url, {'course': 'abc'}).status_code == status.HTTP_400_BAD_REQUEST
+    student = create_user(email='student@example.com', password='password')
+    api_client.force_authenticate(user=student)
+    assert api_client.get(url).status_code == status.HTTP_403_FORBIDDEN
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import UserViewSet, RegisterView, CreatePaymentView
+from .views import UserViewSet, RegisterView, CreatePaymentView, PaymentStatusView, RevenueReportView, StripeWebhookView
 
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -23,4 +23,7 @@ urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('create-payment/', CreatePaymentView.as_view(), name='create-payment'),
+    path('payments/<int:pk>/status/', PaymentStatusView.as_view(), name='payment-status'),
+    path('stripe/webhook/', StripeWebhookView.as_view(), name='stripe-webhook'),
+    path('revenue/', RevenueReportView.as_view(), name='revenue-report'),
 ]
@@ -8,10 +8,24 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 # Импорты для платежей
+import stripe
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from lms.models import Course
+from lms.tasks import create_checkout_session_task
 from .models import Payment
-from .services import create_stripe_product, create_stripe_price, create_stripe_checkout_session
+from .services import open_checkout, record_checkout_error, start_checkout
+from .webhooks import store_event, verify_signature
+
+# Отчеты о выручке
+from datetime import timedelta
+from django.core.exceptions import PermissionDenied
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from lms.roles import has_role, ADMIN
+from .models import RevenueRollup
 
 
 class RegisterView(APIView):
@@ -35,6 +49,13 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
+    def get_queryset(self):
+        queryset = User.objects.order_by('id')
+        # Платежи загружаются одним запросом и только если они будут в ответе
+        if 'payments' in self.serializer_class.requested_fields(self.request, many=self.action == 'list'):
+            queryset = queryset.prefetch_related('payment_set')
+        return queryset
+
 
 class ProtectedView(APIView):
     permission_classes = [IsAuthenticated]
@@ -44,32 +65,127 @@ class ProtectedView(APIView):
 
 
 class CreatePaymentView(APIView):
+    """
+    Оплата курса через Stripe. Открытая сессия того же курса переиспользуется.
+
+    В асинхронном режиме (STRIPE_CHECKOUT_ASYNC, по умолчанию выключен) платеж создается в состоянии
+    pending, а сессия — задачей Celery: ответ 202 с id платежа приходит сразу,
+    ссылку на оплату клиент получает из PaymentStatusView.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
         course_id = request.data.get('course_id')
         course = get_object_or_404(Course, id=course_id)
 
-        # Создаем продукт и цену в Stripe
-        product_id = create_stripe_product(course)
-        price_id = create_stripe_price(product_id, course.price)
+        payment, created = start_checkout(request.user, course)
+        if created and settings.STRIPE_CHECKOUT_ASYNC:
+            transaction.on_commit(lambda: create_checkout_session_task.delay(payment.pk))
+        elif created:
+            try:
+                open_checkout(payment)
+            except stripe.StripeError as exc:
+                record_checkout_error(payment.pk, exc, failed=True)
+                return Response(payment_status(payment, status='failed', error=str(exc)),
+                                status=status.HTTP_502_BAD_GATEWAY)
+
+        code = status.HTTP_202_ACCEPTED if payment.status == 'pending' else status.HTTP_200_OK
+        return Response(payment_status(payment), status=code)
+
+
+class PaymentStatusView(APIView):
+    """
+    Состояние оплаты для опроса клиентом: pending — ссылка еще создается
+    (повторить запрос через Retry-After секунд), open — ссылка готова, failed — ошибка.
+    """
+    permission_classes = [IsAuthenticated]
 
-        # Создаем сессию оплаты
-        success_url = "https://example.com/success"  # Замените на ваш URL
-        cancel_url = "https://example.com/cancel"    # Замените на ваш URL
-        session_id, payment_url = create_stripe_checkout_session(
-            price_id, request.user.email, success_url, cancel_url
-        )
+    def get(self, request, pk):
+        payment = get_object_or_404(Payment, pk=pk, user=request.user)
+        response = Response(payment_status(payment))
+        if payment.status == 'pending':
+            response['Retry-After'] = '1'
+        return response
 
-        # Сохраняем информацию о платеже
-        payment = Payment.objects.create(
-            user=request.user,
-            paid_course=course,
-            amount=course.price,
-            payment_method="transfer",  # Или другое значение в зависимости от логики
-            stripe_session_id=session_id,
-            stripe_payment_url=payment_url
-        )
 
-        # Возвращаем ссылку на оплату
-        return Response({'payment_url': payment_url})
+class StripeWebhookView(APIView):
+    """
+    Вебхук Stripe: проверка подписи и сохранение события во входящую очередь.
+    Обработка — пачками в задаче process_stripe_events_task, поэтому ответ быстрый.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        payload = request.body
+        try:
+            verify_signature(payload, request.META.get('HTTP_STRIPE_SIGNATURE'))
+            store_event(payload)
+        except stripe.SignatureVerificationError:
+            return Response({'detail': 'Неверная подпись.'}, status=status.HTTP_400_BAD_REQUEST)
+        except (ValueError, KeyError, TypeError):
+            return Response({'detail': 'Некорректное событие.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_200_OK)
+
+
+# Период отчета о выручке по умолчанию и предельный размер топа курсов
+REVENUE_DEFAULT_DAYS = 30
+REVENUE_MAX_TOP = 100
+
+
+class RevenueReportView(APIView):
+    """
+    Отчет о выручке для администраторов: ряд по дням и топ курсов за период.
+
+    Параметры: date_from, date_to (YYYY-MM-DD, по умолчанию — последние 30 дней),
+    course, payment_method, top (по умолчанию 10). Читается только сводка
+    RevenueRollup, поэтому стоимость отчета не зависит от истории платежей.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if not (request.user.is_superuser or has_role(request.user, ADMIN)):
+            raise PermissionDenied
+
+        params = request.query_params
+        try:
+            date_to = parse_date(params['date_to']) if params.get('date_to') else timezone.localdate()
+            date_from = (parse_date(params['date_from']) if params.get('date_from')
+                         else date_to - timedelta(days=REVENUE_DEFAULT_DAYS - 1))
+            top = min(max(int(params.get('top', 10)), 0), REVENUE_MAX_TOP)
+            course_id = int(params['course']) if params.get('course') else None
+        except (TypeError, ValueError):
+            date_from = None
+        if date_from is None or date_to is None:
+            return Response({'detail': 'Даты — в формате YYYY-MM-DD, top и course — целые числа.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = RevenueRollup.objects.filter(day__range=(date_from, date_to))
+        if course_id is not None:
+            rollups = rollups.filter(course_id=course_id)
+        if params.get('payment_method'):
+            rollups = rollups.filter(payment_method=params['payment_method'])
+        totals = {'amount': Sum('amount'), 'count': Sum('payments_count')}
+
+        series = rollups.values('day').annotate(**totals).order_by('day')
+        top_courses = (
+            rollups.exclude(course=None).values('course', title=F('course__title'))
+            .annotate(**totals).order_by('-amount', 'course')[:top]
+        )
+        total = rollups.aggregate(**totals)
+        return Response({
+            'date_from': date_from,
+            'date_to': date_to,
+            'total': {'amount': total['amount'] or 0, 'count': total['count'] or 0},
+            'series': list(series),
+            'top_courses': list(top_courses),
+        })
+
+
+def payment_status(payment, **overrides):
+    return {
+        'id': payment.pk,
+        'status': payment.status,
+        'payment_url': payment.stripe_payment_url,
+        'error': payment.error,
+    } | overrides
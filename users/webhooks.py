@@ -0,0 +1,136 @@
+import hashlib
+import hmac
+import json
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from lms.subscriptions import enroll_pairs
+from .models import Payment, StripeEvent
+from .revenue import rollup_upsert_sql
+
+# Новый статус платежа по типу события сессии оплаты
+EVENT_STATUSES = {
+    'checkout.session.completed': 'paid',
+    'checkout.session.async_payment_succeeded': 'paid',
+    'checkout.session.async_payment_failed': 'failed',
+    'checkout.session.expired': 'expired',
+}
+
+# Оплаченный платеж больше не меняет статус; в том же выражении — вклад в сводку
+# выручки, а RETURNING — для подписки на курс
+_MARK_PAID_SQL = """
+    WITH paid AS (
+        UPDATE {table} SET status = 'paid', error = '', updated_at = now()
+        WHERE stripe_session_id = ANY(%s) AND status <> 'paid'
+        RETURNING user_id, payment_date, paid_course_id, paid_lesson_id, payment_method, amount, 1 AS sign
+    ), rollup AS ({rollup})
+    SELECT user_id, paid_course_id FROM paid
+"""
+
+
+def verify_signature(payload, header):
+    """
+    Проверяет подпись Stripe-Signature; при несовпадении — stripe.SignatureVerificationError.
+    """
+    stripe.WebhookSignature.verify_header(
+        payload.decode('utf-8'), header, settings.STRIPE_WEBHOOK_SECRET, settings.STRIPE_WEBHOOK_TOLERANCE
+    )
+
+
+def sign_payload(payload, secret=None, timestamp=None):
+    """
+    Заголовок Stripe-Signature для тела события — так подписывает Stripe (для тестов и генератора).
+    """
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    secret = settings.STRIPE_WEBHOOK_SECRET if secret is None else secret
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+def store_event(payload):
+    """
+    Сохраняет событие во входящую очередь одним INSERT ... ON CONFLICT DO NOTHING:
+    повторная доставка события Stripe отбрасывается по его id.
+    """
+    event = json.loads(payload)
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(id=event['id'], type=event['type'], payload=event)], ignore_conflicts=True
+    )
+
+
+def _event_status(event_type, session):
+    status = EVENT_STATUSES.get(event_type)
+    # completed приходит и для отложенных способов оплаты, еще не поступившей
+    if event_type == 'checkout.session.completed' and session.get('payment_status') != 'paid':
+        return None
+    return status
+
+
+def _mark_paid(session_ids):
+    if not session_ids:
+        return []
+    with connection.cursor() as cursor:
+        sql = _MARK_PAID_SQL.format(table=Payment._meta.db_table, rollup=rollup_upsert_sql('paid'))
+        cursor.execute(sql, [session_ids])
+        return cursor.fetchall()
+
+
+def _process_batch(events):
+    sessions = defaultdict(list)
+    for event_type, payload in events:
+        session = (payload.get('data') or {}).get('object') or {}
+        status = _event_status(event_type, session)
+        if status and session.get('id'):
+            sessions[status].append(session['id'])
+
+    paid = _mark_paid(sessions.pop('paid', []))
+    counts = Counter(paid=len(paid))
+    for status, session_ids in sessions.items():
+        counts[status] = Payment.objects.filter(
+            stripe_session_id__in=session_ids, status__in=('pending', 'open')
+        ).update(status=status, updated_at=timezone.now())
+    counts['enrolled'] = len(enroll_pairs((user_id, course_id) for user_id, course_id in paid if course_id))
+    return counts
+
+
+def process_stripe_events(batch_size=None):
+    """
+    Обрабатывает входящие события пачками. На пачку: выборка событий со
+    SKIP LOCKED (несколько воркеров не мешают друг другу), по одному UPDATE
+    платежей на каждый новый статус, один INSERT подписок на оплаченные курсы
+    и отметка событий обработанными. Возвращает счетчики по статусам.
+    """
+    batch_size = batch_size or settings.STRIPE_EVENT_BATCH_SIZE
+    totals = Counter()
+    while True:
+        with transaction.atomic():
+            events = list(
+                StripeEvent.objects.filter(processed_at__isnull=True).order_by('received_at')
+                .select_for_update(skip_locked=True).values_list('id', 'type', 'payload')[:batch_size]
+            )
+            if not events:
+                break
+            totals += _process_batch([(event_type, payload) for _, event_type, payload in events])
+            StripeEvent.objects.filter(pk__in=[event_id for event_id, _, _ in events]).update(
+                processed_at=timezone.now()
+            )
+            totals['events'] += len(events)
+        if len(events) < batch_size:
+            break
+    return totals
+
+
+def prune_stripe_events():
+    """
+    Удаляет обработанные события старше STRIPE_EVENT_RETENTION_DAYS: дольше Stripe
+    повторно доставлять событие не будет, и для дедупликации оно больше не нужно.
+    """
+    deadline = timezone.now() - timedelta(days=settings.STRIPE_EVENT_RETENTION_DAYS)
+    deleted, _ = StripeEvent.objects.filter(processed_at__lt=deadline).delete()
+    return deleted